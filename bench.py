@@ -0,0 +1,282 @@
+"""Benchmarks for the disk list refresh path.
+
+Builds synthetic fixtures (a mountinfo file, a sysfs tree of loop and
+device-mapper devices, a registry) for growing numbers of disks and times
+each refresh stage. Runs headless and without root; exits with status 1 if a
+stage is over its budget.
+
+    python bench.py [--sizes 10,100,1000,10000] [--repeat 3] [--no-budget]
+
+--stage GB instead times staging a tree of mixed file sizes into tmpfs
+(/dev/shm) with vdm.logic.stage against a plain shutil.copytree:
+
+    python bench.py --stage 10 [--stage-dir /var/tmp]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from vdm.logic.mounts import read_mounts
+from vdm.logic.loops import scan_loops
+from vdm.logic.registry import DiskRegistry
+from vdm.logic.disks import sync_disks_status, list_disks
+from vdm.logic.utils import format_size
+from vdm.logic.actions import OperationContext
+from vdm.logic import stage, compact
+
+SIZES = (10, 100, 1000, 10000)
+# stage -> (fixed ms, µs per disk)
+BUDGETS = {
+    'parse mountinfo': (5, 10),
+    'scan sysfs loops': (20, 150),
+    'registry load': (10, 40),
+    'registry sync (unchanged)': (5, 15),
+    'registry sync (1 change)': (20, 20),
+    'sync_disks_status': (5, 25),
+    'list_disks + format_size': (5, 15),
+    'image footprints (stat)': (5, 20),
+    'DiskListModel.update_disks': (10, 40),
+}
+SYSTEM_MOUNTS = [
+    ('/', 'ext4', '/dev/nvme0n1p2', 'rw,relatime'),
+    ('/proc', 'proc', 'proc', 'rw,nosuid,nodev,noexec'),
+    ('/sys', 'sysfs', 'sysfs', 'rw,nosuid,nodev,noexec'),
+    ('/dev', 'devtmpfs', 'udev', 'rw,nosuid,size=8000000k,mode=755'),
+    ('/dev/shm', 'tmpfs', 'tmpfs', 'rw,nosuid,nodev'),
+    ('/run', 'tmpfs', 'tmpfs', 'rw,nosuid,nodev,size=1600000k,mode=755'),
+    ('/tmp', 'tmpfs', 'tmpfs', 'rw,nosuid,nodev,size=8000000k'),
+]
+
+def make_fixtures(root, n):
+    """Write mountinfo, a sysfs block tree and a registry for n file disks (+ n/10 RAM disks).
+
+    Every fourth disk is unmounted, every tenth is LUKS encrypted.
+    """
+    sysfs = os.path.join(root, 'sys', 'block')
+    os.makedirs(sysfs)
+    lines = []
+    mount_id = 20
+    for mountpoint, fstype, source, options in SYSTEM_MOUNTS:
+        lines.append(f'{mount_id} 1 0:{mount_id} / {mountpoint} {options} shared:1 - {fstype} {source} {options}')
+        mount_id += 1
+    discos = []
+    dm = 0
+    os.makedirs(os.path.join(root, 'images'))
+    for i in range(n):
+        image = os.path.join(root, 'images', f'disk {i}.img')
+        # Sparse image with a few data ranges, for the footprint scan
+        with open(image, 'wb') as f:
+            f.truncate(1024 * 1024 * 1024)
+            for k in range(i % 4):
+                f.seek(k * 64 * 1024 * 1024)
+                f.write(b'vdm')
+        mountpoint = os.path.join(root, 'mnt', f'disk{i}')
+        encrypted = i % 10 == 0
+        discos.append({'type': 'File', 'device_or_file': image, 'mountpoint': mountpoint, 'size': f'{(i % 64) + 1}G',
+                       'status': 'Unmounted', 'encrypted': encrypted, 'allocation': 'preallocated'})
+        if i % 4 == 3:
+            continue
+        loop = os.path.join(sysfs, f'loop{i}')
+        os.makedirs(os.path.join(loop, 'loop'))
+        _write(os.path.join(loop, 'loop', 'backing_file'), image)
+        _write(os.path.join(loop, 'loop', 'offset'), '0')
+        _write(os.path.join(loop, 'loop', 'sizelimit'), '0')
+        _write(os.path.join(loop, 'dev'), f'7:{i}')
+        _write(os.path.join(loop, 'loop', 'dio'), str(i % 2))
+        os.makedirs(os.path.join(loop, 'queue'))
+        for key, value in (('logical_block_size', 4096), ('read_ahead_kb', 128), ('nr_requests', 128)):
+            _write(os.path.join(loop, 'queue', key), str(value))
+        device, devno = f'/dev/loop{i}', f'7:{i}'
+        if encrypted:
+            name = f'dm-{dm}'
+            dm += 1
+            os.makedirs(os.path.join(sysfs, name, 'dm'))
+            os.makedirs(os.path.join(sysfs, name, 'slaves', f'loop{i}'))
+            _write(os.path.join(sysfs, name, 'dm', 'name'), f'disk {i}.img_luks')
+            _write(os.path.join(sysfs, name, 'dev'), f'253:{dm}')
+            device, devno = f'/dev/mapper/disk\\040{i}.img_luks', f'253:{dm}'
+        lines.append(f'{mount_id} 1 {devno} / {mountpoint} rw,relatime shared:{mount_id} - ext4 {device} rw')
+        mount_id += 1
+    for i in range(max(1, n // 10)):
+        lines.append(f'{mount_id} 1 0:{mount_id} / {root}/ram{i} rw,nosuid,nodev shared:{mount_id} - tmpfs tmpfs rw,size={i + 1}g')
+        mount_id += 1
+    mountinfo = os.path.join(root, 'mountinfo')
+    _write(mountinfo, '\n'.join(lines) + '\n')
+    registry = DiskRegistry(os.path.join(root, 'registry.db'))
+    registry.sync(discos)
+    registry.close()
+    return mountinfo, sysfs, os.path.join(root, 'registry.db')
+
+def _write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+def _model_stage():
+    """DiskListModel.update_disks, if PySide6 is installed."""
+    try:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        from PySide6.QtCore import QCoreApplication
+        from vdm.disklist import DiskListModel
+    except ImportError:
+        return None
+    app = QCoreApplication.instance() or QCoreApplication([])
+    model = DiskListModel()
+
+    def update(entries):
+        model.update_disks(entries)
+        # Second refresh with one disk changed, as in a steady-state refresh
+        if entries:
+            changed = [(dict(entries[0][0], status='Mounted'), entries[0][1])] + entries[1:]
+            model.update_disks(changed)
+    update.app = app
+    return update
+
+def measure(func, repeat):
+    """Best wall time over repeat runs, then peak traced allocation of one more run."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def run(n, repeat):
+    root = tempfile.mkdtemp(prefix='vdm-bench-')
+    try:
+        mountinfo, sysfs, registry_path = make_fixtures(root, n)
+        registry = DiskRegistry(registry_path)
+        mounts = read_mounts(mountinfo)
+        loops = scan_loops(sysfs)
+        discos = registry.all()
+        sync_disks_status(discos, mounts, loops)
+        registry.sync(discos)
+        entries = []
+
+        def sync_one_change():
+            discos[0]['size'] = '1G' if discos[0]['size'] != '1G' else '2G'
+            registry.sync(discos)
+
+        def table_entries():
+            entries[:] = [(disk, format_size(disk['size'])) for disk in list_disks(discos, mounts=mounts)]
+
+        stages = [
+            ('parse mountinfo', lambda: read_mounts(mountinfo)),
+            ('scan sysfs loops', lambda: scan_loops(sysfs)),
+            ('registry load', registry.all),
+            ('registry sync (unchanged)', lambda: registry.sync(discos)),
+            ('registry sync (1 change)', sync_one_change),
+            ('sync_disks_status', lambda: sync_disks_status(discos, mounts, loops)),
+            ('list_disks + format_size', table_entries),
+            ('image footprints (stat)', lambda: compact.footprints(discos, scan=False)),
+        ]
+        table_entries()
+        model_update = _model_stage()
+        if model_update is not None:
+            stages.append(('DiskListModel.update_disks', lambda: model_update(entries)))
+        results = []
+        for name, func in stages:
+            elapsed, peak = measure(func, repeat)
+            base_ms, per_disk_us = BUDGETS[name]
+            budget = base_ms / 1000 + per_disk_us * n / 1e6
+            results.append((name, elapsed, peak, budget))
+        mounted = sum(1 for d in discos if d['status'] == 'Mounted')
+        registry.close()
+        return results, mounted
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+# Share of the bytes and size range of each file class of the staging tree
+STAGE_MIX = (
+    (0.15, 1024, 64 * 1024),
+    (0.35, 64 * 1024, 4 * 1024 * 1024),
+    (0.50, 16 * 1024 * 1024, 256 * 1024 * 1024),
+)
+
+def make_tree(root, total):
+    """Write a tree of about total bytes: many small files, fewer medium and a few large ones."""
+    rng = random.Random(0)
+    block = rng.randbytes(1024 * 1024)
+    count = 0
+    for share, low, high in STAGE_MIX:
+        remaining = int(total * share)
+        while remaining > 0:
+            size = min(remaining, rng.randint(low, high))
+            directory = os.path.join(root, f'd{count // 500}', f'e{count % 7}')
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f'f{count}.bin'), 'wb') as f:
+                for offset in range(0, size, len(block)):
+                    f.write(block[:min(len(block), size - offset)])
+            remaining -= size
+            count += 1
+    return count
+
+def run_stage(gb, stage_dir=None):
+    """Time copytree and stage.copy_tree (+ verify) of a gb-sized tree into /dev/shm."""
+    target_root = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    source = tempfile.mkdtemp(prefix='vdm-stage-src-', dir=stage_dir)
+    try:
+        files = make_tree(source, int(gb * 1024 ** 3))
+        tree = stage.scan_tree(source)
+        print(f"staging tree: {files} files, {format_size(tree['bytes'])} (source in {source}, page cache warm)")
+        results = []
+        for name in ('shutil.copytree', 'stage.copy_tree', 'stage.verify_tree'):
+            dest = tempfile.mkdtemp(prefix='vdm-stage-dst-', dir=target_root)
+            try:
+                ctx = OperationContext()
+                if name == 'shutil.copytree':
+                    start = time.perf_counter()
+                    shutil.copytree(source, os.path.join(dest, 'tree'), symlinks=True)
+                else:
+                    os.makedirs(os.path.join(dest, 'tree'))
+                    start = time.perf_counter()
+                    stage.copy_tree(ctx, source, os.path.join(dest, 'tree'), tree)
+                    if name == 'stage.verify_tree':
+                        start = time.perf_counter()
+                        mismatches = stage.verify_tree(ctx, source, os.path.join(dest, 'tree'), tree)
+                        assert not mismatches, mismatches[:5]
+                elapsed = time.perf_counter() - start
+            finally:
+                shutil.rmtree(dest, ignore_errors=True)
+            results.append((name, elapsed))
+            print(f"  {name:<18} {elapsed:8.2f} s  {format_size(int(tree['bytes'] / elapsed))}/s")
+        print(f"  speedup over copytree: {results[0][1] / results[1][1]:.2f}x")
+    finally:
+        shutil.rmtree(source, ignore_errors=True)
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the VDM refresh path on synthetic fixtures.')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='comma separated disk counts')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage, the best one counts')
+    parser.add_argument('--no-budget', action='store_true', help='report only, never fail')
+    parser.add_argument('--stage', type=float, metavar='GB', help='benchmark staging a GB-sized tree into tmpfs instead')
+    parser.add_argument('--stage-dir', help='where to build the staging source tree (default: the temp directory)')
+    args = parser.parse_args(argv)
+    if args.stage:
+        return run_stage(args.stage, args.stage_dir)
+    over = []
+    for n in [int(x) for x in args.sizes.split(',')]:
+        results, mounted = run(n, args.repeat)
+        print(f'{n} disks ({mounted} mounted):')
+        for name, elapsed, peak, budget in results:
+            flag = '' if elapsed <= budget else '  OVER BUDGET'
+            print(f'  {name:<28} {elapsed * 1000:9.2f} ms  (budget {budget * 1000:8.1f} ms)  peak {peak / 1024:9.1f} KiB{flag}')
+            if flag:
+                over.append((n, name))
+    if over and not args.no_budget:
+        print('Over budget: ' + ', '.join(f'{name} @ {n}' for n, name in over))
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
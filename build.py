@@ -2,6 +2,8 @@ import os
 import sys
 import shutil
 import subprocess
+import tempfile
+import time
 
 APP_NAME = 'vdm'
 VERSION = '0.1.2 beta'
@@ -60,10 +62,35 @@ def clean():
             os.remove(file)
     print('Cleaned build artifacts.')
 
+# `vdm` CLI: median wall time of `python -m vdm --json list`, in seconds
+STARTUP_BUDGET = 0.5
+STARTUP_RUNS = 5
+GUI_MODULES = ('PySide6', 'qtawesome', 'notify2', 'vdm.app')
+
+def check_startup():
+    """Fail if the CLI imports GUI modules or starts slower than STARTUP_BUDGET."""
+    env = dict(os.environ, VDM_REGISTRY=os.path.join(tempfile.mkdtemp(prefix='vdm-startup-'), 'registry.db'))
+    root = os.path.dirname(os.path.abspath(__file__))
+    probe = f'import sys, vdm.cli; print(" ".join(m for m in sys.modules if any(m == g or m.startswith(g + ".") for g in {GUI_MODULES!r})))'
+    loaded = subprocess.run([sys.executable, '-c', probe], env=env, cwd=root, capture_output=True, text=True, check=True).stdout.split()
+    if loaded:
+        print('CLI imports GUI modules:', ', '.join(loaded))
+        sys.exit(1)
+    times = []
+    for _ in range(STARTUP_RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'vdm', '--json', 'list'], env=env, cwd=root, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    median = sorted(times)[len(times) // 2]
+    print(f'vdm list: median {median * 1000:.0f} ms over {STARTUP_RUNS} runs (budget {STARTUP_BUDGET * 1000:.0f} ms)')
+    if median > STARTUP_BUDGET:
+        sys.exit(1)
+
 def usage():
     print('Usage:')
     print('  python build.py build   # Build the VDM app')
     print('  python build.py clean   # Clean build artifacts')
+    print('  python build.py check-startup   # Enforce the CLI startup budget')
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
@@ -73,5 +100,7 @@ if __name__ == '__main__':
         build()
     elif sys.argv[1] == 'clean':
         clean()
+    elif sys.argv[1] == 'check-startup':
+        check_startup()
     else:
         usage() 
\ No newline at end of file
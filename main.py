@@ -1,8 +1,25 @@
 import sys
+import logging
+
+if len(sys.argv) > 1 and sys.argv[1] == '--vdm-helper':
+    # Frozen builds re-run this executable as the privileged helper
+    from vdm.logic.helper import main as helper_main
+    sys.exit(helper_main(sys.argv[2:]))
+
+from vdm.startup import StartupProfile, mark
+
+# --profile-startup: report per-phase startup timings on stderr and exit after the first scan
+profile = StartupProfile() if '--profile-startup' in sys.argv else None
+if profile is not None:
+    sys.argv.remove('--profile-startup')
+
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QIcon
+from PySide6.QtCore import QTimer
+mark(profile, 'import PySide6')
 from vdm.app import MainWindow
 from vdm.logic.utils import resource_path
+mark(profile, 'import vdm.app')
 
 def apply_dark_theme(app):
     dark_stylesheet = """
@@ -76,9 +93,21 @@ def apply_dark_theme(app):
     app.setStyleSheet(dark_stylesheet)
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(name)s: %(message)s')
     app = QApplication(sys.argv)
+    mark(profile, 'QApplication()')
     apply_dark_theme(app)
     app.setWindowIcon(QIcon(resource_path('icon.ico')))
-    window = MainWindow()
+    mark(profile, 'theme and icon')
+    window = MainWindow(profile=profile)
     window.show()
+    mark(profile, 'show()')
+    if profile is not None:
+        def report():
+            if not window.started:
+                QTimer.singleShot(10, report)
+                return
+            profile.report()
+            app.quit()
+        QTimer.singleShot(0, report)
     sys.exit(app.exec_()) 
\ No newline at end of file
@@ -0,0 +1,76 @@
+import os
+import shutil
+import subprocess
+import pytest
+from vdm.logic import checkpoint
+from vdm.logic.actions import OperationContext
+
+def _gnu_tar():
+    return shutil.which('tar') is not None and b'GNU tar' in subprocess.run(['tar', '--version'], capture_output=True).stdout
+
+pytestmark = pytest.mark.skipif(shutil.which('zstd') is None or not _gnu_tar(), reason='needs zstd and GNU tar')
+
+def _tree(root):
+    found = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root)
+            found[rel] = None if os.path.isdir(path) else open(path, 'rb').read()
+    return found
+
+@pytest.fixture
+def ramdisk(tmp_path, monkeypatch):
+    """A plain directory standing in for a mounted tmpfs."""
+    mountpoint = str(tmp_path / 'ram')
+    os.makedirs(mountpoint)
+    mount = {'mountpoint': mountpoint, 'fstype': 'tmpfs', 'options': {'size': '64m', 'mode': '1777'}}
+    monkeypatch.setattr(checkpoint, 'find_mount', lambda path: mount if path == mountpoint else None)
+    return mountpoint
+
+def test_checkpoint_chain_round_trip(ramdisk, tmp_path):
+    directory = str(tmp_path / 'checkpoints')
+    os.makedirs(os.path.join(ramdisk, 'cache', 'deep'))
+    with open(os.path.join(ramdisk, 'cache', 'deep', 'a.bin'), 'wb') as f:
+        f.write(os.urandom(256 * 1024))
+    with open(os.path.join(ramdisk, 'cache', 'kept.bin'), 'wb') as f:
+        f.write(os.urandom(512 * 1024))
+    with open(os.path.join(ramdisk, 'stale'), 'w') as f:
+        f.write('removed before the second checkpoint')
+    first = checkpoint.checkpoint(OperationContext(), ramdisk, directory)
+    assert first['kind'] == 'full' and first['bytes'] > 768 * 1024
+    # Change, add and delete files, then write an incremental checkpoint
+    with open(os.path.join(ramdisk, 'cache', 'deep', 'a.bin'), 'ab') as f:
+        f.write(b'more')
+    with open(os.path.join(ramdisk, 'new'), 'w') as f:
+        f.write('added later')
+    os.remove(os.path.join(ramdisk, 'stale'))
+    second = checkpoint.checkpoint(OperationContext(), ramdisk, directory)
+    assert second['kind'] == 'incremental' and second['bytes'] < first['bytes']
+    expected = _tree(ramdisk)
+    manifest = checkpoint.load_manifest(checkpoint.disk_directory(directory, ramdisk))
+    assert [entry['file'] for entry in manifest['archives']] == [first['file'], second['file']]
+    assert manifest['size'] == '64m'
+    # The disk comes back empty, as after a reboot
+    shutil.rmtree(ramdisk)
+    os.makedirs(ramdisk)
+    steps = []
+    result = checkpoint.restore(OperationContext(on_step=steps.append), ramdisk, directory)
+    assert steps == ['Restoring checkpoint 1 of 2', 'Restoring checkpoint 2 of 2']
+    assert result['archives'] == 2 and result['bytes'] == first['bytes'] + second['bytes']
+    assert _tree(ramdisk) == expected
+
+def test_full_checkpoint_replaces_the_chain(ramdisk, tmp_path):
+    directory = str(tmp_path / 'checkpoints')
+    with open(os.path.join(ramdisk, 'file'), 'w') as f:
+        f.write('one')
+    checkpoint.checkpoint(OperationContext(), ramdisk, directory)
+    checkpoint.checkpoint(OperationContext(), ramdisk, directory)
+    last = checkpoint.checkpoint(OperationContext(), ramdisk, directory, incremental=False)
+    target = checkpoint.disk_directory(directory, ramdisk)
+    assert [entry['file'] for entry in checkpoint.load_manifest(target)['archives']] == [last['file']]
+    assert sorted(name for name in os.listdir(target) if name.endswith('.tar.zst')) == [last['file']]
+
+def test_restore_without_checkpoint(ramdisk, tmp_path):
+    with pytest.raises(ValueError, match='no checkpoint'):
+        checkpoint.restore(OperationContext(), ramdisk, str(tmp_path / 'nothing'))
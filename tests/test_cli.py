@@ -0,0 +1,95 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+import build
+from vdm import cli
+from vdm.logic import helper, registry
+
+@pytest.fixture(autouse=True)
+def empty_registry(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('VDM_REGISTRY', str(tmp_path / 'registry.db'))
+    monkeypatch.setattr(registry, '_registry', None)
+    yield
+    if registry._registry is not None:
+        registry._registry.close()
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Runs `python -m vdm --json list` and reports what it imported on stderr
+STARTUP_PROBE = '''
+import json, runpy, sys
+sys.argv = ['vdm', '--json', 'list']
+try:
+    runpy.run_module('vdm', run_name='__main__', alter_sys=True)
+except SystemExit as e:
+    code = e.code
+print(json.dumps({'code': code, 'modules': sorted(sys.modules)}), file=sys.stderr)
+'''
+
+def test_cli_does_not_import_the_gui(tmp_path):
+    env = dict(os.environ, VDM_REGISTRY=str(tmp_path / 'registry.db'))
+    proc = subprocess.run([sys.executable, '-c', STARTUP_PROBE], env=env, cwd=ROOT, capture_output=True, text=True, check=True)
+    report = json.loads(proc.stderr.strip().splitlines()[-1])
+    assert report['code'] == cli.EXIT_OK and 'vdm.cli' in report['modules']
+    assert isinstance(json.loads(proc.stdout), list)
+    loaded = [m for m in report['modules'] if any(m == g or m.startswith(g + '.') for g in build.GUI_MODULES)]
+    assert loaded == []
+
+def test_cli_startup_within_budget(tmp_path):
+    env = dict(os.environ, VDM_REGISTRY=str(tmp_path / 'registry.db'))
+    times = []
+    for _ in range(build.STARTUP_RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'vdm', '--json', 'list'], env=env, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    median = sorted(times)[len(times) // 2]
+    assert median <= build.STARTUP_BUDGET, f'vdm list took {median * 1000:.0f} ms (budget {build.STARTUP_BUDGET * 1000:.0f} ms)'
+
+def test_output_options_before_and_after_the_command():
+    parser = cli.build_parser()
+    assert parser.parse_args(['--json', 'list']).json
+    assert parser.parse_args(['list', '--json']).json
+    assert not parser.parse_args(['list']).json
+
+@pytest.mark.parametrize('argv', [
+    [],
+    ['create', 'ram', '12X', '/mnt/ram'],
+    ['export', 'disk.img', 'out.vdmx', '--level', '25'],
+    ['import', 'archive.vdmx'],
+])
+def test_bad_arguments_exit_with_usage(argv, capsys):
+    with pytest.raises(SystemExit) as e:
+        cli.main(argv)
+    assert e.value.code == cli.EXIT_USAGE
+
+def test_list_json(capsys):
+    assert cli.main(['list', '--json']) == cli.EXIT_OK
+    assert isinstance(json.loads(capsys.readouterr().out), list)
+
+def test_unknown_disk_is_not_found(capsys):
+    assert cli.main(['--json', 'unmount', 'missing.img']) == cli.EXIT_NOT_FOUND
+    error = json.loads(capsys.readouterr().out)
+    assert error['ok'] is False and error['code'] == cli.EXIT_NOT_FOUND
+
+def test_import_without_manifest_is_not_found(tmp_path, capsys):
+    assert cli.main(['import', str(tmp_path / 'missing.vdmx'), str(tmp_path / 'disk.img'), str(tmp_path / 'mnt')]) == cli.EXIT_NOT_FOUND
+    assert 'manifest' in capsys.readouterr().err
+
+def test_compact_needs_targets(capsys):
+    assert cli.main(['compact']) == cli.EXIT_USAGE
+
+def test_mount_at_a_new_mountpoint_is_saved(tmp_path, monkeypatch, capsys):
+    # Unprivileged stand-in for the helper: commands are logged, not run
+    monkeypatch.setenv('VDM_HELPER', 'fake')
+    monkeypatch.setattr(helper, '_client', None)
+    image, old, new = str(tmp_path / 'disk.img'), str(tmp_path / 'old'), str(tmp_path / 'new')
+    for directory in (old, new):
+        os.makedirs(directory)
+    registry.get_registry().sync([{'type': 'File', 'device_or_file': image, 'mountpoint': old, 'size': '1G', 'status': 'Unmounted'}])
+    assert cli.main(['--json', 'mount', image, '--mountpoint', new]) == cli.EXIT_OK
+    assert json.loads(capsys.readouterr().out)['disk']['mountpoint'] == new
+    [disk] = registry.get_registry().all()
+    assert disk['mountpoint'] == new
@@ -0,0 +1,129 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import pytest
+from vdm.logic import helper
+from vdm.logic.helper import HelperClient, HelperError
+
+@pytest.fixture
+def client():
+    c = HelperClient(fake=True)
+    yield c
+    c.close()
+
+def test_fake_helper_runs_a_batch_in_order(client, capfd):
+    steps = []
+    results = client.batch([
+        {'op': 'attach', 'path': '/images/a.img', 'step': 'Attaching'},
+        {'op': 'mkdir', 'path': '/mnt/a', 'step': 'Creating mount point'},
+        {'op': 'mount', 'device': {'ref': 0}, 'mountpoint': '/mnt/a', 'step': 'Mounting'},
+    ], on_step=steps.append)
+    assert steps == ['Attaching', 'Creating mount point', 'Mounting']
+    assert [r['returncode'] for r in results] == [0, 0, 0]
+    assert results[0]['stdout'].strip() == '/dev/loop99'
+    logged = [line for line in capfd.readouterr().err.splitlines() if line.startswith('vdm-helper (fake): ')]
+    assert logged[1] == 'vdm-helper (fake): mkdir -p /mnt/a'
+    # {"ref": 0} is the loop device the attach printed
+    assert '/dev/loop99 /mnt/a' in logged[2]
+
+def test_fake_helper_reports_errors(client):
+    with pytest.raises(HelperError, match='unknown operation'):
+        client.batch([{'op': 'mkdir', 'path': '/mnt/a'}, {'op': 'format_everything'}])
+    with pytest.raises(HelperError, match='absolute path required'):
+        client.batch([{'op': 'mkdir', 'path': 'relative/dir'}])
+    # The helper keeps serving after a rejected batch
+    assert client.batch([{'op': 'rmdir', 'path': '/mnt/a'}])[0]['returncode'] == 0
+
+def test_failing_command_stops_the_batch(tmp_path):
+    missing = str(tmp_path / 'missing')
+    reply = helper.execute_batch([
+        {'op': 'rmdir', 'path': missing},
+        {'op': 'mkdir', 'path': str(tmp_path / 'never')},
+    ], lambda message: None)
+    assert reply['event'] == 'error' and reply['index'] == 0
+    assert reply['argv'] == ['rmdir', missing] and reply['returncode'] != 0
+    assert not (tmp_path / 'never').exists()
+    # check=False carries on
+    reply = helper.execute_batch([{'op': 'rmdir', 'path': missing, 'check': False}], lambda message: None)
+    assert reply['event'] == 'done'
+
+def test_peer_uid_reads_so_peercred():
+    a, b = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    with a, b:
+        assert helper._peer_uid(a) == os.getuid()
+
+@pytest.fixture
+def server():
+    """Fake helper served from a thread; it stops when its stand-in parent exits."""
+    # Outside pytest's private tmp_path so another user can reach the socket
+    directory = tempfile.TemporaryDirectory()
+    os.chmod(directory.name, 0o755)
+    path = os.path.join(directory.name, 'helper.sock')
+    parent = subprocess.Popen(['sleep', '60'])
+    thread = threading.Thread(target=helper.serve, args=(path, os.getuid(), parent.pid, True), daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not os.path.exists(path) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield path
+    parent.kill()
+    parent.wait()
+    thread.join(3)
+    directory.cleanup()
+
+def _request(path, batch):
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with conn:
+        conn.settimeout(5)
+        conn.connect(path)
+        data = b''
+        try:
+            conn.sendall(json.dumps({'batch': batch}).encode() + b'\n')
+            while True:
+                chunk = conn.recv(65536)
+                if not chunk:
+                    return data
+                data += chunk
+        except (BrokenPipeError, ConnectionResetError):
+            # Closed before reading the request
+            return data
+
+def test_request_from_another_uid_is_rejected(server, monkeypatch):
+    assert b'"done"' in _request(server, [{'op': 'mkdir', 'path': '/mnt/a'}])
+    # Neither root nor the owner: the connection is closed without running anything
+    monkeypatch.setattr(helper, '_peer_uid', lambda conn: 54321)
+    assert _request(server, [{'op': 'mkdir', 'path': '/mnt/a'}]) == b''
+
+@pytest.mark.skipif(os.geteuid() != 0, reason='needs root to connect as another user')
+def test_real_connection_from_another_uid_is_rejected(server):
+    os.chmod(server, 0o666)
+    probe = f'''
+import os, socket, sys
+os.setgid(65534)
+os.setuid(65534)
+conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+conn.connect({server!r})
+try:
+    conn.sendall(b'{{"batch": [{{"op": "mkdir", "path": "/mnt/a"}}]}}\\n')
+    sys.stdout.write(repr(conn.recv(65536)))
+except (BrokenPipeError, ConnectionResetError):
+    sys.stdout.write(repr(b''))
+'''
+    probe = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, timeout=10)
+    assert probe.returncode == 0, probe.stderr
+    assert probe.stdout == "b''"
+
+def test_allocate_creates_exclusively(tmp_path):
+    image = tmp_path / 'disk.img'
+    image.write_bytes(b'keep me')
+    reply = helper.execute_batch([{'op': 'allocate', 'path': str(image), 'size': 1 << 20, 'mode': 'sparse', 'create': True}], lambda message: None)
+    assert reply['event'] == 'error' and 'File exists' in reply['stderr']
+    assert image.read_bytes() == b'keep me'
+    # Growing an existing image (resize) still works
+    reply = helper.execute_batch([{'op': 'allocate', 'path': str(image), 'size': 1 << 20, 'mode': 'sparse'}], lambda message: None)
+    assert reply['event'] == 'done' and image.stat().st_size == 1 << 20
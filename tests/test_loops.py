@@ -0,0 +1,54 @@
+import os
+import shutil
+import bench
+from vdm.logic.loops import scan_loops, find_loop
+
+def _image(root, i):
+    return os.path.join(str(root), 'images', f'disk {i}.img')
+
+def test_backing_files_map_to_their_loops(tmp_path):
+    _, sysfs, _ = bench.make_fixtures(str(tmp_path), 12)
+    index = scan_loops(sysfs)
+    # Every fourth disk has no loop device
+    assert sorted(entry['name'] for entry in index.values()) == sorted(f'loop{i}' for i in range(12) if i % 4 != 3)
+    entry = find_loop(index, _image(tmp_path, 5))
+    assert entry['device'] == '/dev/loop5' and entry['devno'] == '7:5'
+    assert entry['backing_file'] == _image(tmp_path, 5)
+    assert entry['offset'] == 0 and entry['sizelimit'] == 0 and not entry['deleted']
+    assert find_loop(index, _image(tmp_path, 3)) is None
+
+def test_lookup_by_another_path_to_the_image(tmp_path):
+    _, sysfs, _ = bench.make_fixtures(str(tmp_path), 4)
+    link = tmp_path / 'link.img'
+    link.symlink_to(_image(tmp_path, 1))
+    assert find_loop(scan_loops(sysfs), str(link))['device'] == '/dev/loop1'
+
+def test_deleted_backing_file(tmp_path):
+    _, sysfs, _ = bench.make_fixtures(str(tmp_path), 4)
+    with open(os.path.join(sysfs, 'loop2', 'loop', 'backing_file'), 'w') as f:
+        f.write(_image(tmp_path, 2) + ' (deleted)\n')
+    entry = find_loop(scan_loops(sysfs), _image(tmp_path, 2))
+    assert entry['device'] == '/dev/loop2' and entry['deleted']
+    assert entry['backing_file'] == _image(tmp_path, 2)
+
+def test_profile_and_mapper_fields(tmp_path):
+    _, sysfs, _ = bench.make_fixtures(str(tmp_path), 12)
+    index = scan_loops(sysfs)
+    # Disks 0 and 10 are LUKS encrypted, with a dm device stacked on the loop
+    for i, dm in ((0, 'disk 0.img_luks'), (10, 'disk 10.img_luks')):
+        entry = find_loop(index, _image(tmp_path, i))
+        assert entry['mapper'] == f'/dev/mapper/{dm}'
+        assert entry['mapper_devno'].startswith('253:')
+    plain = find_loop(index, _image(tmp_path, 1))
+    assert plain['mapper'] is None and plain['mapper_devno'] is None
+    assert plain['direct_io'] and not find_loop(index, _image(tmp_path, 2))['direct_io']
+    assert (plain['sector_size'], plain['read_ahead_kb'], plain['nr_requests']) == (4096, 128, 128)
+
+def test_lowest_loop_wins_for_a_file_attached_twice(tmp_path):
+    _, sysfs, _ = bench.make_fixtures(str(tmp_path), 4)
+    # loop100 sorts after loop2 numerically, before it as a string
+    shutil.copytree(os.path.join(sysfs, 'loop2'), os.path.join(sysfs, 'loop100'))
+    assert find_loop(scan_loops(sysfs), _image(tmp_path, 2))['device'] == '/dev/loop2'
+
+def test_missing_sysfs(tmp_path):
+    assert scan_loops(str(tmp_path / 'nothing')) == {}
@@ -0,0 +1,22 @@
+from vdm.logic.mounts import parse_mountinfo, parse_options
+
+MOUNTINFO = (
+    '22 1 0:21 / /proc rw,nosuid,nodev,noexec,relatime shared:12 - proc proc rw\n'
+    '35 22 0:31 / /mnt/my\\040disk rw,relatime shared:5 master:1 - tmpfs tmpfs rw,size=1048576k,mode=755\n'
+    '41 22 7:0 /sub /mnt/loop ro - ext4 /dev/loop0 rw,errors=remount-ro\n'
+    'garbage line\n'
+)
+
+def test_parse_options():
+    assert parse_options('rw,size=1g,,mode=755') == {'rw': True, 'size': '1g', 'mode': '755'}
+
+def test_parse_mountinfo():
+    proc, tmpfs, loop = parse_mountinfo(MOUNTINFO)
+    assert proc['fstype'] == 'proc' and proc['id'] == 22 and proc['parent'] == 1
+    # Optional fields of any count before the separator, escaped spaces in paths
+    assert tmpfs['mountpoint'] == '/mnt/my disk'
+    assert tmpfs['device'] == 'tmpfs' and tmpfs['devno'] == '0:31'
+    # Per-mount and superblock options are merged
+    assert tmpfs['options']['size'] == '1048576k' and tmpfs['options']['relatime'] is True
+    assert loop['root'] == '/sub' and loop['device'] == '/dev/loop0'
+    assert loop['options']['ro'] is True and loop['options']['errors'] == 'remount-ro'
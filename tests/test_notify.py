@@ -0,0 +1,125 @@
+import time
+import pytest
+from vdm.logic import notify
+from vdm.logic.notify import Notifier, Notify2Backend, SUMMARY_KEY
+
+class FakeDaemon:
+    """Backend that records what would be shown."""
+
+    def __init__(self):
+        self.shown = []
+
+    def show(self, key, title, message, icon=None, urgency=None):
+        self.shown.append((key, title, message))
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+def _wait_for(daemon, count, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while len(daemon.shown) < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+def test_burst_is_coalesced_and_keys_replace():
+    daemon = FakeDaemon()
+    n = Notifier(daemon, coalesce=0.3)
+    n.notify('Mount', 'first', key='op')
+    n.notify('Other', 'x')
+    n.notify('Mount', 'second', key='op')
+    _wait_for(daemon, 2)
+    time.sleep(0.1)
+    n.close()
+    # One popup per key, with the latest text, in the order the keys were last used
+    assert daemon.shown == [(None, 'Other', 'x'), ('op', 'Mount', 'second')]
+
+def test_more_than_burst_limit_becomes_one_summary():
+    daemon = FakeDaemon()
+    n = Notifier(daemon, coalesce=0.3, burst_limit=3)
+    for i in range(5):
+        n.notify(f'Disk {i}', 'mounted')
+    _wait_for(daemon, 1)
+    time.sleep(0.1)
+    n.close()
+    assert len(daemon.shown) == 1
+    key, title, message = daemon.shown[0]
+    assert key == SUMMARY_KEY and title == '5 notifications'
+    assert message.splitlines() == [f'Disk {i}: mounted' for i in range(5)]
+
+def test_token_bucket_holds_back_and_folds_into_the_summary(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(notify, 'time', clock)
+    daemon = FakeDaemon()
+    n = Notifier(daemon, rate_burst=2, rate_seconds=10)
+    n._deliver([('a', 'A', '1', None, None), ('b', 'B', '2', None, None)])
+    assert [title for _, title, _ in daemon.shown] == ['A', 'B']
+    # Bucket empty: held back, nothing shown
+    n._deliver([('c', 'C', '3', None, None)])
+    n._deliver([('d', 'D', '4', None, None)])
+    assert len(daemon.shown) == 2
+    assert n._next_token() == pytest.approx(10)
+    # One token later the held ones come out together
+    clock.now += 10
+    n._deliver([])
+    assert len(daemon.shown) == 3
+    key, title, message = daemon.shown[-1]
+    assert key == SUMMARY_KEY and title == '2 notifications'
+    assert message.splitlines() == ['C: 3', 'D: 4']
+    # A single notification with a token to spare is shown as itself
+    clock.now += 10
+    n._deliver([('e', 'E', '5', None, None)])
+    assert daemon.shown[-1] == ('e', 'E', '5')
+
+def test_close_delivers_what_is_held(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(notify, 'time', clock)
+    daemon = FakeDaemon()
+    n = Notifier(daemon, rate_burst=1, rate_seconds=60)
+    n._deliver([('a', 'A', '1', None, None)])
+    n._deliver([('b', 'B', '2', None, None)])
+    assert len(daemon.shown) == 1
+    n._deliver([], force=True)
+    assert daemon.shown[-1] == ('b', 'B', '2')
+
+def test_daemon_errors_are_ignored():
+    class Broken:
+        def show(self, *args):
+            raise RuntimeError('no session bus')
+
+    n = Notifier(Broken(), coalesce=0.05)
+    n.notify('Mount', 'done')
+    n.close()
+
+def test_backend_remembers_a_bounded_number_of_keys():
+    created = []
+
+    class FakeNotification:
+        def __init__(self, title, message, icon):
+            self.updates = 0
+            created.append(self)
+
+        def update(self, title, message, icon):
+            self.updates += 1
+
+        def set_urgency(self, urgency):
+            pass
+
+        def show(self):
+            pass
+
+    class FakeNotify2:
+        URGENCY_NORMAL = 1
+        Notification = FakeNotification
+
+    backend = Notify2Backend(shown_limit=4)
+    backend._notify2 = FakeNotify2
+    for i in range(10):
+        backend.show(f'k{i}', 'Title', 'message')
+    assert list(backend._shown) == ['k6', 'k7', 'k8', 'k9']
+    backend.show('k6', 'Title', 'again')
+    assert created[6].updates == 1 and list(backend._shown)[-1] == 'k6'
+    backend.show(None, 'Title', 'no key')
+    assert len(backend._shown) == 4
@@ -0,0 +1,67 @@
+import pytest
+from vdm.logic.registry import DiskRegistry, TRANSIENT_KEYS
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    # No legacy discos.json to migrate from the working directory
+    monkeypatch.chdir(tmp_path)
+    reg = DiskRegistry(str(tmp_path / 'registry.db'))
+    yield reg
+    reg.close()
+
+def _disk(**extra):
+    disk = {'type': 'File', 'device_or_file': '/images/a.img', 'mountpoint': '/mnt/a', 'size': '1G', 'status': 'Mounted'}
+    disk.update(extra)
+    return disk
+
+def test_unchanged_sync_writes_nothing(registry):
+    discos = [_disk(), _disk(device_or_file='/images/b.img', mountpoint='/mnt/b')]
+    assert registry.sync(discos) == 2
+    before = registry._db.total_changes
+    assert registry.sync(discos) == 0
+    assert registry.sync([dict(d) for d in discos]) == 0
+    assert registry._db.total_changes == before
+
+def test_live_readings_are_not_persisted(registry):
+    disk = _disk()
+    registry.sync([disk])
+    before = registry._db.total_changes
+    for n, key in enumerate(TRANSIENT_KEYS):
+        disk[key] = f'reading {n}'
+        assert registry.sync([disk]) == 0
+    assert registry._db.total_changes == before
+    assert registry.get('/images/a.img', '/mnt/a') == _disk()
+
+def test_changed_and_removed_entries(registry):
+    a, b = _disk(), _disk(device_or_file='/images/b.img', mountpoint='/mnt/b')
+    registry.sync([a, b])
+    a['status'] = 'Unmounted'
+    assert registry.sync([a, b]) == 1
+    assert registry.get('/images/a.img', '/mnt/a')['status'] == 'Unmounted'
+    assert registry.sync([a]) == 1
+    assert registry.get('/images/b.img', '/mnt/b') is None
+
+def test_reopened_registry_knows_what_is_stored(registry, tmp_path):
+    discos = [_disk()]
+    registry.sync(discos)
+    registry.close()
+    reopened = DiskRegistry(str(tmp_path / 'registry.db'))
+    try:
+        loaded = reopened.all()
+        assert loaded == discos
+        assert reopened.sync(loaded) == 0
+    finally:
+        reopened.close()
+
+def test_fresh_registry_syncs_against_the_table(registry, tmp_path):
+    a, b = _disk(), _disk(device_or_file='/images/b.img', mountpoint='/mnt/b')
+    registry.sync([a, b])
+    registry.close()
+    # No all() first: sync still knows both rows and drops the one that is gone
+    reopened = DiskRegistry(str(tmp_path / 'registry.db'))
+    try:
+        assert reopened.sync([a, b]) == 0
+        assert reopened.sync([a]) == 1
+        assert reopened.get('/images/b.img', '/mnt/b') is None
+    finally:
+        reopened.close()
@@ -0,0 +1,120 @@
+import pytest
+from vdm.logic.sampler import UsageHistory, UsageSampler
+
+GB = 1024 ** 3
+
+def test_history_wraps_around():
+    history = UsageHistory(size=4)
+    assert history.latest() is None
+    for t in range(6):
+        history.append(t, t * 10, 100, t, 1000)
+    assert history.count == 4
+    # Oldest two were overwritten; age 0 is the newest
+    assert [history.sample(age)[0] for age in range(4)] == [5, 4, 3, 2]
+    assert history.latest() == (5, 50, 100, 5, 1000)
+    with pytest.raises(IndexError):
+        history.sample(4)
+
+def test_rates_use_only_the_window():
+    history = UsageHistory(size=8)
+    assert history.rates() == (0.0, 0.0)
+    # Fast growth long ago, then 1 byte/s and 2 inodes/s over the last 30 s
+    history.append(0, 0, 1000, 0, 1000)
+    history.append(10, 500, 1000, 0, 1000)
+    for t in (20, 30, 40, 50):
+        history.append(t, 500 + (t - 20), 1000, (t - 20) * 2, 1000)
+    assert history.rates(window=30) == (1.0, 2.0)
+
+class FakeDisks:
+    """Stands in for statvfs: usage[mountpoint] = (used, total, inodes used, inodes total)."""
+
+    def __init__(self):
+        self.usage = {}
+
+    def __call__(self, mountpoint):
+        if mountpoint not in self.usage:
+            raise FileNotFoundError(mountpoint)
+        return self.usage[mountpoint]
+
+def _run(sampler, disks, mountpoint, series, step=5.0, inodes=(0, 1000)):
+    """Feed used-byte readings one step apart; returns every alert raised."""
+    alerts = []
+    for n, used in enumerate(series):
+        disks.usage[mountpoint] = (used, 10 * GB) + inodes
+        alerts += sampler.sample([mountpoint], now=n * step)[0]
+    return alerts
+
+def test_forecast_alerts_once_for_a_filling_disk():
+    disks = FakeDisks()
+    sampler = UsageSampler(usage=disks, horizon=600)
+    # 10 MB/s into 10 GB: full in well under the horizon once it is 5 GB in
+    alerts = _run(sampler, disks, '/mnt/a', [5 * GB + n * 50 * 1024 ** 2 for n in range(6)])
+    assert [a['kind'] for a in alerts] == ['forecast']
+    eta = sampler.time_to_full('/mnt/a')
+    assert eta == pytest.approx((10 * GB - (5 * GB + 250 * 1024 ** 2)) / (10 * 1024 ** 2))
+    assert alerts[0]['time_to_full'] < 600
+    assert sampler.fill_rate == pytest.approx(10 * 1024 ** 2 / (10 * GB))
+
+def test_flat_and_shrinking_series_do_not_forecast():
+    disks = FakeDisks()
+    sampler = UsageSampler(usage=disks)
+    assert _run(sampler, disks, '/mnt/flat', [5 * GB] * 5) == []
+    assert sampler.time_to_full('/mnt/flat') is None
+    assert sampler.fill_rate == 0.0
+    sampler = UsageSampler(usage=disks)
+    assert _run(sampler, disks, '/mnt/shrink', [5 * GB - n * GB // 10 for n in range(5)]) == []
+    assert sampler.time_to_full('/mnt/shrink') is None
+
+def test_forecast_is_rearmed_once_the_disk_calms_down():
+    disks = FakeDisks()
+    sampler = UsageSampler(usage=disks, horizon=600)
+    filling = [5 * GB + n * 50 * 1024 ** 2 for n in range(6)]
+    assert len(_run(sampler, disks, '/mnt/a', filling)) == 1
+    # Still filling: no repeat
+    assert sampler.sample(['/mnt/a'], now=30.0)[0] == []
+    # Flat for longer than the rate window clears the forecast, new growth alerts again
+    flat = [filling[-1]] * 10
+    for n, used in enumerate(flat):
+        disks.usage['/mnt/a'] = (used, 10 * GB, 0, 1000)
+        assert sampler.sample(['/mnt/a'], now=35.0 + n * 5)[0] == []
+    disks.usage['/mnt/a'] = (filling[-1] + GB, 10 * GB, 0, 1000)
+    assert [a['kind'] for a in sampler.sample(['/mnt/a'], now=85.0)[0]] == ['forecast']
+
+def test_threshold_alert_and_rearm():
+    disks = FakeDisks()
+    sampler = UsageSampler(usage=disks, threshold=0.9)
+    disks.usage['/mnt/a'] = (int(9.5 * GB), 10 * GB, 0, 1000)
+    alerts, changed = sampler.sample(['/mnt/a'], now=0)
+    assert changed and [(a['kind'], a['percent']) for a in alerts] == [('threshold', 0.95)]
+    assert sampler.sample(['/mnt/a'], now=5) == ([], False)
+    # Below the threshold re-arms it
+    disks.usage['/mnt/a'] = (5 * GB, 10 * GB, 0, 1000)
+    sampler.sample(['/mnt/a'], now=100)
+    disks.usage['/mnt/a'] = (int(9.5 * GB), 10 * GB, 0, 1000)
+    assert [a['kind'] for a in sampler.sample(['/mnt/a'], now=200)[0]][0] == 'threshold'
+
+def test_inode_alerts():
+    disks = FakeDisks()
+    sampler = UsageSampler(usage=disks, threshold=0.9, horizon=600)
+    # Few bytes, many small files: 950 of 1000 inodes used
+    disks.usage['/mnt/a'] = (GB, 10 * GB, 950, 1000)
+    assert [a['kind'] for a in sampler.sample(['/mnt/a'], now=0)[0]] == ['inodes']
+    # 20 inodes/s into 10 000: the rest are gone in minutes, alerted on the second sample
+    sampler = UsageSampler(usage=disks, threshold=0.9, horizon=600)
+    alerts = []
+    for n in range(3):
+        disks.usage['/mnt/b'] = (GB, 10 * GB, 1000 + n * 100, 10000)
+        alerts += sampler.sample(['/mnt/b'], now=n * 5.0)[0]
+    assert [a['kind'] for a in alerts] == ['inodes_forecast']
+    assert alerts[0]['time_to_full'] == pytest.approx((10000 - 1100) / 20.0)
+
+def test_unmounted_disks_are_forgotten():
+    disks = FakeDisks()
+    sampler = UsageSampler(usage=disks)
+    disks.usage['/mnt/a'] = (int(9.5 * GB), 10 * GB, 0, 1000)
+    sampler.sample(['/mnt/a'], now=0)
+    # statvfs failing skips the disk; leaving the list forgets it and its alerts
+    assert sampler.sample(['/mnt/a', '/mnt/gone'], now=5)[0] == []
+    sampler.sample([], now=10)
+    assert sampler.histories == {} and sampler.raised == set()
+    assert [a['kind'] for a in sampler.sample(['/mnt/a'], now=15)[0]] == ['threshold']
@@ -0,0 +1,26 @@
+from vdm.logic import stage
+
+def test_large_files_get_a_task_each():
+    files = [('big1', stage.LARGE_FILE), ('small', 10), ('big2', stage.LARGE_FILE * 3)]
+    assert list(stage._batches(files)) == [['big1'], ['big2'], ['small']]
+
+def test_small_files_are_grouped_by_count():
+    files = [(f'f{i}', 1) for i in range(stage.BATCH_FILES * 2 + 5)]
+    batches = list(stage._batches(files))
+    assert [len(batch) for batch in batches] == [stage.BATCH_FILES, stage.BATCH_FILES, 5]
+    assert [rel for batch in batches for rel in batch] == [rel for rel, _ in files]
+
+def test_small_files_are_grouped_by_bytes():
+    size = stage.LARGE_FILE - 1
+    files = [(f'f{i}', size) for i in range(6)]
+    batches = list(stage._batches(files))
+    per_batch = -(-stage.BATCH_BYTES // size)
+    assert len(batches[0]) == per_batch
+    assert sum(len(batch) for batch in batches) == 6
+
+def test_stage_size_has_headroom_and_a_floor():
+    empty = {'allocated': 0, 'dirs': [], 'links': []}
+    assert stage.stage_size(empty) == f'{stage.MIN_SIZE_MB}M'
+    tree = {'allocated': 1000 * 1024 * 1024, 'dirs': ['a'] * 256, 'links': []}
+    # (1000 MiB + 256 pages) * 1.1, rounded up
+    assert stage.stage_size(tree) == '1102M'
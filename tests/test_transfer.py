@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import pytest
+from vdm.logic import transfer
+from vdm.logic.actions import OperationContext
+
+pytestmark = pytest.mark.skipif(shutil.which('zstd') is None, reason='zstd is not installed')
+
+MB = 1024 * 1024
+SIZE = 64 * MB
+
+@pytest.fixture
+def image(tmp_path):
+    """Sparse image: random data, a written run of zeros, a hole, more data and a short tail."""
+    path = str(tmp_path / 'disk.img')
+    with open(path, 'wb') as f:
+        f.truncate(SIZE)
+        f.write(os.urandom(3 * MB))
+        f.seek(8 * MB)
+        f.write(bytes(transfer.CHUNK))
+        f.seek(40 * MB)
+        f.write(os.urandom(5 * MB + 123))
+    return path
+
+def _disk(path):
+    return {'type': 'File', 'device_or_file': path, 'mountpoint': '/mnt/disk', 'size': '64M', 'status': 'Unmounted',
+            'encrypted': False, 'filesystem': 'ext4', 'allocation': 'preallocated', 'snapshots': []}
+
+def _digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _export(tmp_path, image):
+    archive = str(tmp_path / 'disk.vdmx')
+    result = transfer.export_file_disk(OperationContext(), _disk(image), archive)
+    return archive, result
+
+def _rewrite_stream(archive, edit):
+    """Decompress archive, apply edit() to the raw stream and compress it back."""
+    raw = subprocess.run(['zstd', '-q', '-d', '-c', archive], check=True, capture_output=True).stdout
+    subprocess.run(['zstd', '-q', '-f', '-o', archive], input=edit(raw), check=True)
+
+def test_round_trip(tmp_path, image):
+    archive, result = _export(tmp_path, image)
+    manifest = transfer.load_manifest(archive)
+    assert manifest['image_size'] == SIZE
+    assert manifest['disk']['filesystem'] == 'ext4'
+    # The written zeros are left out like the holes
+    assert all(offset != 8 * MB for offset, _, _ in manifest['chunks'])
+    # Data ranges end on a filesystem block
+    assert 8 * MB + 123 <= manifest['data_bytes'] <= 8 * MB + 64 * 1024
+    assert result['chunks'] == len(manifest['chunks'])
+    target = str(tmp_path / 'copy.img')
+    unpacked = transfer.unpack_image(OperationContext(), archive, target)
+    assert unpacked['bytes'] == manifest['data_bytes']
+    assert _digest(target) == _digest(image)
+    assert os.stat(target).st_blocks * 512 < SIZE
+
+def test_manifest_of_another_format(tmp_path, image):
+    archive, _ = _export(tmp_path, image)
+    with open(transfer.manifest_path(archive), 'w') as f:
+        json.dump({'format': 99}, f)
+    with pytest.raises(ValueError):
+        transfer.load_manifest(archive)
+    with pytest.raises(ValueError):
+        transfer.load_manifest(str(tmp_path / 'missing.vdmx'))
+
+def test_tampered_chunk_is_rejected(tmp_path, image):
+    archive, _ = _export(tmp_path, image)
+
+    def flip(raw):
+        # A byte in the data of the first chunk, after the magic and its frame header
+        at = len(transfer.MAGIC) + transfer._FRAME.size + 100
+        return raw[:at] + bytes([raw[at] ^ 0xFF]) + raw[at + 1:]
+
+    _rewrite_stream(archive, flip)
+    target = str(tmp_path / 'copy.img')
+    with pytest.raises(ValueError, match='checksum mismatch'):
+        transfer.unpack_image(OperationContext(), archive, target)
+    assert not os.path.exists(target)
+
+def test_tampered_manifest_is_rejected(tmp_path, image):
+    archive, _ = _export(tmp_path, image)
+    manifest = transfer.load_manifest(archive)
+    manifest['chunks'][-1][2] = '0' * 128
+    with open(transfer.manifest_path(archive), 'w') as f:
+        json.dump(manifest, f)
+    target = str(tmp_path / 'copy.img')
+    with pytest.raises(ValueError, match='checksum mismatch'):
+        transfer.unpack_image(OperationContext(), archive, target)
+    assert not os.path.exists(target)
+
+def test_truncated_stream_is_rejected(tmp_path, image):
+    archive, _ = _export(tmp_path, image)
+    _rewrite_stream(archive, lambda raw: raw[:len(raw) // 2])
+    target = str(tmp_path / 'copy.img')
+    with pytest.raises(ValueError, match='truncated'):
+        transfer.unpack_image(OperationContext(), archive, target)
+    assert not os.path.exists(target)
+
+def test_truncated_archive_file_is_rejected(tmp_path, image):
+    archive, _ = _export(tmp_path, image)
+    with open(archive, 'r+b') as f:
+        f.truncate(os.path.getsize(archive) // 2)
+    target = str(tmp_path / 'copy.img')
+    with pytest.raises((ValueError, subprocess.CalledProcessError)):
+        transfer.unpack_image(OperationContext(), archive, target)
+    assert not os.path.exists(target)
+
+def test_extra_data_is_rejected(tmp_path, image):
+    archive, _ = _export(tmp_path, image)
+    manifest = transfer.load_manifest(archive)
+    manifest['chunks'].pop()
+    with open(transfer.manifest_path(archive), 'w') as f:
+        json.dump(manifest, f)
+    target = str(tmp_path / 'copy.img')
+    with pytest.raises(ValueError):
+        transfer.unpack_image(OperationContext(), archive, target)
+    assert not os.path.exists(target)
+
+def test_existing_image_is_not_overwritten(tmp_path, image):
+    archive, _ = _export(tmp_path, image)
+    with pytest.raises(FileExistsError):
+        transfer.unpack_image(OperationContext(), archive, image)
+    assert os.path.getsize(image) == SIZE
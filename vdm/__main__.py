@@ -0,0 +1,4 @@
+import sys
+from vdm.cli import main
+
+sys.exit(main())
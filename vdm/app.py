@@ -1,54 +1,23 @@
 import os
 import datetime
 import subprocess
-from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, QMessageBox, QLabel, QInputDialog, QHeaderView, QComboBox, QCheckBox, QToolButton, QDialog, QLineEdit, QAbstractItemView, QListWidget, QListWidgetItem)
-from PySide6.QtCore import Qt, QSize, QTimer
+from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QTableWidget, QTableWidgetItem, QMessageBox, QLabel, QInputDialog, QHeaderView, QComboBox, QCheckBox, QToolButton, QDialog, QLineEdit, QAbstractItemView, QProgressBar)
+from PySide6.QtCore import Qt, QSize, QTimer, QObject, Signal, QEvent
 from PySide6.QtGui import QFont
-import qtawesome as qta
 from vdm.logic.utils import resource_path, format_size, get_disk_usage, send_notification
-from vdm.logic.disks import load_disks, save_disks, add_disk, remove_disk, sync_disks_status, size_to_mb
-from vdm.dialogs import RamDiskDialog, FileDiskDialog, show_full_license
-from vdm.createdisk import ModernCreateDiskDialog
+from vdm.logic.disks import load_disks, save_disks, add_disk, remove_disk, sync_disks_status, list_disks, size_to_mb, REGISTERED_TYPES
+from vdm.logic import actions, tmpfs
+from vdm.logic.mounts import find_mount
+from vdm.logic.registry import get_registry
+from vdm.logic.watch import DiskWatcher, sample_interval
+from vdm.operations import OperationQueue
+from vdm.disklist import DiskListView, DiskListModel, ROW_ICONS, disk_key
+from vdm import icons
+from vdm.startup import mark
 
-# Custom widget para cada disco
-class DiskListItem(QWidget):
-    def __init__(self, icon, disk_type, device, mountpoint, size, status_icon, status_text, encrypted=False):
-        super().__init__()
-        self.setStyleSheet('background: transparent;')
-        self.disk_encrypted = encrypted
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(12, 4, 12, 4)
-        layout.setSpacing(16)
-        icon_label = QLabel()
-        icon_label.setPixmap(icon.pixmap(24, 24))
-        layout.addWidget(icon_label)
-        text = f"<b>{disk_type}</b>  |  {device}  |  {mountpoint}  |  {size}  "
-        info_label = QLabel(text)
-        info_label.setStyleSheet('background: transparent; color: #e0e0e0; font-size: 15px;')
-        layout.addWidget(info_label)
-        layout.addStretch()
-        status_layout = QHBoxLayout()
-        status_layout.setSpacing(4)
-        if self.disk_encrypted:
-            lock_label = QLabel()
-            lock_label.setPixmap(qta.icon('fa5s.lock', color='white').pixmap(16, 16))
-            status_layout.addWidget(lock_label)
-        status_label = QLabel()
-        status_label.setPixmap(status_icon.pixmap(18, 18))
-        status_layout.addWidget(status_label)
-        status_text_label = QLabel(status_text)
-        status_text_label.setStyleSheet('background: transparent; color: #e0e0e0; font-size: 14px;')
-        status_layout.addWidget(status_text_label)
-        status_layout.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
-        layout.addLayout(status_layout)
-
-class DiskListWidget(QListWidget):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.setStyleSheet('QListWidget { background: #111112; color: #e0e0e0; border: none; font-size: 14px; }')
-        self.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
-        self.setAlternatingRowColors(False)
-        self.setSpacing(2)
+class DiskEvents(QObject):
+    """Carries DiskWatcher callbacks from its thread into the Qt event loop."""
+    changed = Signal(object)
 
 class CentralWidget(QWidget):
     def __init__(self, parent=None, table=None):
@@ -63,22 +32,59 @@ class CentralWidget(QWidget):
         super().mousePressEvent(event)
 
 class MainWindow(QMainWindow):
-    SYSTEM_MOUNTPOINTS = [
-        '/run', '/dev/shm', '/run/credentials/systemd-journald.service', '/tmp', '/run/user/1000', '/run/user', '/var/tmp', '/var/run', '/var/lock'
-    ]
-    def __init__(self):
+    def __init__(self, profile=None):
         super().__init__()
+        self.profile = profile
         self.setWindowTitle('Virtual Disk Manager')
         self.setGeometry(100, 100, 800, 500)
-        self.discos_json = 'discos.json'
-        self.discos = load_disks(self.discos_json)
+        self.registry = get_registry()
+        self.discos = []
+        self.sampler = None
+        self.operations = OperationQueue(self)
         self.init_ui()
-        self.update_table()
-        # Monitoramento automático
+        # Monitoramento automático: refresh on mount/loop events, sample usage adaptively
+        self.disk_events = DiskEvents(self)
+        self.disk_events.changed.connect(self.on_disks_changed)
+        self.watcher = DiskWatcher(self.disk_events.changed.emit)
         self.monitor_timer = QTimer(self)
+        self.monitor_timer.setSingleShot(True)
         self.monitor_timer.timeout.connect(self.monitor_disks)
-        self.monitor_timer.start(15000)  # 15 segundos
-        self.notified_full = set()
+        self.started = False
+        mark(profile, 'MainWindow()')
+
+    def finish_startup(self):
+        """Second half of the startup, run once the window is on screen."""
+        if self.started:
+            return
+        self.started = True
+        self.repaint()
+        mark(self.profile, 'first paint')
+        self.load_icons()
+        mark(self.profile, 'icons')
+        self.discos = load_disks(self.registry)
+        self.update_table()
+        mark(self.profile, 'first disk scan')
+        self.watcher.start()
+        from vdm.logic.sampler import UsageSampler
+        self.sampler = UsageSampler()
+        self.monitor_timer.start(0)
+        mark(self.profile, 'watcher')
+
+    def load_icons(self):
+        self.btn_create_disk.setIcon(icons.icon('fa5s.plus-circle'))
+        self.btn_mount.setIcon(icons.icon('fa5s.play'))
+        self.btn_unmount.setIcon(icons.icon('fa5s.eject'))
+        self.btn_delete.setIcon(icons.icon('fa5s.trash'))
+        self.btn_show_system.setIcon(icons.icon('fa5s.server'))
+        self.btn_edit.setIcon(icons.icon('fa5s.edit'))
+        self.btn_checkpoint.setIcon(icons.icon('fa5s.save'))
+        self.btn_restore.setIcon(icons.icon('fa5s.history'))
+        self.btn_snapshots.setIcon(icons.icon('fa5s.clone'))
+        self.btn_compact.setIcon(icons.icon('fa5s.compress-arrows-alt'))
+        self.btn_export.setIcon(icons.icon('fa5s.file-export'))
+        self.btn_import.setIcon(icons.icon('fa5s.file-import'))
+        self.btn_about.setIcon(icons.icon('fa5s.info-circle'))
+        icons.warm(ROW_ICONS, self.devicePixelRatioF())
 
     def init_ui(self):
         central_widget = CentralWidget(table=None)
@@ -88,14 +94,13 @@ class MainWindow(QMainWindow):
 
         # Action buttons row (top)
         btn_layout = QHBoxLayout()
-        self.btn_create_disk = QPushButton(qta.icon('fa5s.plus-circle', color='white'), 'Create Disk')
-        self.btn_mount = QPushButton(qta.icon('fa5s.play', color='white'), 'Mount')
-        self.btn_unmount = QPushButton(qta.icon('fa5s.eject', color='white'), 'Unmount')
-        self.btn_delete = QPushButton(qta.icon('fa5s.trash', color='white'), 'Delete')
+        self.btn_create_disk = QPushButton('Create Disk')
+        self.btn_mount = QPushButton('Mount')
+        self.btn_unmount = QPushButton('Unmount')
+        self.btn_delete = QPushButton('Delete')
         self.btn_show_system = QToolButton()
         self.btn_show_system.setCheckable(True)
         self.btn_show_system.setChecked(False)
-        self.btn_show_system.setIcon(qta.icon('fa5s.server', color='white'))
         self.btn_show_system.setText('Show system disks')
         self.btn_show_system.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
         self.btn_show_system.clicked.connect(self.update_table)
@@ -113,21 +118,55 @@ class MainWindow(QMainWindow):
         title_layout.addWidget(title_label)
         title_layout.addStretch()
         self.btn_edit = QToolButton()
-        self.btn_edit.setIcon(qta.icon('fa5s.edit', color='white'))
         self.btn_edit.setText('Edit')
         self.btn_edit.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
         self.btn_edit.clicked.connect(self.open_edit_disk_dialog)
         self.btn_about = QToolButton()
-        self.btn_about.setIcon(qta.icon('fa5s.info-circle', color='white'))
         self.btn_about.setText('About')
         self.btn_about.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
         self.btn_about.clicked.connect(self.show_about)
+        self.btn_checkpoint = QToolButton()
+        self.btn_checkpoint.setText('Checkpoint')
+        self.btn_checkpoint.setToolTip('Save the contents of a RAM disk to a compressed archive')
+        self.btn_checkpoint.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
+        self.btn_checkpoint.clicked.connect(self.checkpoint_disk)
+        self.btn_restore = QToolButton()
+        self.btn_restore.setText('Restore')
+        self.btn_restore.setToolTip('Recreate a RAM disk from its last checkpoint')
+        self.btn_restore.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
+        self.btn_restore.clicked.connect(self.restore_disk)
+        self.btn_snapshots = QToolButton()
+        self.btn_snapshots.setText('Snapshots')
+        self.btn_snapshots.setToolTip('Snapshot, revert and clone file disks')
+        self.btn_snapshots.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
+        self.btn_snapshots.clicked.connect(self.open_snapshot_dialog)
+        title_layout.addWidget(self.btn_checkpoint)
+        title_layout.addWidget(self.btn_restore)
+        self.btn_compact = QToolButton()
+        self.btn_compact.setText('Compact')
+        self.btn_compact.setToolTip('Give the free space of the selected file disks (all of them if none is selected) back to the host')
+        self.btn_compact.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
+        self.btn_compact.clicked.connect(self.compact_disks)
+        title_layout.addWidget(self.btn_snapshots)
+        self.btn_export = QToolButton()
+        self.btn_export.setText('Export')
+        self.btn_export.setToolTip('Export a file disk to a compressed archive with checksums')
+        self.btn_export.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
+        self.btn_export.clicked.connect(self.export_disk)
+        self.btn_import = QToolButton()
+        self.btn_import.setText('Import')
+        self.btn_import.setToolTip('Verify and unpack an exported file disk')
+        self.btn_import.setToolButtonStyle(Qt.ToolButtonTextBesideIcon)
+        self.btn_import.clicked.connect(self.import_disk)
+        title_layout.addWidget(self.btn_compact)
+        title_layout.addWidget(self.btn_export)
+        title_layout.addWidget(self.btn_import)
         title_layout.addWidget(self.btn_edit)
         title_layout.addWidget(self.btn_about)
         layout.addLayout(title_layout)
 
         # Lista customizada
-        self.disk_list = DiskListWidget()
+        self.disk_list = DiskListView()
         central_widget.table = self.disk_list
         layout.addWidget(self.disk_list)
 
@@ -136,54 +175,31 @@ class MainWindow(QMainWindow):
         self.btn_mount.clicked.connect(self.mount_disk)
         self.btn_unmount.clicked.connect(self.unmount_disk)
         self.btn_delete.clicked.connect(self.delete_disk)
-        self.disk_list.itemDoubleClicked.connect(self.open_mount_dir)
+        self.disk_list.doubleClicked.connect(self.open_mount_dir)
+
+        # Background operations: current step, progress and cancel
+        self.op_label = QLabel()
+        self.op_label.setStyleSheet('background: transparent;')
+        self.op_progress = QProgressBar()
+        self.op_progress.setMaximumWidth(200)
+        self.btn_cancel_ops = QPushButton('Cancel')
+        self.btn_cancel_ops.clicked.connect(self.operations.cancel_all)
+        self.statusBar().addWidget(self.op_label, 1)
+        self.statusBar().addPermanentWidget(self.op_progress)
+        self.statusBar().addPermanentWidget(self.btn_cancel_ops)
+        self.operations.started.connect(self.update_operation_status)
+        self.operations.step.connect(self.update_operation_status)
+        self.operations.progress.connect(self.update_operation_progress)
+        self.operations.finished.connect(self.update_operation_status)
+        self.update_operation_status()
 
     def update_table(self):
         from vdm.logic.utils import format_size, get_disk_usage
+        from vdm.logic import compact
         self.discos = sync_disks_status(self.discos)
-        save_disks(self.discos, self.discos_json)
-        self.disk_list.clear()
-        icon_ram = qta.icon('fa5s.memory', color='white')
-        icon_file = qta.icon('fa5s.hdd', color='white')
-        icon_mounted = qta.icon('fa5s.check-circle', color='white')
-        icon_unmounted = qta.icon('fa5s.times-circle', color='white')
-        # RAM disks
-        try:
-            mounts = subprocess.check_output(['mount'], text=True)
-            for line in mounts.splitlines():
-                if 'type tmpfs' in line:
-                    import re
-                    m = re.match(r'(.+) on (.+) type tmpfs .+size=([^, ]+)', line)
-                    if m:
-                        device, mountpoint, size = m.groups()
-                    else:
-                        parts = line.split()
-                        device, mountpoint = parts[0], parts[2]
-                        size = '-'
-                    if not self.btn_show_system.isChecked() and any(mountpoint == sysmp or mountpoint.startswith(sysmp + '/') for sysmp in self.SYSTEM_MOUNTPOINTS):
-                        continue
-                    try:
-                        used, total = get_disk_usage(mountpoint)
-                        size_str = f"{format_size(used)} / {format_size(total)}"
-                    except Exception:
-                        size_str = format_size(size)
-                    disk_dict = {
-                        'type': 'RAM Disk',
-                        'device_or_file': device,
-                        'mountpoint': mountpoint,
-                        'size': size,
-                        'status': 'Mounted'
-                    }
-                    item_widget = DiskListItem(icon_ram, 'RAM Disk', device, mountpoint, size_str, icon_mounted, 'Mounted', False)
-                    item = QListWidgetItem()
-                    item.setSizeHint(item_widget.sizeHint())
-                    item.setData(Qt.UserRole, disk_dict)
-                    self.disk_list.addItem(item)
-                    self.disk_list.setItemWidget(item, item_widget)
-        except Exception:
-            pass
-        # File disks
-        for disk in self.discos:
+        save_disks(self.discos, self.registry)
+        entries = []
+        for disk in list_disks(self.discos, include_system=self.btn_show_system.isChecked()):
             if disk['status'] == 'Mounted' and os.path.exists(disk['mountpoint']):
                 try:
                     used, total = get_disk_usage(disk['mountpoint'])
@@ -192,16 +208,31 @@ class MainWindow(QMainWindow):
                     size_str = format_size(disk['size'])
             else:
                 size_str = format_size(disk['size'])
-            icon = icon_file
-            status_icon = icon_mounted if disk['status']=='Mounted' else icon_unmounted
-            item_widget = DiskListItem(icon, disk['type'], disk['device_or_file'], disk['mountpoint'], size_str, status_icon, disk['status'], disk.get('encrypted', False))
-            item = QListWidgetItem()
-            item.setSizeHint(item_widget.sizeHint())
-            item.setData(Qt.UserRole, disk)
-            self.disk_list.addItem(item)
-            self.disk_list.setItemWidget(item, item_widget)
+            if disk['type'] == 'File':
+                # What the image really takes on the host (st_blocks against the apparent size); the data scan is in the tooltip
+                size_str += f"  |  {compact.describe(compact.footprint(disk['device_or_file'], scan=False))}"
+            entries.append((disk, size_str))
+        self.disk_list.disk_model.update_disks(entries)
+
+    def registered_selection(self):
+        """Selected disks, as the entries of self.discos where they are registered.
+
+        The list model holds copies; an action that changes a disk (a zram
+        disk recreated on a new device, a new memory limit) must change the
+        entry that is saved to the registry.
+        """
+        registered = {disk_key(d): d for d in self.discos}
+        return [registered.get(disk_key(d), d) for d in self.disk_list.selected_disks()]
+
+    def selected_disks(self):
+        disks = self.registered_selection()
+        if not disks:
+            QMessageBox.warning(self, 'Warning', 'Select a disk in the table.')
+        return disks
 
     def create_disk(self):
+        from vdm.createdisk import ModernCreateDiskDialog
+        from vdm.logic import stage
         dialog = ModernCreateDiskDialog(self)
         if dialog.exec_() == QDialog.Accepted:
             data = dialog.get_data()
@@ -211,16 +242,61 @@ class MainWindow(QMainWindow):
                 if not size or not mountpoint:
                     QMessageBox.warning(self, 'Error', 'Fill in all fields.')
                     return
-                try:
-                    subprocess.run(['sudo', 'mkdir', '-p', mountpoint], check=True)
-                    cmd = ['sudo', 'mount', '-t', 'tmpfs', '-o', f'size={size}', 'tmpfs', mountpoint]
-                    subprocess.run(cmd, check=True)
-                    QMessageBox.information(self, 'Success', f'RAM Disk created and mounted at {mountpoint}.')
+
+                def done(result):
+                    mount = find_mount(mountpoint)
+                    effective = tmpfs.describe(tmpfs.effective_options(mount)) if mount else ''
+                    QMessageBox.information(self, 'Success', f'RAM Disk created and mounted at {mountpoint}.' + (f'\nOptions: {effective}' if effective else ''))
                     send_notification('RAM Disk Created', f'RAM Disk mounted at {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
                     self.update_table()
-                except subprocess.CalledProcessError as e:
+
+                def failed(e):
                     QMessageBox.critical(self, 'Error', f'Failed to create RAM Disk:\n{e}')
                     send_notification('Error', f'Failed to create RAM Disk at {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
+
+                if data['stage_source']:
+                    source = data['stage_source']
+
+                    def staged(disk):
+                        result = disk['stage']
+                        message = f"{source} staged into {mountpoint}: {result['files']} files, {format_size(result['bytes'])} in {result['elapsed']:.1f}s ({format_size(int(result['rate']))}/s)."
+                        if 'mismatches' in result:
+                            message += f"\nVerification: {len(result['mismatches'])} file(s) differ." if result['mismatches'] else '\nVerification: all checksums match.'
+                        if result.get('mismatches'):
+                            QMessageBox.warning(self, 'Staged with errors', message + '\n' + '\n'.join(result['mismatches'][:10]))
+                        else:
+                            QMessageBox.information(self, 'Success', message)
+                        send_notification('RAM Disk Staged', f'{source} staged into {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
+                        self.update_table()
+
+                    self.operations.submit(mountpoint, f'Stage {source} into {mountpoint}', stage.stage_directory, source, mountpoint, size=size, options=data['tmpfs_options'],
+                                           verify=data['stage_verify'], on_done=staged, on_error=failed)
+                    return
+                self.operations.submit(mountpoint, f'Create RAM Disk {mountpoint}', actions.create_ram_disk, size, mountpoint, options=data['tmpfs_options'], on_done=done, on_error=failed)
+            elif data['type'] == 'zram':
+                size = data['size']
+                mountpoint = data['mountpoint']
+                try:
+                    size_to_mb(size)
+                    mem_limit_mb = size_to_mb(data['mem_limit']) if data['mem_limit'] else None
+                except ValueError:
+                    QMessageBox.warning(self, 'Error', 'Sizes must look like 512M or 2G.')
+                    return
+                if not mountpoint:
+                    QMessageBox.warning(self, 'Error', 'Fill in all fields.')
+                    return
+
+                def done(disk):
+                    QMessageBox.information(self, 'Success', f"Compressed RAM disk ({disk['algorithm']}) created and mounted at {mountpoint}.")
+                    add_disk(self.discos, disk, self.registry)
+                    send_notification('Compressed RAM Disk Created', f'zram disk mounted at {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
+                    self.update_table()
+
+                def failed(e):
+                    QMessageBox.critical(self, 'Error', f'Failed to create compressed RAM disk:\n{getattr(e, "stderr", None) or e}')
+                    send_notification('Error', f'Failed to create zram disk at {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
+
+                self.operations.submit(mountpoint, f'Create zram disk {mountpoint}', actions.create_zram_disk, size, mountpoint, algorithm=data['algorithm'], mem_limit_mb=mem_limit_mb, on_done=done, on_error=failed)
             else:
                 file_path = data['file']
                 size = data['size']
@@ -233,61 +309,36 @@ class MainWindow(QMainWindow):
                 if encrypt and (not password or len(password) < 3):
                     QMessageBox.warning(self, 'Error', 'Password required for encryption (min 3 chars).')
                     return
-                try:
-                    subprocess.run(['sudo', 'dd', 'if=/dev/zero', f'of={file_path}', 'bs=1M', f'count={size_to_mb(size)}'], check=True)
-                    if encrypt:
-                        # LUKS format
-                        luks_cmd = ['sudo', 'cryptsetup', 'luksFormat', file_path, '--batch-mode']
-                        p = subprocess.Popen(luks_cmd, stdin=subprocess.PIPE, text=True)
-                        p.communicate(password + '\n')
-                        if p.returncode != 0:
-                            raise Exception('cryptsetup luksFormat failed')
-                        # Open LUKS
-                        luks_name = os.path.basename(file_path) + '_luks'
-                        open_cmd = ['sudo', 'cryptsetup', 'luksOpen', file_path, luks_name]
-                        p = subprocess.Popen(open_cmd, stdin=subprocess.PIPE, text=True)
-                        p.communicate(password + '\n')
-                        if p.returncode != 0:
-                            raise Exception('cryptsetup luksOpen failed')
-                        loopdev = f'/dev/mapper/{luks_name}'
-                    else:
-                        losetup_out = subprocess.check_output(['sudo', 'losetup', '--find', '--show', file_path], text=True).strip()
-                        loopdev = losetup_out
-                    subprocess.run(['sudo', 'mkfs.ext4', loopdev], check=True)
-                    subprocess.run(['sudo', 'mkdir', '-p', mountpoint], check=True)
-                    subprocess.run(['sudo', 'mount', loopdev, mountpoint], check=True)
-                    subprocess.run(['sudo', 'chmod', '777', mountpoint], check=True)
+
+                def done(disk):
                     QMessageBox.information(self, 'Success', f'File disk created, formatted and mounted at {mountpoint}.')
-                    add_disk(self.discos, {
-                        'type': 'File',
-                        'device_or_file': file_path,
-                        'mountpoint': mountpoint,
-                        'size': size,
-                        'status': 'Mounted',
-                        'encrypted': bool(encrypt)
-                    }, self.discos_json)
+                    add_disk(self.discos, disk, self.registry)
                     send_notification('File Disk Created', f'File disk mounted at {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
                     self.update_table()
-                except subprocess.CalledProcessError as e:
-                    QMessageBox.critical(self, 'Error', f'Failed to create file disk:\n{e}')
-                    send_notification('Error', f'Failed to create file disk at {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
-                except Exception as e:
-                    QMessageBox.critical(self, 'Error', f'Unexpected error:\n{e}')
+
+                def failed(e):
+                    if isinstance(e, subprocess.CalledProcessError):
+                        QMessageBox.critical(self, 'Error', f'Failed to create file disk:\n{e.stderr or e}')
+                    else:
+                        QMessageBox.critical(self, 'Error', f'Unexpected error:\n{e}')
                     send_notification('Error', f'Failed to create file disk at {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
 
+                self.operations.submit(file_path, f'Create file disk {file_path}', actions.create_file_disk, file_path, size, mountpoint, encrypt=encrypt, password=password, allocation=data['allocation'], loop_profile=data['loop_profile'],
+                                       filesystem=data['filesystem'], mount_options=data['mount_options'], allow_discards=data['allow_discards'], on_done=done, on_error=failed)
+
     def mount_disk(self):
-        row = self.disk_list.currentRow()
-        if row < 0:
-            QMessageBox.warning(self, 'Warning', 'Select a disk in the table.')
+        disks = self.selected_disks()
+        if len(disks) != 1:
+            if disks:
+                self.mount_disks(disks)
             return
-        item = self.disk_list.item(row)
-        disk = item.data(Qt.UserRole)
+        disk = disks[0]
         tipo = disk.get('type')
         device_or_file = disk.get('device_or_file')
         mountpoint = disk.get('mountpoint')
         status = disk.get('status')
-        if tipo != 'File':
-            QMessageBox.warning(self, 'Warning', 'Only file disks can be mounted here.')
+        if tipo not in REGISTERED_TYPES:
+            QMessageBox.warning(self, 'Warning', 'Only file and zram disks can be mounted here.')
             return
         if status == 'Mounted':
             QMessageBox.information(self, 'Info', 'This disk is already mounted.')
@@ -298,52 +349,39 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, 'Warning', 'Mount point not provided.')
                 return
             mountpoint = mountpoint.strip()
-        try:
-            if disk and disk.get('encrypted'):
-                # Solicitar senha
-                luks_name = os.path.basename(device_or_file) + '_luks'
-                luks_path = f'/dev/mapper/{luks_name}'
-                if not os.path.exists(luks_path):
-                    password, ok = QInputDialog.getText(self, 'Password Required', f'Enter password to unlock encrypted disk:\n{device_or_file}', QLineEdit.Password)
-                    if not ok or not password:
-                        QMessageBox.warning(self, 'Warning', 'Password not provided.')
-                        return
-                    open_cmd = ['sudo', 'cryptsetup', 'luksOpen', device_or_file, luks_name]
-                    p = subprocess.Popen(open_cmd, stdin=subprocess.PIPE, text=True)
-                    p.communicate(password + '\n')
-                    if p.returncode != 0:
-                        QMessageBox.critical(self, 'Error', 'Failed to unlock encrypted disk.')
-                        send_notification('Error', f'Failed to unlock encrypted disk {device_or_file}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
-                        return
-                loopdev = luks_path
-            else:
-                loopdev = None
-                losetup = subprocess.check_output(['sudo', 'losetup', '-a'], text=True)
-                for line in losetup.splitlines():
-                    if device_or_file in line:
-                        import re
-                        m = re.match(r'(/dev/loop\d+):', line)
-                        if m:
-                            loopdev = m.group(1)
-                            break
-                if not loopdev:
-                    loopdev = subprocess.check_output(['sudo', 'losetup', '--find', '--show', device_or_file], text=True).strip()
-            subprocess.run(['sudo', 'mkdir', '-p', mountpoint], check=True)
-            subprocess.run(['sudo', 'mount', loopdev, mountpoint], check=True)
+        password = None
+        if disk.get('encrypted') and not os.path.exists(f'/dev/mapper/{actions.luks_name(device_or_file)}'):
+            # Solicitar senha
+            password, ok = QInputDialog.getText(self, 'Password Required', f'Enter password to unlock encrypted disk:\n{device_or_file}', QLineEdit.Password)
+            if not ok or not password:
+                QMessageBox.warning(self, 'Warning', 'Password not provided.')
+                return
+        op = None
+
+        def done(result):
+            for warning in op.context.warnings:
+                QMessageBox.warning(self, 'Warning', warning)
             QMessageBox.information(self, 'Success', f'Disk mounted at {mountpoint}.')
             send_notification('Disk Mounted', f'Disk mounted at {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
+            # The mount point may have been asked for just now; a recreated zram disk has a new device
+            disk['mountpoint'] = mountpoint
+            save_disks(self.discos, self.registry)
             self.update_table()
-        except subprocess.CalledProcessError as e:
-            QMessageBox.critical(self, 'Error', f'Failed to mount disk:\n{e}')
+
+        def failed(e):
+            QMessageBox.critical(self, 'Error', f'Failed to mount disk:\n{getattr(e, "stderr", None) or e}')
             send_notification('Error', f'Failed to mount disk at {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
 
+        key = device_or_file if tipo == 'File' else mountpoint
+        op = self.operations.submit(key, f'Mount {mountpoint}', actions.mount_disk, disk, mountpoint, password=password, on_done=done, on_error=failed)
+
     def unmount_disk(self):
-        row = self.disk_list.currentRow()
-        if row < 0:
-            QMessageBox.warning(self, 'Warning', 'Select a disk in the table.')
+        disks = self.selected_disks()
+        if len(disks) != 1:
+            if disks:
+                self.unmount_disks(disks)
             return
-        item = self.disk_list.item(row)
-        disk = item.data(Qt.UserRole)
+        disk = disks[0]
         tipo = disk.get('type')
         mountpoint = disk.get('mountpoint')
         status = disk.get('status')
@@ -357,29 +395,14 @@ class MainWindow(QMainWindow):
         if status != 'Mounted':
             QMessageBox.information(self, 'Info', 'This disk is already unmounted.')
             return
-        try:
-            subprocess.run(['sudo', 'umount', mountpoint], check=True, capture_output=True, text=True)
-            if disk and disk.get('encrypted'):
-                luks_name = os.path.basename(device_or_file) + '_luks'
-                subprocess.run(['sudo', 'cryptsetup', 'luksClose', luks_name], check=True)
-                # Desassociar loop device
-                try:
-                    losetup = subprocess.check_output(['sudo', 'losetup', '-a'], text=True)
-                    for line in losetup.splitlines():
-                        if device_or_file in line:
-                            import re
-                            m = re.match(r'(/dev/loop\d+):', line)
-                            if m:
-                                loopdev = m.group(1)
-                                subprocess.run(['sudo', 'losetup', '-d', loopdev], check=False)
-                                break
-                except Exception:
-                    pass
+
+        def done(result):
             QMessageBox.information(self, 'Success', f'Unmounted: {mountpoint}')
             send_notification('Disk Unmounted', f'Disk unmounted from {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
             self.update_table()
-        except subprocess.CalledProcessError as e:
-            err = e.stderr or str(e)
+
+        def failed(e):
+            err = getattr(e, 'stderr', None) or str(e)
             if 'alvo ocupado' in err or 'target is busy' in err:
                 QMessageBox.critical(self, 'Error', f'Could not unmount {mountpoint}: target is busy. Close all programs or terminals using this directory and try again.')
                 send_notification('Error', f'Could not unmount {mountpoint}: target is busy.', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
@@ -387,85 +410,319 @@ class MainWindow(QMainWindow):
                 QMessageBox.critical(self, 'Error', f'Failed to unmount:\n{err}')
                 send_notification('Error', f'Failed to unmount {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
 
+        key = device_or_file if tipo == 'File' else mountpoint
+        self.operations.submit(key, f'Unmount {mountpoint}', actions.unmount_disk, disk, on_done=done, on_error=failed)
+
     def delete_disk(self):
-        row = self.disk_list.currentRow()
-        if row < 0:
-            QMessageBox.warning(self, 'Warning', 'Select a disk in the table.')
+        from vdm.logic import checkpoint
+        disks = self.selected_disks()
+        if len(disks) != 1:
+            if disks:
+                self.delete_disks(disks)
             return
-        item = self.disk_list.item(row)
-        disk = item.data(Qt.UserRole)
+        disk = disks[0]
         tipo = disk.get('type')
         device_or_file = disk.get('device_or_file')
         mountpoint = disk.get('mountpoint')
-        status = disk.get('status')
         if QMessageBox.question(self, 'Confirm', f'Are you sure you want to delete this disk?\n{device_or_file}') != QMessageBox.Yes:
             return
-        try:
-            if mountpoint != '-' and mountpoint and status == 'Mounted':
-                try:
-                    subprocess.run(['sudo', 'umount', mountpoint], check=True, capture_output=True, text=True)
-                except subprocess.CalledProcessError as e:
-                    err = e.stderr or str(e)
-                    if 'alvo ocupado' in err or 'target is busy' in err:
-                        QMessageBox.critical(self, 'Error', f'Could not unmount {mountpoint}: target is busy. Close all programs or terminals using this directory and try again.')
-                        send_notification('Error', f'Could not unmount {mountpoint}: target is busy.', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
-                    else:
-                        QMessageBox.critical(self, 'Error', f'Failed to unmount {mountpoint}.\n{err}')
-                        send_notification('Error', f'Failed to unmount {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
-                    return
-            if tipo == 'RAM Disk':
-                try:
-                    subprocess.run(['sudo', 'rmdir', mountpoint], check=True)
-                except subprocess.CalledProcessError:
-                    QMessageBox.warning(self, 'Warning', f'Could not remove directory {mountpoint}. Make sure it is empty and not mounted.')
-                    send_notification('Error', f'Could not remove directory {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
-            elif tipo == 'File':
-                loopdev = None
-                try:
-                    losetup = subprocess.check_output(['sudo', 'losetup', '-a'], text=True)
-                    for line in losetup.splitlines():
-                        if device_or_file in line:
-                            import re
-                            m = re.match(r'(/dev/loop\d+):', line)
-                            if m:
-                                loopdev = m.group(1)
-                                break
-                except Exception:
-                    pass
-                # Se for criptografado, fechar LUKS e desassociar loop
-                if disk and disk.get('encrypted'):
-                    luks_name = os.path.basename(device_or_file) + '_luks'
-                    try:
-                        subprocess.run(['sudo', 'cryptsetup', 'luksClose', luks_name], check=False)
-                    except Exception:
-                        pass
-                    try:
-                        if loopdev:
-                            subprocess.run(['sudo', 'losetup', '-d', loopdev], check=False)
-                    except Exception:
-                        pass
-                if loopdev:
-                    subprocess.run(['sudo', 'losetup', '-d', loopdev], check=False)
-                subprocess.run(['sudo', 'rm', '-f', device_or_file], check=False)
-                try:
-                    subprocess.run(['sudo', 'rmdir', mountpoint], check=True)
-                except subprocess.CalledProcessError:
-                    QMessageBox.warning(self, 'Warning', f'Could not remove directory {mountpoint}. Make sure it is empty and not mounted.')
-                    send_notification('Error', f'Could not remove directory {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
+        op = None
+
+        def done(result):
+            for warning in op.context.warnings:
+                QMessageBox.warning(self, 'Warning', warning)
+                send_notification('Error', warning, icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
+            if tipo in REGISTERED_TYPES:
                 idx = next((i for i, d in enumerate(self.discos) if d['device_or_file'] == device_or_file and d['mountpoint'] == mountpoint), None)
                 if idx is not None:
-                    remove_disk(self.discos, idx, self.discos_json)
-            QMessageBox.information(self, 'Success', 'Disk deleted.')
+                    remove_disk(self.discos, idx, self.registry)
+            QMessageBox.information(self, 'Success', 'Disk deleted.' + (f'\nCheckpoint: {checkpoint.describe(result)}' if result else ''))
             send_notification('Disk Deleted', f'Disk {device_or_file} deleted.', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
             self.update_table()
-        except subprocess.CalledProcessError as e:
-            err = e.stderr or str(e)
-            QMessageBox.critical(self, 'Error', f'Failed to delete disk:\n{err}')
-            send_notification('Error', f'Failed to delete disk {device_or_file}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
-
-    def open_mount_dir(self, item):
-        # item é o QListWidgetItem
-        disk = item.data(Qt.UserRole)
+
+        def failed(e):
+            err = getattr(e, 'stderr', None) or str(e)
+            if 'alvo ocupado' in err or 'target is busy' in err:
+                QMessageBox.critical(self, 'Error', f'Could not unmount {mountpoint}: target is busy. Close all programs or terminals using this directory and try again.')
+                send_notification('Error', f'Could not unmount {mountpoint}: target is busy.', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
+            else:
+                QMessageBox.critical(self, 'Error', f'Failed to delete disk:\n{err}')
+                send_notification('Error', f'Failed to delete disk {device_or_file}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
+
+        key = device_or_file if tipo == 'File' else mountpoint
+        policy = checkpoint.get_policy(self.registry, mountpoint) if tipo == 'RAM Disk' else None
+        if policy and policy.get('on_unmount'):
+            # Política do disco: checkpoint antes de apagar
+            op = self.operations.submit(key, f'Checkpoint and delete {mountpoint}', checkpoint.checkpoint_and_delete, disk, policy, on_done=done, on_error=failed)
+        else:
+            op = self.operations.submit(key, f'Delete {device_or_file}', actions.delete_disk, disk, on_done=done, on_error=failed)
+
+    def checkpoint_disk(self):
+        from vdm.logic import checkpoint
+        disks = self.selected_disks()
+        if not disks:
+            return
+        disk = disks[0]
+        mountpoint = disk.get('mountpoint')
+        if len(disks) != 1 or disk.get('type') != 'RAM Disk':
+            QMessageBox.warning(self, 'Warning', 'Select one RAM disk to checkpoint.')
+            return
+        policy = checkpoint.get_policy(self.registry, mountpoint)
+        if policy is None:
+            from PySide6.QtWidgets import QFileDialog
+            os.makedirs(checkpoint.DEFAULT_DIRECTORY, exist_ok=True)
+            directory = QFileDialog.getExistingDirectory(self, 'Checkpoint directory', checkpoint.DEFAULT_DIRECTORY)
+            if not directory:
+                return
+            on_unmount = QMessageBox.question(self, 'Checkpoint policy', f'Also checkpoint {mountpoint} automatically before it is deleted?') == QMessageBox.Yes
+            policy = checkpoint.set_policy(self.registry, mountpoint, directory, incremental=True, on_unmount=on_unmount)
+
+        def done(entry):
+            QMessageBox.information(self, 'Success', f"{entry['kind'].capitalize()} checkpoint of {mountpoint} written:\n{checkpoint.describe(entry)}")
+            send_notification('Checkpoint Saved', f'{mountpoint}: {checkpoint.describe(entry)}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
+
+        def failed(e):
+            QMessageBox.critical(self, 'Error', f'Checkpoint failed:\n{getattr(e, "stderr", None) or e}')
+            send_notification('Error', f'Checkpoint of {mountpoint} failed', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
+
+        self.operations.submit(mountpoint, f'Checkpoint {mountpoint}', checkpoint.checkpoint, mountpoint, policy['directory'], incremental=policy['incremental'], on_done=done, on_error=failed)
+
+    def restore_disk(self):
+        from vdm.logic import checkpoint
+        policies = checkpoint.load_policies(self.registry)
+        if not policies:
+            QMessageBox.information(self, 'Info', 'No RAM disk has been checkpointed yet.')
+            return
+        mountpoints = sorted(policies)
+        selected = self.registered_selection()
+        current = mountpoints.index(selected[0]['mountpoint']) if selected and selected[0].get('mountpoint') in policies else 0
+        mountpoint, ok = QInputDialog.getItem(self, 'Restore', 'RAM disk to restore:', mountpoints, current, False)
+        if not ok:
+            return
+
+        def done(result):
+            QMessageBox.information(self, 'Success', f"{mountpoint} restored from {result['archives']} archive(s):\n{checkpoint.describe(result)}")
+            send_notification('RAM Disk Restored', f'{mountpoint} restored', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
+            self.update_table()
+
+        def failed(e):
+            QMessageBox.critical(self, 'Error', f'Restore failed:\n{getattr(e, "stderr", None) or e}')
+            send_notification('Error', f'Restore of {mountpoint} failed', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
+
+        self.operations.submit(mountpoint, f'Restore {mountpoint}', checkpoint.restore, mountpoint, policies[mountpoint]['directory'], on_done=done, on_error=failed)
+
+    def compact_disks(self):
+        from vdm.logic import compact
+        disks = self.registered_selection() or [d for d in self.discos if d.get('type') == 'File']
+        jobs, skipped = [], []
+        for disk in disks:
+            if disk.get('type') != 'File':
+                skipped.append(f"{disk.get('mountpoint')}: only file disks can be compacted")
+            else:
+                jobs.append((disk['device_or_file'], f"Compact {disk['device_or_file']}", compact.compact_file_disk, (disk,), {}))
+        if not jobs:
+            QMessageBox.information(self, 'Info', 'There are no file disks to compact.')
+            return
+
+        def reclaimed(ops):
+            total = sum(op.result['reclaimed'] for op in ops if op.result)
+            return f'{format_size(total)} given back to the host'
+
+        self.run_batch('Compact', jobs, skipped, describe=reclaimed)
+
+    def export_disk(self):
+        from vdm.logic import transfer
+        disks = self.selected_disks()
+        if not disks:
+            return
+        disk = disks[0]
+        if len(disks) != 1 or disk.get('type') != 'File':
+            QMessageBox.warning(self, 'Warning', 'Select one file disk to export.')
+            return
+        from PySide6.QtWidgets import QFileDialog
+        base = os.path.splitext(disk['device_or_file'])[0]
+        archive, _ = QFileDialog.getSaveFileName(self, 'Export to', f'{base}.vdmx', 'VDM exports (*.vdmx);;All files (*)')
+        if not archive:
+            return
+        def done(result):
+            QMessageBox.information(self, 'Success', f"{disk['device_or_file']} exported to {archive}:\n{transfer.describe(result)}")
+            send_notification('Disk Exported', f'{archive}: {transfer.describe(result)}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
+
+        def failed(e):
+            QMessageBox.critical(self, 'Error', f'Export failed:\n{getattr(e, "stderr", None) or e}')
+            send_notification('Error', f"Export of {disk['device_or_file']} failed", icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
+
+        self.operations.submit(disk['device_or_file'], f'Export {disk["device_or_file"]}', transfer.export_file_disk, disk, archive, on_done=done, on_error=failed)
+
+    def import_disk(self):
+        from PySide6.QtWidgets import QFileDialog
+        from vdm.logic import transfer
+        archive, _ = QFileDialog.getOpenFileName(self, 'Import disk', os.path.expanduser('~'), 'VDM exports (*.vdmx);;All files (*)')
+        if not archive:
+            return
+        try:
+            manifest = transfer.load_manifest(archive)
+        except ValueError as e:
+            QMessageBox.critical(self, 'Error', str(e))
+            return
+        base = os.path.splitext(archive)[0]
+        file_path, _ = QFileDialog.getSaveFileName(self, 'Image file', f'{base}.img', 'Disk images (*.img);;All files (*)')
+        if not file_path:
+            return
+        if os.path.exists(file_path):
+            QMessageBox.warning(self, 'Error', f'{file_path} already exists.')
+            return
+        mountpoint, ok = QInputDialog.getText(self, 'Mount Point', 'Mount point of the imported disk:', text=f'/mnt/{os.path.basename(base)}')
+        if not ok or not mountpoint.strip():
+            return
+        mountpoint = mountpoint.strip()
+        password = None
+        if manifest['disk'].get('encrypted'):
+            password, ok = QInputDialog.getText(self, 'Password Required', f'Enter password to unlock the imported disk:\n{file_path}', QLineEdit.Password)
+            if not ok or not password:
+                return
+
+        def done(disk):
+            add_disk(self.discos, disk, self.registry)
+            QMessageBox.information(self, 'Success', f"Disk imported to {file_path} and mounted at {mountpoint}:\n{transfer.describe(disk['import'])}")
+            send_notification('Disk Imported', f'Disk mounted at {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
+            self.update_table()
+
+        def failed(e):
+            QMessageBox.critical(self, 'Error', f'Import failed:\n{getattr(e, "stderr", None) or e}')
+            send_notification('Error', f'Import of {archive} failed', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
+
+        self.operations.submit(file_path, f'Import {archive}', transfer.import_file_disk, archive, file_path, mountpoint, password=password, on_done=done, on_error=failed)
+
+    def mount_disks(self, disks):
+        jobs, skipped = [], []
+        for disk in disks:
+            device_or_file = disk.get('device_or_file')
+            mountpoint = disk.get('mountpoint')
+            if disk.get('type') not in REGISTERED_TYPES:
+                skipped.append(f'{mountpoint}: only file and zram disks can be mounted here')
+                continue
+            if disk.get('status') == 'Mounted':
+                skipped.append(f'{mountpoint}: already mounted')
+                continue
+            if mountpoint == '-' or not mountpoint:
+                mountpoint, ok = QInputDialog.getText(self, 'Mount Point', f'Enter mount point for {device_or_file}:')
+                if not ok or not mountpoint.strip():
+                    skipped.append(f'{device_or_file}: mount point not provided')
+                    continue
+                mountpoint = mountpoint.strip()
+            password = None
+            if disk.get('encrypted') and not os.path.exists(f'/dev/mapper/{actions.luks_name(device_or_file)}'):
+                password, ok = QInputDialog.getText(self, 'Password Required', f'Enter password to unlock encrypted disk:\n{device_or_file}', QLineEdit.Password)
+                if not ok or not password:
+                    skipped.append(f'{device_or_file}: password not provided')
+                    continue
+            key = device_or_file if disk.get('type') == 'File' else mountpoint
+            jobs.append((key, f'Mount {mountpoint}', actions.mount_disk, (disk, mountpoint), {'password': password}))
+
+        def mounted(op):
+            # Saved by the refresh that follows the batch
+            disk, mountpoint = op.args
+            disk['mountpoint'] = mountpoint
+
+        self.run_batch('Mount', jobs, skipped, on_success=mounted)
+
+    def unmount_disks(self, disks):
+        jobs, skipped = [], []
+        for disk in disks:
+            mountpoint = disk.get('mountpoint')
+            if disk.get('type') == 'RAM Disk':
+                skipped.append(f'{mountpoint}: RAM disks cannot be unmounted, use Delete')
+            elif disk.get('status') != 'Mounted' or mountpoint == '-' or not mountpoint:
+                skipped.append(f'{mountpoint}: not mounted')
+            else:
+                key = disk.get('device_or_file') if disk.get('type') == 'File' else mountpoint
+                jobs.append((key, f'Unmount {mountpoint}', actions.unmount_disk, (disk,), {}))
+        self.run_batch('Unmount', jobs, skipped)
+
+    def delete_disks(self, disks):
+        from vdm.logic import checkpoint
+        names = '\n'.join(d.get('device_or_file') or d.get('mountpoint') for d in disks[:10])
+        if len(disks) > 10:
+            names += f'\n... and {len(disks) - 10} more'
+        if QMessageBox.question(self, 'Confirm', f'Are you sure you want to delete these {len(disks)} disks?\n{names}') != QMessageBox.Yes:
+            return
+        jobs = []
+        for disk in disks:
+            key = disk.get('device_or_file') if disk.get('type') == 'File' else disk.get('mountpoint')
+            policy = checkpoint.get_policy(self.registry, disk.get('mountpoint')) if disk.get('type') == 'RAM Disk' else None
+            if policy and policy.get('on_unmount'):
+                jobs.append((key, f'Checkpoint and delete {disk.get("mountpoint")}', checkpoint.checkpoint_and_delete, (disk, policy), {}))
+            else:
+                jobs.append((key, f'Delete {disk.get("device_or_file")}', actions.delete_disk, (disk,), {}))
+
+        def deleted(op):
+            disk = op.args[0]
+            if disk.get('type') in REGISTERED_TYPES:
+                idx = next((i for i, d in enumerate(self.discos) if d['device_or_file'] == disk['device_or_file'] and d['mountpoint'] == disk['mountpoint']), None)
+                if idx is not None:
+                    remove_disk(self.discos, idx, self.registry)
+
+        self.run_batch('Delete', jobs, [], on_success=deleted)
+
+    def run_batch(self, verb, jobs, skipped, on_success=None, describe=None):
+        """Run jobs on the operation queue and show one report when all of them ended.
+
+        describe(ops), if given, adds its own text to the report.
+        """
+        def finished(ops):
+            succeeded, failed, cancelled = [], [], []
+            for op in ops:
+                if op.cancelled:
+                    cancelled.append(op.title)
+                elif op.error is not None:
+                    failed.append(f'{op.title}: {(getattr(op.error, "stderr", None) or str(op.error)).strip()}')
+                else:
+                    succeeded.append(op.title)
+                    failed.extend(f'{op.title}: {w}' for w in op.context.warnings)
+                    if on_success:
+                        on_success(op)
+            self.update_table()
+            summary = f'{verb}: {len(succeeded)} succeeded, {len(failed)} failed'
+            if cancelled:
+                summary += f', {len(cancelled)} cancelled'
+            if skipped:
+                summary += f', {len(skipped)} skipped'
+            if describe:
+                summary += f'. {describe(ops)}'
+            box = QMessageBox(QMessageBox.Warning if failed else QMessageBox.Information, 'Batch result', summary + '.', QMessageBox.Ok, self)
+            details = [f'Failed - {line}' for line in failed] + [f'Skipped - {line}' for line in skipped] + [f'Cancelled - {line}' for line in cancelled]
+            if details:
+                box.setDetailedText('\n'.join(details))
+            box.exec_()
+            send_notification(f'{verb} finished', summary, icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico' if failed else '../vdm-bin/icon.png')), key='batch')
+
+        self.operations.submit_batch(jobs, finished)
+
+    def update_operation_status(self, *args):
+        ops = self.operations.operations()
+        visible = bool(ops)
+        self.op_label.setVisible(visible)
+        self.op_progress.setVisible(visible)
+        self.btn_cancel_ops.setVisible(visible)
+        if not ops:
+            self.op_label.clear()
+            return
+        op = ops[0]
+        text = f'{op.title}: {op.current_step}' if op.current_step else op.title
+        if len(ops) > 1:
+            text += f'  (+{len(ops) - 1} more)'
+        self.op_label.setText(text)
+        self.op_progress.setRange(0, 0)
+
+    def update_operation_progress(self, op, done, total):
+        if total:
+            self.op_progress.setRange(0, 1000)
+            self.op_progress.setValue(int(done * 1000 / total))
+            self.op_progress.setFormat(f'{format_size(done)} / {format_size(total)}')
+
+    def open_mount_dir(self, index):
+        disk = index.data(DiskListModel.DiskRole)
         mountpoint = disk.get('mountpoint')
         if mountpoint and os.path.exists(mountpoint):
             subprocess.Popen(['xdg-open', mountpoint])
@@ -493,6 +750,7 @@ class MainWindow(QMainWindow):
 
     def _about_link_clicked(self, link):
         if link == '#gpl3':
+            from vdm.dialogs import show_full_license
             show_full_license(self)
 
     def open_edit_disk_dialog(self):
@@ -500,23 +758,76 @@ class MainWindow(QMainWindow):
         dlg = EditDiskDialog(self, self.discos)
         dlg.exec_()
 
+    def open_snapshot_dialog(self):
+        if not any(d.get('type') == 'File' for d in self.discos):
+            QMessageBox.information(self, 'Info', 'Snapshots and clones are for file disks; there are none yet.')
+            return
+        from vdm.snapshotdisk import SnapshotDiskDialog
+        selected = self.registered_selection()
+        dlg = SnapshotDiskDialog(self, self.discos, selected[0] if selected else None)
+        dlg.exec_()
+
+    def on_disks_changed(self, reasons):
+        self.update_table()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.started:
+            QTimer.singleShot(0, self.finish_startup)
+        else:
+            self.monitor_timer.start(0)
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.monitor_timer.stop()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            if self.isMinimized():
+                self.monitor_timer.stop()
+            elif self.started and not self.monitor_timer.isActive():
+                self.monitor_timer.start(0)
+
+    def closeEvent(self, event):
+        self.watcher.stop()
+        self.operations.cancel_all()
+        from vdm.logic.helper import get_client
+        from vdm.logic.notify import get_notifier
+        get_client().close()
+        get_notifier().close()
+        super().closeEvent(event)
+
     def monitor_disks(self):
-        from vdm.logic.utils import get_disk_usage, send_notification, format_size
-        for disk in self.discos:
-            if disk.get('status') == 'Mounted' and os.path.exists(disk.get('mountpoint', '')):
-                try:
-                    used, total = get_disk_usage(disk['mountpoint'])
-                    if total > 0:
-                        percent = used / total
-                        if percent >= 0.9:
-                            key = (disk.get('device_or_file'), disk.get('mountpoint'))
-                            if key not in self.notified_full:
-                                send_notification('Disk Almost Full', f"{disk['mountpoint']}: {format_size(used)} / {format_size(total)} ({percent*100:.0f}%) used.", icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
-                                self.notified_full.add(key)
-                        else:
-                            key = (disk.get('device_or_file'), disk.get('mountpoint'))
-                            if key in self.notified_full:
-                                self.notified_full.remove(key)
-                except Exception:
-                    pass
-        self.update_table()
\ No newline at end of file
+        from vdm.logic.sampler import IDLE_INTERVAL
+        mountpoints = [disk['mountpoint'] for disk in list_disks(self.discos, include_system=self.btn_show_system.isChecked())
+                       if disk.get('status') == 'Mounted' and disk.get('mountpoint')]
+        alerts, changed = self.sampler.sample(mountpoints)
+        for alert in alerts:
+            self.notify_usage(alert)
+        if changed:
+            self.update_table()
+        # Faster sampling while a disk is filling up, back off when idle
+        if self.isVisible() and not self.isMinimized():
+            self.monitor_timer.start(int(sample_interval(self.sampler.fill_rate, max_interval=IDLE_INTERVAL) * 1000))
+
+    def notify_usage(self, alert):
+        mountpoint = alert['mountpoint']
+        percent = alert['percent'] * 100
+        eta = alert['time_to_full']
+        eta_text = f'{eta / 60:.0f} min' if eta is not None and eta >= 60 else f'{eta or 0:.0f} s'
+        # Uma notificação por disco (e outra para inodes), atualizada no lugar
+        key = f"{'inodes' if alert['kind'].startswith('inodes') else 'usage'}:{mountpoint}"
+        icon = os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico'))
+        if alert['kind'] == 'threshold':
+            try:
+                used, total = get_disk_usage(mountpoint)
+                send_notification('Disk Almost Full', f"{mountpoint}: {format_size(used)} / {format_size(total)} ({percent:.0f}%) used.", icon=icon, key=key)
+            except OSError:
+                send_notification('Disk Almost Full', f'{mountpoint}: {percent:.0f}% used.', icon=icon, key=key)
+        elif alert['kind'] == 'forecast':
+            send_notification('Disk Filling Up', f'{mountpoint} is {percent:.0f}% used and will be full in about {eta_text}.', icon=icon, key=key)
+        elif alert['kind'] == 'inodes':
+            send_notification('Disk Almost Out of Inodes', f'{mountpoint}: {percent:.0f}% of inodes used.', icon=icon, key=key)
+        else:
+            send_notification('Disk Running Out of Inodes', f'{mountpoint} will run out of inodes in about {eta_text}.', icon=icon, key=key)
@@ -0,0 +1,635 @@
+"""Command-line interface to VDM.
+
+Built only on vdm.logic, so it never imports Qt and starts in a fraction
+of the GUI's time. Usage: `python -m vdm <command> ...` (see --help).
+
+Exit codes: 0 success, 1 operation failed, 2 invalid arguments,
+3 disk not found, 130 interrupted.
+"""
+import argparse
+import datetime
+import getpass
+import json
+import os
+import subprocess
+import sys
+from vdm.logic.disks import load_disks, save_disks, add_disk, remove_disk, sync_disks_status, list_disks, size_to_mb, REGISTERED_TYPES
+from vdm.logic.utils import format_size, get_disk_usage
+from vdm.logic.alloc import ALLOCATION_MODES, DEFAULT_ALLOCATION
+from vdm.logic.loopprofiles import LOOP_PROFILES, DEFAULT_LOOP_PROFILE
+from vdm.logic.helper import get_client, Cancelled
+from vdm.logic import actions, tmpfs, filesystems, zram, checkpoint, stage, snapshots, compact, transfer
+from vdm.logic.registry import get_registry
+from vdm.logic.mounts import find_mount
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NOT_FOUND = 3
+EXIT_INTERRUPTED = 130
+
+class CliError(Exception):
+    def __init__(self, message, code=EXIT_FAILED):
+        super().__init__(message)
+        self.code = code
+
+def _context(args):
+    def step(text):
+        if not args.quiet and not args.json:
+            print(f'{text}...', file=sys.stderr)
+    return actions.OperationContext(on_step=step)
+
+def _disks():
+    return sync_disks_status(load_disks())
+
+def _find(disks, target):
+    """Disk whose mountpoint or backing file is target."""
+    path = os.path.abspath(target)
+    for disk in disks:
+        if path in (disk.get('mountpoint'), disk.get('device_or_file')):
+            return disk
+    raise CliError(f'no disk at {target}', EXIT_NOT_FOUND)
+
+def _usage(disk):
+    if disk['status'] == 'Mounted' and os.path.exists(disk['mountpoint']):
+        try:
+            return get_disk_usage(disk['mountpoint'])
+        except OSError:
+            pass
+    return None, None
+
+def _size(text):
+    try:
+        size_to_mb(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError('size must look like 512M or 2G')
+    return text.strip().upper()
+
+def _password(args, prompt):
+    if args.password_stdin:
+        return sys.stdin.readline().rstrip('\n')
+    return getpass.getpass(prompt)
+
+def _report(args, disk, message):
+    if args.json:
+        print(json.dumps({'ok': True, 'disk': disk}))
+    elif not args.quiet:
+        print(message)
+
+def cmd_list(args):
+    disks = list_disks(_disks(), include_system=args.all)
+    for disk in disks:
+        if disk['type'] == 'File':
+            disk['footprint'] = compact.footprint(disk['device_or_file'])
+    if args.json:
+        print(json.dumps(disks, indent=2))
+        return EXIT_OK
+    for disk in disks:
+        lock = ' (encrypted)' if disk.get('encrypted') else ''
+        if disk.get('zram_effective'):
+            lock += f" ({disk['zram_effective']})"
+        if disk['type'] == 'File':
+            lock += f" ({compact.describe(disk['footprint'])})"
+        print(f"{disk['type']:<9} {disk['status']:<10} {format_size(disk['size']):>9}  {disk['mountpoint']}  {disk['device_or_file']}{lock}")
+    return EXIT_OK
+
+def cmd_status(args):
+    disks = list_disks(_disks(), include_system=args.all)
+    if args.target:
+        disks = [_find(disks, args.target)]
+    for disk in disks:
+        disk['used'], disk['total'] = _usage(disk)
+    if args.json:
+        print(json.dumps(disks, indent=2))
+        return EXIT_OK
+    for disk in disks:
+        if disk['total']:
+            usage = f"{format_size(disk['used'])} / {format_size(disk['total'])} ({disk['used'] * 100 // disk['total']}%)"
+        else:
+            usage = format_size(disk['size'])
+        print(f"{disk['mountpoint']}: {disk['type']}, {disk['status']}, {usage}")
+    return EXIT_OK
+
+def _tmpfs_options(args):
+    """Profile options with the command-line overrides; saved as a new profile if asked."""
+    registry = get_registry()
+    profiles = tmpfs.load_profiles(registry)
+    if args.profile not in profiles:
+        raise CliError(f"unknown tmpfs profile {args.profile!r} (known: {', '.join(profiles)})", EXIT_USAGE)
+    options = dict(profiles[args.profile])
+    for key in ('huge', 'nr_inodes', 'mode'):
+        if getattr(args, key):
+            options[key] = getattr(args, key)
+    if args.noatime:
+        options['noatime'] = True
+    try:
+        tmpfs.validate(options)
+        if args.save_profile:
+            tmpfs.save_profile(registry, args.save_profile, options)
+    except ValueError as e:
+        raise CliError(str(e), EXIT_USAGE)
+    return options
+
+def cmd_tmpfs_profiles(args):
+    profiles = tmpfs.load_profiles(get_registry())
+    huge = tmpfs.supported_huge()
+    result = []
+    for name, options in profiles.items():
+        try:
+            tmpfs.validate(options, huge)
+            problem = None
+        except ValueError as e:
+            problem = str(e)
+        result.append({'name': name, 'options': options, 'supported': problem is None, 'problem': problem})
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return EXIT_OK
+    for item in result:
+        note = '' if item['supported'] else f"  (unavailable: {item['problem']})"
+        print(f"{item['name']:<14} {tmpfs.describe(item['options']) or 'size only'}{note}")
+    return EXIT_OK
+
+def cmd_create(args):
+    mountpoint = os.path.abspath(args.mountpoint)
+    ctx = _context(args)
+    if args.kind == 'zram':
+        if not zram.available():
+            raise CliError('zram is not available (load the zram module)', EXIT_FAILED)
+        disk = actions.create_zram_disk(ctx, args.size, mountpoint, algorithm=args.algorithm,
+                                        mem_limit_mb=size_to_mb(args.mem_limit) if args.mem_limit else None)
+        add_disk(_disks(), disk)
+        _report(args, disk, f"Compressed RAM disk ({args.algorithm}) created and mounted at {mountpoint}.")
+        return EXIT_OK
+    if args.kind == 'ram':
+        options = _tmpfs_options(args)
+        disk = actions.create_ram_disk(ctx, args.size, mountpoint, options=options)
+        mount = find_mount(mountpoint)
+        # Effective options come from the kernel; fall back to the requested ones
+        disk['tmpfs_options'] = tmpfs.effective_options(mount) if mount else options
+        _report(args, disk, f"RAM Disk created and mounted at {mountpoint}. Options: {tmpfs.describe(disk['tmpfs_options']) or 'defaults'}")
+        return EXIT_OK
+    file_path = os.path.abspath(args.file)
+    password = None
+    if args.encrypt:
+        password = _password(args, f'Password for {file_path}: ')
+        if len(password) < 3:
+            raise CliError('password required for encryption (min 3 chars)', EXIT_USAGE)
+    mount_options = filesystems.preset(args.filesystem, args.mount_preset)
+    for key in ('noatime', 'nobarrier'):
+        if getattr(args, key):
+            mount_options[key] = True
+    if args.commit is not None:
+        mount_options['commit'] = args.commit
+    try:
+        filesystems.validate_mount_options(args.filesystem, mount_options)
+    except ValueError as e:
+        raise CliError(str(e), EXIT_USAGE)
+    discos = _disks()
+    disk = actions.create_file_disk(ctx, file_path, args.size, mountpoint, encrypt=args.encrypt, password=password, allocation=args.allocation,
+                                    loop_profile=args.loop_profile, filesystem=args.filesystem, mount_options=mount_options,
+                                    allow_discards=args.allow_discards)
+    add_disk(discos, disk)
+    _report(args, disk, f'File disk created, formatted and mounted at {mountpoint}.')
+    return EXIT_OK
+
+def cmd_mount(args):
+    discos = _disks()
+    disk = _find(list_disks(discos, include_system=True), args.target)
+    if disk['type'] not in REGISTERED_TYPES:
+        raise CliError('only file and zram disks can be mounted', EXIT_USAGE)
+    if disk['status'] == 'Mounted':
+        _report(args, disk, f"Already mounted at {disk['mountpoint']}.")
+        return EXIT_OK
+    mountpoint = os.path.abspath(args.mountpoint) if args.mountpoint else disk['mountpoint']
+    password = None
+    if disk.get('encrypted') and not os.path.exists(f"/dev/mapper/{actions.luks_name(disk['device_or_file'])}"):
+        password = _password(args, f"Password for {disk['device_or_file']}: ")
+    ctx = _context(args)
+    actions.mount_disk(ctx, disk, mountpoint, password=password)
+    disk['status'] = 'Mounted'
+    disk['mountpoint'] = mountpoint
+    # A recreated zram disk has a new device
+    save_disks(discos)
+    for warning in ctx.warnings:
+        print(f'vdm: warning: {warning}', file=sys.stderr)
+    _report(args, disk, f'Disk mounted at {mountpoint}.')
+    return EXIT_OK
+
+def cmd_unmount(args):
+    disk = _find(list_disks(_disks(), include_system=True), args.target)
+    if disk['type'] == 'RAM Disk':
+        raise CliError('RAM disks cannot be unmounted, use delete', EXIT_USAGE)
+    if disk['status'] != 'Mounted':
+        _report(args, disk, 'Disk is not mounted.')
+        return EXIT_OK
+    actions.unmount_disk(_context(args), disk)
+    disk['status'] = 'Unmounted'
+    _report(args, disk, f"Disk unmounted from {disk['mountpoint']}.")
+    return EXIT_OK
+
+def cmd_delete(args):
+    discos = _disks()
+    disk = _find(list_disks(discos, include_system=True), args.target)
+    if not args.yes:
+        answer = input(f"Delete {disk['device_or_file']} ({disk['mountpoint']})? [y/N] ")
+        if answer.strip().lower() not in ('y', 'yes'):
+            raise CliError('aborted', EXIT_FAILED)
+    ctx = _context(args)
+    policy = checkpoint.get_policy(get_registry(), disk['mountpoint']) if disk['type'] == 'RAM Disk' else None
+    entry = checkpoint.checkpoint_and_delete(ctx, disk, policy)
+    if entry:
+        print(f"Checkpoint: {checkpoint.describe(entry)}", file=sys.stderr)
+    if disk['type'] in REGISTERED_TYPES:
+        remove_disk(discos, discos.index(disk))
+    for warning in ctx.warnings:
+        print(f'vdm: warning: {warning}', file=sys.stderr)
+    _report(args, disk, f"Disk {disk['device_or_file']} deleted.")
+    return EXIT_OK
+
+def cmd_stage(args):
+    source = os.path.abspath(args.source)
+    if not os.path.isdir(source):
+        raise CliError(f'{source} is not a directory', EXIT_USAGE)
+    profiles = tmpfs.load_profiles(get_registry())
+    if args.profile not in profiles:
+        raise CliError(f"unknown tmpfs profile {args.profile!r} (known: {', '.join(profiles)})", EXIT_USAGE)
+    mountpoint = os.path.abspath(args.mountpoint)
+    disk = stage.stage_directory(_context(args), source, mountpoint, size=args.size, options=profiles[args.profile],
+                                 workers=args.workers, verify=args.verify)
+    result = disk['stage']
+    if args.json:
+        print(json.dumps({'ok': not result.get('mismatches'), 'disk': disk}))
+    elif not args.quiet:
+        print(f"{result['files']} files, {format_size(result['bytes'])} staged into {mountpoint} (size {disk['size']}) "
+              f"in {result['elapsed']:.1f}s ({format_size(int(result['rate']))}/s)")
+        if 'mismatches' in result:
+            print(f"verify: {len(result['mismatches'])} file(s) differ" if result['mismatches'] else 'verify: all checksums match')
+    for rel in result.get('mismatches', []):
+        print(f'vdm: checksum mismatch: {rel}', file=sys.stderr)
+    return EXIT_FAILED if result.get('mismatches') else EXIT_OK
+
+def cmd_checkpoint(args):
+    disk = _find(list_disks(_disks(), include_system=True), args.target)
+    if disk['type'] != 'RAM Disk':
+        raise CliError('only RAM disks can be checkpointed', EXIT_USAGE)
+    registry = get_registry()
+    policy = checkpoint.get_policy(registry, disk['mountpoint']) or {}
+    directory = os.path.abspath(args.dir) if args.dir else policy.get('directory', checkpoint.DEFAULT_DIRECTORY)
+    incremental = not args.full and policy.get('incremental', True)
+    if args.on_delete is not None or args.dir:
+        on_unmount = policy.get('on_unmount', False) if args.on_delete is None else args.on_delete == 'on'
+        checkpoint.set_policy(registry, disk['mountpoint'], directory, incremental=policy.get('incremental', True), on_unmount=on_unmount)
+    entry = checkpoint.checkpoint(_context(args), disk['mountpoint'], directory, incremental=incremental)
+    if args.json:
+        print(json.dumps(dict(entry, ok=True, directory=directory)))
+    elif not args.quiet:
+        print(f"{entry['kind'].capitalize()} checkpoint of {disk['mountpoint']}: {checkpoint.describe(entry)}")
+    return EXIT_OK
+
+def cmd_restore(args):
+    mountpoint = os.path.abspath(args.mountpoint)
+    policy = checkpoint.get_policy(get_registry(), mountpoint) or {}
+    directory = os.path.abspath(args.dir) if args.dir else policy.get('directory', checkpoint.DEFAULT_DIRECTORY)
+    if not checkpoint.load_manifest(checkpoint.disk_directory(directory, mountpoint)):
+        raise CliError(f'no checkpoint of {mountpoint} in {directory}', EXIT_NOT_FOUND)
+    result = checkpoint.restore(_context(args), mountpoint, directory)
+    if args.json:
+        print(json.dumps(dict(result, ok=True, mountpoint=mountpoint)))
+    elif not args.quiet:
+        print(f"{mountpoint} restored from {result['archives']} archive(s): {checkpoint.describe(result)}")
+    return EXIT_OK
+
+def _file_disk(discos, target):
+    disk = _find(discos, target)
+    if disk['type'] != 'File':
+        raise CliError('only file disks have snapshots and clones', EXIT_USAGE)
+    return disk
+
+def cmd_snapshot(args):
+    discos = _disks()
+    disk = _file_disk(discos, args.target)
+    ctx = _context(args)
+    if args.action == 'list':
+        records = snapshots.list_snapshots(disk)
+        if args.json:
+            print(json.dumps(records, indent=2))
+            return EXIT_OK
+        for record in records:
+            created = datetime.datetime.fromtimestamp(record['created']).strftime('%Y-%m-%d %H:%M:%S')
+            print(f"{record['name']:<20} {created}  {format_size(record['size']):>9}  {record['method']}  {record['file']}")
+        return EXIT_OK
+    try:
+        if args.action == 'create':
+            record = snapshots.snapshot_file_disk(ctx, disk, args.name)
+            message = f"Snapshot {record['name']} of {disk['device_or_file']}: {snapshots.describe(record)}"
+        elif args.action == 'revert':
+            record = snapshots.revert_file_disk(ctx, disk, args.name)
+            message = f"{disk['device_or_file']} reverted to snapshot {record['name']}."
+        else:
+            snapshots.delete_snapshot(ctx, disk, args.name)
+            message = f"Snapshot {args.name} deleted."
+    except ValueError as e:
+        raise CliError(str(e), EXIT_USAGE)
+    save_disks(discos)
+    _report(args, disk, message)
+    return EXIT_OK
+
+def cmd_clone(args):
+    discos = _disks()
+    disk = _file_disk(discos, args.target)
+    file_path = os.path.abspath(args.file)
+    if os.path.exists(file_path):
+        raise CliError(f'{file_path} already exists', EXIT_USAGE)
+    mountpoint = os.path.abspath(args.mountpoint)
+    password = _password(args, f"Password for {disk['device_or_file']}: ") if disk.get('encrypted') else None
+    try:
+        clone = snapshots.clone_file_disk(_context(args), disk, file_path, mountpoint, password=password, snapshot=args.snapshot)
+    except ValueError as e:
+        raise CliError(str(e), EXIT_USAGE)
+    add_disk(discos, clone)
+    _report(args, clone, f"Clone of {clone['cloned_from']} mounted at {mountpoint} ({snapshots.describe(clone['clone'])}).")
+    return EXIT_OK
+
+def _file_disks(discos, targets):
+    """File disks named by targets, or all of them."""
+    if not targets:
+        return [d for d in discos if d['type'] == 'File']
+    disks = [_find(discos, target) for target in targets]
+    for disk in disks:
+        if disk['type'] != 'File':
+            raise CliError(f"{disk['mountpoint']} is not a file disk", EXIT_USAGE)
+    return disks
+
+def cmd_footprint(args):
+    rows = []
+    for disk in _file_disks(_disks(), args.targets):
+        fp = compact.footprint(disk['device_or_file'])
+        rows.append(dict(fp or {'apparent': None, 'allocated': None, 'data': None}, image=disk['device_or_file'], mountpoint=disk['mountpoint']))
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return EXIT_OK
+    print(f"{'apparent':>10} {'allocated':>10} {'data':>10}  image")
+    for row in rows:
+        if row['apparent'] is None:
+            print(f"{'-':>10} {'-':>10} {'-':>10}  {row['image']} (missing)")
+            continue
+        data = format_size(row['data']) if row['data'] is not None else '-'
+        print(f"{format_size(row['apparent']):>10} {format_size(row['allocated']):>10} {data:>10}  {row['image']}")
+    present = [row for row in rows if row['apparent'] is not None]
+    if len(present) > 1:
+        apparent = sum(row['apparent'] for row in present)
+        allocated = sum(row['allocated'] for row in present)
+        print(f"{format_size(apparent):>10} {format_size(allocated):>10} {'':>10}  total ({len(present)} images)")
+    return EXIT_OK
+
+def cmd_compact(args):
+    if not args.targets and not args.all:
+        raise CliError('name the disks to compact, or pass --all', EXIT_USAGE)
+    discos = _disks()
+    ctx = _context(args)
+    results, failed = [], 0
+    for disk in _file_disks(discos, args.targets):
+        try:
+            result = compact.compact_file_disk(ctx, disk)
+        except (ValueError, subprocess.CalledProcessError) as e:
+            failed += 1
+            print(f"vdm: {disk['device_or_file']}: {(getattr(e, 'stderr', None) or str(e)).strip()}", file=sys.stderr)
+            continue
+        results.append(dict(result, image=disk['device_or_file']))
+        if not args.json and not args.quiet:
+            print(f"{disk['device_or_file']}: {result['method']}, {format_size(result['before'])} -> {format_size(result['after'])} "
+                  f"({format_size(result['reclaimed'])} reclaimed)")
+    if args.json:
+        print(json.dumps({'ok': not failed, 'results': results}))
+    elif not args.quiet and len(results) > 1:
+        print(f"{format_size(sum(r['reclaimed'] for r in results))} reclaimed from {len(results)} images")
+    return EXIT_FAILED if failed else EXIT_OK
+
+def cmd_export(args):
+    disk = _find(_disks(), args.target)
+    if disk['type'] != 'File':
+        raise CliError('only file disks can be exported', EXIT_USAGE)
+    archive = os.path.abspath(args.archive)
+    try:
+        result = transfer.export_file_disk(_context(args), disk, archive, snapshot=args.snapshot, level=args.level)
+    except ValueError as e:
+        raise CliError(str(e), EXIT_USAGE)
+    if args.json:
+        print(json.dumps(dict(result, ok=True, archive=archive, manifest=transfer.manifest_path(archive))))
+    elif not args.quiet:
+        print(f"{disk['device_or_file']} exported to {archive}: {transfer.describe(result)}")
+    return EXIT_OK
+
+def cmd_import(args):
+    archive = os.path.abspath(args.archive)
+    file_path = os.path.abspath(args.file)
+    if os.path.exists(file_path):
+        raise CliError(f'{file_path} already exists', EXIT_USAGE)
+    try:
+        manifest = transfer.load_manifest(archive)
+    except ValueError as e:
+        raise CliError(str(e), EXIT_NOT_FOUND)
+    password = _password(args, f'Password for {file_path}: ') if manifest['disk'].get('encrypted') else None
+    discos = _disks()
+    try:
+        disk = transfer.import_file_disk(_context(args), archive, file_path, os.path.abspath(args.mountpoint), password=password)
+    except ValueError as e:
+        raise CliError(str(e), EXIT_FAILED)
+    add_disk(discos, disk)
+    _report(args, disk, f"{archive} imported to {file_path}, mounted at {disk['mountpoint']}: {transfer.describe(disk['import'])}")
+    return EXIT_OK
+
+def cmd_resize(args):
+    discos = _disks()
+    disk = _find(list_disks(discos, include_system=True), args.target)
+    size_mb = size_to_mb(args.size)
+    ctx = _context(args)
+    if disk['type'] == 'RAM Disk':
+        actions.resize_ram_disk(ctx, disk['mountpoint'], size_mb)
+    elif disk['type'] == 'zram':
+        # The capacity is fixed once the device is set up: the new size limits the RAM it uses
+        actions.resize_zram_disk(ctx, disk, size_mb)
+        save_disks(discos)
+        _report(args, disk, f"zram disk {disk['mountpoint']} may now use up to {args.size} of RAM.")
+        return EXIT_OK
+    else:
+        if size_mb < size_to_mb(disk['size']):
+            raise CliError('shrinking a file disk is not supported', EXIT_USAGE)
+        fstype = disk.get('filesystem') or filesystems.DEFAULT_FILESYSTEM
+        if args.offline and not filesystems.filesystem(fstype)['offline_resize']:
+            raise CliError(f'{fstype} can only be grown while mounted (drop --offline)', EXIT_USAGE)
+        password = _password(args, '') if disk.get('encrypted') and args.password_stdin else None
+        actions.resize_file_disk(ctx, disk, size_mb, offline=args.offline, password=password)
+        disk['size'] = args.size
+        save_disks(discos)
+    _report(args, disk, f"Disk {disk['mountpoint']} resized to {args.size}.")
+    return EXIT_OK
+
+def _output_options(default):
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument('--json', action='store_true', default=default, help='machine-readable output on stdout')
+    options.add_argument('-q', '--quiet', action='store_true', default=default, help='do not print progress')
+    return options
+
+def build_parser():
+    # Accepted before and after the command; SUPPRESS keeps the subcommand from resetting them
+    common = _output_options(argparse.SUPPRESS)
+    parser = argparse.ArgumentParser(prog='vdm', description='Virtual Disk Manager', parents=[_output_options(False)])
+    sub = parser.add_subparsers(dest='command', metavar='command')
+    sub.required = True
+
+    p = sub.add_parser('list', parents=[common], help='list RAM and file disks')
+    p.add_argument('-a', '--all', action='store_true', help='include system tmpfs mounts')
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser('status', parents=[common], help='show state and usage')
+    p.add_argument('target', nargs='?', help='mount point or image file')
+    p.add_argument('-a', '--all', action='store_true', help='include system tmpfs mounts')
+    p.set_defaults(func=cmd_status)
+
+    p = sub.add_parser('create', parents=[common], help='create and mount a disk')
+    kinds = p.add_subparsers(dest='kind', metavar='kind')
+    kinds.required = True
+    k = kinds.add_parser('ram', parents=[common], help='tmpfs RAM disk')
+    k.add_argument('size', type=_size, help='e.g. 512M, 2G')
+    k.add_argument('mountpoint')
+    k.add_argument('--profile', default=tmpfs.DEFAULT_TMPFS_PROFILE, help='tmpfs option profile (see tmpfs-profiles)')
+    k.add_argument('--huge', choices=tmpfs.HUGE_VALUES, help='transparent huge pages for the files')
+    k.add_argument('--nr-inodes', help='inode limit, e.g. 4m')
+    k.add_argument('--mode', help='permissions of the root directory, e.g. 0700')
+    k.add_argument('--noatime', action='store_true', help='do not update access times')
+    k.add_argument('--save-profile', metavar='NAME', help='remember these options as a profile')
+    k = kinds.add_parser('zram', parents=[common], help='compressed RAM disk on a zram device')
+    k.add_argument('size', type=_size, help='capacity (uncompressed), e.g. 2G')
+    k.add_argument('mountpoint')
+    k.add_argument('--algorithm', choices=zram.ALGORITHMS, default=zram.DEFAULT_ALGORITHM, help='compression algorithm')
+    k.add_argument('--mem-limit', type=_size, help='most RAM the compressed data may use')
+    k = kinds.add_parser('file', parents=[common], help='loop-mounted image file')
+    k.add_argument('file')
+    k.add_argument('size', type=_size, help='e.g. 512M, 2G')
+    k.add_argument('mountpoint')
+    k.add_argument('--encrypt', action='store_true', help='LUKS-encrypt the image')
+    k.add_argument('--allocation', choices=ALLOCATION_MODES, default=DEFAULT_ALLOCATION)
+    k.add_argument('--loop-profile', choices=sorted(LOOP_PROFILES), default=DEFAULT_LOOP_PROFILE, help='loop device performance profile')
+    k.add_argument('--filesystem', choices=list(filesystems.FILESYSTEMS), default=filesystems.DEFAULT_FILESYSTEM)
+    k.add_argument('--mount-preset', choices=list(filesystems.MOUNT_PRESETS), default=filesystems.DEFAULT_MOUNT_PRESET,
+                   help='mount options, limited to what the filesystem supports')
+    k.add_argument('--noatime', action='store_true', help='do not update access times')
+    k.add_argument('--nobarrier', action='store_true', help='no write barriers (scratch data only)')
+    k.add_argument('--commit', type=int, metavar='SECONDS', help='journal commit interval')
+    k.add_argument('--allow-discards', action='store_true', help='let fstrim reach an encrypted image (reveals its free space)')
+    k.add_argument('--password-stdin', action='store_true', help='read the password from stdin')
+    p.set_defaults(func=cmd_create)
+
+    p = sub.add_parser('tmpfs-profiles', parents=[common], help='list tmpfs option profiles')
+    p.set_defaults(func=cmd_tmpfs_profiles)
+
+    p = sub.add_parser('mount', parents=[common], help='mount a file disk')
+    p.add_argument('target', help='image file or its mount point')
+    p.add_argument('--mountpoint', help='mount somewhere else than the registered mount point')
+    p.add_argument('--password-stdin', action='store_true', help='read the password from stdin')
+    p.set_defaults(func=cmd_mount)
+
+    p = sub.add_parser('unmount', parents=[common], help='unmount a file disk')
+    p.add_argument('target', help='image file or its mount point')
+    p.set_defaults(func=cmd_unmount)
+
+    p = sub.add_parser('delete', parents=[common], help='unmount and remove a disk')
+    p.add_argument('target', help='image file or mount point')
+    p.add_argument('-y', '--yes', action='store_true', help='do not ask for confirmation')
+    p.set_defaults(func=cmd_delete)
+
+    p = sub.add_parser('stage', parents=[common], help='create a RAM disk holding a copy of a directory')
+    p.add_argument('source', help='directory to copy')
+    p.add_argument('mountpoint')
+    p.add_argument('--size', type=_size, help='tmpfs size (default: the tree plus 10%%)')
+    p.add_argument('--profile', default=tmpfs.DEFAULT_TMPFS_PROFILE, help='tmpfs option profile')
+    p.add_argument('--workers', type=int, help=f'copy threads (default {stage.default_workers()})')
+    p.add_argument('--verify', action='store_true', help='compare BLAKE2b checksums after copying')
+    p.set_defaults(func=cmd_stage)
+
+    p = sub.add_parser('checkpoint', parents=[common], help='save a RAM disk to a compressed archive')
+    p.add_argument('target', help='mount point of the RAM disk')
+    p.add_argument('--dir', help=f'checkpoint directory (default: the disk policy, or {checkpoint.DEFAULT_DIRECTORY})')
+    p.add_argument('--full', action='store_true', help='start a new full archive instead of an incremental one')
+    p.add_argument('--on-delete', choices=('on', 'off'), help='checkpoint automatically before the disk is deleted')
+    p.set_defaults(func=cmd_checkpoint)
+
+    p = sub.add_parser('restore', parents=[common], help='recreate a RAM disk from its checkpoints')
+    p.add_argument('mountpoint')
+    p.add_argument('--dir', help='checkpoint directory (default: the disk policy)')
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser('snapshot', parents=[common], help='snapshots of a file disk')
+    snap = p.add_subparsers(dest='action', metavar='action')
+    snap.required = True
+    a = snap.add_parser('create', parents=[common], help='snapshot the image (reflink where the filesystem allows)')
+    a.add_argument('target', help='image file or mount point')
+    a.add_argument('name', nargs='?', help='default: the current date and time')
+    a = snap.add_parser('list', parents=[common], help='list the snapshots of a disk')
+    a.add_argument('target', help='image file or mount point')
+    a = snap.add_parser('revert', parents=[common], help='put an unmounted disk back to a snapshot')
+    a.add_argument('target', help='image file or mount point')
+    a.add_argument('name')
+    a = snap.add_parser('delete', parents=[common], help='remove a snapshot')
+    a.add_argument('target', help='image file or mount point')
+    a.add_argument('name')
+    p.set_defaults(func=cmd_snapshot)
+
+    p = sub.add_parser('clone', parents=[common], help='copy a file disk to a new image and mount it')
+    p.add_argument('target', help='image file or mount point of the original')
+    p.add_argument('file', help='image file of the clone')
+    p.add_argument('mountpoint')
+    p.add_argument('--snapshot', metavar='NAME', help='clone this snapshot instead of the current image')
+    p.add_argument('--password-stdin', action='store_true', help='read the password of an encrypted disk from stdin')
+    p.set_defaults(func=cmd_clone)
+
+    p = sub.add_parser('footprint', parents=[common], help='apparent, allocated and data bytes of file disk images')
+    p.add_argument('targets', nargs='*', metavar='target', help='image files or mount points (default: all file disks)')
+    p.set_defaults(func=cmd_footprint)
+
+    p = sub.add_parser('compact', parents=[common], help='give the free space of file disks back to the host')
+    p.add_argument('targets', nargs='*', metavar='target', help='image files or mount points')
+    p.add_argument('--all', action='store_true', help='every file disk')
+    p.set_defaults(func=cmd_compact)
+
+    p = sub.add_parser('export', parents=[common], help='export a file disk to a compressed archive with a checksum manifest')
+    p.add_argument('target', help='image file or mount point')
+    p.add_argument('archive', help='archive to write; the manifest goes next to it')
+    p.add_argument('--snapshot', metavar='NAME', help='export this snapshot instead of the disk')
+    p.add_argument('--level', type=int, choices=range(1, 20), metavar='1-19', default=transfer.ZSTD_LEVEL, help='zstd compression level')
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser('import', parents=[common], help='verify and unpack an exported disk, then mount it')
+    p.add_argument('archive')
+    p.add_argument('file', help='image file to create')
+    p.add_argument('mountpoint')
+    p.add_argument('--password-stdin', action='store_true', help='read the password of an encrypted disk from stdin')
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser('resize', parents=[common], help='change the size of a disk')
+    p.add_argument('target', help='image file or mount point')
+    p.add_argument('size', type=_size, help='new size, e.g. 1G')
+    p.add_argument('--offline', action='store_true', help='unmount and fsck instead of growing the mounted filesystem')
+    p.add_argument('--password-stdin', action='store_true', help='read the LUKS2 password from stdin')
+    p.set_defaults(func=cmd_resize)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except CliError as e:
+        error, code = str(e), e.code
+    except subprocess.CalledProcessError as e:
+        error, code = (e.stderr or str(e)).strip(), EXIT_FAILED
+    except (KeyboardInterrupt, Cancelled):
+        return EXIT_INTERRUPTED
+    except Exception as e:
+        error, code = str(e), EXIT_FAILED
+    finally:
+        get_client().close()
+    if args.json:
+        print(json.dumps({'ok': False, 'error': error, 'code': code}))
+    print(f'vdm: error: {error}', file=sys.stderr)
+    return code
@@ -1,8 +1,10 @@
 from PySide6.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QLineEdit, QCheckBox, QPushButton, QDialogButtonBox, QMessageBox, QTabWidget, QWidget, QSizePolicy
 from PySide6.QtCore import Qt
 import os
-import subprocess
-import qtawesome as qta
+from vdm.logic.mounts import tmpfs_mounts
+from vdm.logic.alloc import DEFAULT_ALLOCATION
+from vdm.logic.loopprofiles import DEFAULT_LOOP_PROFILE
+from vdm.logic import tmpfs, filesystems, zram, stage
 
 class ModernCreateDiskDialog(QDialog):
     def __init__(self, parent=None):
@@ -35,6 +37,11 @@ class ModernCreateDiskDialog(QDialog):
         self.file_tab = QWidget()
         self.tabs.addTab(self.ram_tab, 'RAM Disk')
         self.tabs.addTab(self.file_tab, 'File Disk')
+        self.zram_tab = QWidget()
+        self.tabs.addTab(self.zram_tab, 'Compressed RAM')
+        if not zram.available():
+            self.tabs.setTabEnabled(2, False)
+            self.tabs.setTabToolTip(2, 'zram is not available (load the zram module)')
         layout.addWidget(self.tabs)
 
         # RAM Disk tab
@@ -54,10 +61,11 @@ class ModernCreateDiskDialog(QDialog):
         ram_mp_label = QLabel('Mount point:')
         self.ram_mountpoint_combo = QComboBox()
         self.ram_mountpoint_combo.setEditable(True)
+        active_ram_mounts = self.get_active_ram_mounts()
         for s in self.suggest_ram_mountpoints():
             idx = self.ram_mountpoint_combo.count()
             self.ram_mountpoint_combo.addItem(s)
-            if s in self.get_active_ram_mounts():
+            if s in active_ram_mounts:
                 self.ram_mountpoint_combo.model().item(idx).setEnabled(False)
         for i in range(self.ram_mountpoint_combo.count()):
             if self.ram_mountpoint_combo.model().item(i).isEnabled():
@@ -66,6 +74,37 @@ class ModernCreateDiskDialog(QDialog):
         ram_mp_row.addWidget(ram_mp_label)
         ram_mp_row.addWidget(self.ram_mountpoint_combo)
         ram_layout.addLayout(ram_mp_row)
+        ram_profile_row = QHBoxLayout()
+        ram_profile_label = QLabel('Profile:')
+        self.ram_profile_combo = QComboBox()
+        self.tmpfs_profiles = tmpfs.load_profiles(getattr(parent, 'registry', None))
+        huge = tmpfs.supported_huge()
+        for name, options in self.tmpfs_profiles.items():
+            idx = self.ram_profile_combo.count()
+            self.ram_profile_combo.addItem(f"{name} ({tmpfs.describe(options) or 'size only'})", name)
+            # Perfis que o kernel não suporta ficam desabilitados, com o motivo no tooltip
+            try:
+                tmpfs.validate(options, huge)
+            except ValueError as e:
+                self.ram_profile_combo.model().item(idx).setEnabled(False)
+                self.ram_profile_combo.setItemData(idx, str(e), Qt.ToolTipRole)
+        self.ram_profile_combo.setCurrentIndex(self.ram_profile_combo.findData(tmpfs.DEFAULT_TMPFS_PROFILE))
+        ram_profile_row.addWidget(ram_profile_label)
+        ram_profile_row.addWidget(self.ram_profile_combo)
+        ram_layout.addLayout(ram_profile_row)
+        stage_row = QHBoxLayout()
+        stage_label = QLabel('Stage from:')
+        self.stage_edit = QLineEdit()
+        self.stage_edit.setPlaceholderText('Optional: directory to copy into the new disk')
+        self.stage_edit.editingFinished.connect(self.update_stage_size)
+        stage_browse = QPushButton('Browse...')
+        stage_browse.clicked.connect(self.browse_stage_source)
+        stage_row.addWidget(stage_label)
+        stage_row.addWidget(self.stage_edit, 1)
+        stage_row.addWidget(stage_browse)
+        ram_layout.addLayout(stage_row)
+        self.stage_verify_check = QCheckBox('Verify the copy with checksums')
+        ram_layout.addWidget(self.stage_verify_check)
         ram_layout.addStretch()
 
         # File Disk tab
@@ -97,6 +136,46 @@ class ModernCreateDiskDialog(QDialog):
         file_size_row.addWidget(file_size_label)
         file_size_row.addWidget(self.file_size_combo)
         file_layout.addLayout(file_size_row)
+        alloc_row = QHBoxLayout()
+        alloc_label = QLabel('Allocation:')
+        self.alloc_combo = QComboBox()
+        self.alloc_combo.addItem('Preallocated (fallocate, instant)', 'preallocated')
+        self.alloc_combo.addItem('Sparse (thin, grows on write)', 'sparse')
+        self.alloc_combo.addItem('Zeroed (writes every byte, slow)', 'zeroed')
+        self.alloc_combo.setCurrentIndex(self.alloc_combo.findData(DEFAULT_ALLOCATION))
+        alloc_row.addWidget(alloc_label)
+        alloc_row.addWidget(self.alloc_combo)
+        file_layout.addLayout(alloc_row)
+        profile_row = QHBoxLayout()
+        profile_label = QLabel('Loop profile:')
+        self.profile_combo = QComboBox()
+        self.profile_combo.addItem('Default (kernel defaults)', 'default')
+        self.profile_combo.addItem('Direct I/O (no double caching, 4K sectors)', 'direct-io')
+        self.profile_combo.addItem('Build cache (direct I/O, 4K sectors, large readahead)', 'build-cache')
+        self.profile_combo.setCurrentIndex(self.profile_combo.findData(DEFAULT_LOOP_PROFILE))
+        profile_row.addWidget(profile_label)
+        profile_row.addWidget(self.profile_combo)
+        file_layout.addLayout(profile_row)
+        fs_row = QHBoxLayout()
+        fs_label = QLabel('Filesystem:')
+        self.fs_combo = QComboBox()
+        for name, fs in filesystems.FILESYSTEMS.items():
+            self.fs_combo.addItem(fs['label'], name)
+        self.fs_combo.setCurrentIndex(self.fs_combo.findData(filesystems.DEFAULT_FILESYSTEM))
+        self.fs_combo.currentIndexChanged.connect(self.update_mount_presets)
+        fs_row.addWidget(fs_label)
+        fs_row.addWidget(self.fs_combo)
+        file_layout.addLayout(fs_row)
+        mount_row = QHBoxLayout()
+        mount_label = QLabel('Mount options:')
+        self.mount_combo = QComboBox()
+        for name in filesystems.MOUNT_PRESETS:
+            self.mount_combo.addItem(name, name)
+        self.mount_combo.setCurrentIndex(self.mount_combo.findData(filesystems.DEFAULT_MOUNT_PRESET))
+        mount_row.addWidget(mount_label)
+        mount_row.addWidget(self.mount_combo)
+        file_layout.addLayout(mount_row)
+        self.update_mount_presets()
         file_mp_row = QHBoxLayout()
         file_mp_label = QLabel('Mount point:')
         self.file_mountpoint_combo = QComboBox()
@@ -125,8 +204,53 @@ class ModernCreateDiskDialog(QDialog):
         encrypt_row.addSpacing(16)
         encrypt_row.addWidget(self.password_edit, 1)
         file_layout.addLayout(encrypt_row)
+        self.discards_checkbox = QCheckBox('Allow discards (lets Compact reclaim space; reveals which blocks are free)')
+        file_layout.addWidget(self.discards_checkbox)
         file_layout.addStretch()
 
+        # Compressed RAM (zram) tab
+        zram_layout = QVBoxLayout(self.zram_tab)
+        zram_layout.setSpacing(16)
+        zram_layout.setContentsMargins(12, 18, 12, 12)
+        zram_size_row = QHBoxLayout()
+        zram_size_label = QLabel('Capacity:')
+        self.zram_size_combo = QComboBox()
+        self.zram_size_combo.addItems(['512M', '1G', '2G', '4G', '8G'])
+        self.zram_size_combo.setEditable(True)
+        self.zram_size_combo.setCurrentText('2G')
+        self.zram_size_combo.setToolTip('Uncompressed size; the RAM used depends on how well the data compresses')
+        zram_size_row.addWidget(zram_size_label)
+        zram_size_row.addWidget(self.zram_size_combo)
+        zram_layout.addLayout(zram_size_row)
+        zram_algo_row = QHBoxLayout()
+        zram_algo_label = QLabel('Compression:')
+        self.zram_algo_combo = QComboBox()
+        # Só os algoritmos que o kernel oferece
+        offered = zram.algorithms() or list(zram.ALGORITHMS)
+        self.zram_algo_combo.addItems([a for a in offered if a in zram.ALGORITHMS])
+        self.zram_algo_combo.setCurrentText(zram.DEFAULT_ALGORITHM)
+        zram_algo_row.addWidget(zram_algo_label)
+        zram_algo_row.addWidget(self.zram_algo_combo)
+        zram_layout.addLayout(zram_algo_row)
+        zram_limit_row = QHBoxLayout()
+        zram_limit_label = QLabel('Memory limit:')
+        self.zram_limit_combo = QComboBox()
+        self.zram_limit_combo.addItems(['', '256M', '512M', '1G', '2G'])
+        self.zram_limit_combo.setEditable(True)
+        self.zram_limit_combo.lineEdit().setPlaceholderText('No limit')
+        zram_limit_row.addWidget(zram_limit_label)
+        zram_limit_row.addWidget(self.zram_limit_combo)
+        zram_layout.addLayout(zram_limit_row)
+        zram_mp_row = QHBoxLayout()
+        zram_mp_label = QLabel('Mount point:')
+        self.zram_mountpoint_combo = QComboBox()
+        self.zram_mountpoint_combo.addItems(self.suggest_zram_mountpoints())
+        self.zram_mountpoint_combo.setEditable(True)
+        zram_mp_row.addWidget(zram_mp_label)
+        zram_mp_row.addWidget(self.zram_mountpoint_combo)
+        zram_layout.addLayout(zram_mp_row)
+        zram_layout.addStretch()
+
         # Buttons
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         buttons.accepted.connect(self.accept)
@@ -147,6 +271,34 @@ class ModernCreateDiskDialog(QDialog):
             self.password_edit.setEchoMode(QLineEdit.Normal)
             self.password_edit.setPlaceholderText('')
             self.password_edit.setStyleSheet('background: #232526;')
+        self.discards_checkbox.setEnabled(self.encrypt_checkbox.isChecked())
+
+    def update_mount_presets(self):
+        # Mostra só as opções que o filesystem escolhido aceita
+        fstype = self.fs_combo.currentData()
+        for i in range(self.mount_combo.count()):
+            name = self.mount_combo.itemData(i)
+            options = filesystems.option_string(filesystems.preset(fstype, name))
+            self.mount_combo.setItemText(i, f"{name} ({options or 'kernel defaults'})")
+
+    def browse_stage_source(self):
+        from PySide6.QtWidgets import QFileDialog
+        directory = QFileDialog.getExistingDirectory(self, 'Directory to stage', self.stage_edit.text() or os.path.expanduser('~'))
+        if directory:
+            self.stage_edit.setText(directory)
+            self.update_stage_size()
+
+    def update_stage_size(self):
+        # Tamanho do tmpfs calculado a partir da árvore de origem
+        source = self.stage_edit.text().strip()
+        if not source or not os.path.isdir(source):
+            return
+        try:
+            self.stage_tree = stage.scan_tree(source)
+        except OSError as e:
+            QMessageBox.warning(self, 'Stage', f'Could not read {source}:\n{e}')
+            return
+        self.ram_size_combo.setCurrentText(stage.stage_size(self.stage_tree))
 
     def get_data(self):
         if self.tabs.currentIndex() == 0:
@@ -154,7 +306,20 @@ class ModernCreateDiskDialog(QDialog):
             return {
                 'type': 'RAM Disk',
                 'size': self.ram_size_combo.currentText().strip(),
-                'mountpoint': self.ram_mountpoint_combo.currentText().strip()
+                'mountpoint': self.ram_mountpoint_combo.currentText().strip(),
+                'tmpfs_profile': self.ram_profile_combo.currentData(),
+                'tmpfs_options': self.tmpfs_profiles[self.ram_profile_combo.currentData()],
+                'stage_source': self.stage_edit.text().strip() or None,
+                'stage_verify': self.stage_verify_check.isChecked()
+            }
+        elif self.tabs.currentIndex() == 2:
+            # Compressed RAM
+            return {
+                'type': 'zram',
+                'size': self.zram_size_combo.currentText().strip(),
+                'mountpoint': self.zram_mountpoint_combo.currentText().strip(),
+                'algorithm': self.zram_algo_combo.currentText(),
+                'mem_limit': self.zram_limit_combo.currentText().strip() or None
             }
         else:
             # File Disk
@@ -163,8 +328,13 @@ class ModernCreateDiskDialog(QDialog):
                 'file': self.file_combo.currentText().strip(),
                 'size': self.file_size_combo.currentText().strip(),
                 'mountpoint': self.file_mountpoint_combo.currentText().strip(),
+                'allocation': self.alloc_combo.currentData(),
+                'loop_profile': self.profile_combo.currentData(),
+                'filesystem': self.fs_combo.currentData(),
+                'mount_options': filesystems.preset(self.fs_combo.currentData(), self.mount_combo.currentData()),
                 'encrypt': self.encrypt_checkbox.isChecked(),
-                'password': self.password_edit.text() if self.encrypt_checkbox.isChecked() else None
+                'password': self.password_edit.text() if self.encrypt_checkbox.isChecked() else None,
+                'allow_discards': self.encrypt_checkbox.isChecked() and self.discards_checkbox.isChecked()
             }
 
     def suggest_files(self):
@@ -175,26 +345,21 @@ class ModernCreateDiskDialog(QDialog):
         base = '/mnt/disk'
         return [f'{base}{i}' for i in range(1, 6)]
 
+    def suggest_zram_mountpoints(self):
+        base = '/mnt/zram'
+        return [f'{base}{i}' for i in range(1, 6)]
+
     def suggest_ram_mountpoints(self):
         base = '/mnt/ramdisk'
         return [f'{base}{i}' for i in range(1, 6)]
 
     def get_active_ram_mounts(self):
-        ram_mounts = set()
-        try:
-            mounts = subprocess.check_output(['mount'], text=True)
-            for line in mounts.splitlines():
-                if 'type tmpfs' in line:
-                    import re
-                    m = re.match(r'(.+) on (.+) type tmpfs', line)
-                    if m:
-                        _, mountpoint = m.groups()
-                        ram_mounts.add(mountpoint)
-        except Exception:
-            pass
-        return ram_mounts
+        return {m['mountpoint'] for m in tmpfs_mounts()}
 
     def accept(self):
+        if self.tabs.currentIndex() == 0 and self.stage_edit.text().strip() and not os.path.isdir(self.stage_edit.text().strip()):
+            QMessageBox.warning(self, 'Stage', 'The directory to stage does not exist.')
+            return
         # Validação: se encrypt ativado, senha não pode ser vazia
         if self.tabs.currentIndex() == 1 and self.encrypt_checkbox.isChecked():
             if not self.password_edit.text().strip():
@@ -1,4 +1,5 @@
 from PySide6.QtWidgets import QDialog, QFormLayout, QLineEdit, QDialogButtonBox, QComboBox, QPushButton, QVBoxLayout, QTextEdit, QCheckBox, QLabel
+from vdm.logic.mounts import tmpfs_mounts
 
 class RamDiskDialog(QDialog):
     """Dialog for creating a RAM disk."""
@@ -17,19 +18,7 @@ class RamDiskDialog(QDialog):
         self.mountpoint_combo = QComboBox()
         suggestions = self.suggest_mountpoints()
         # Detecta mountpoints de RAM disks ativos
-        import subprocess
-        ram_mounts = set()
-        try:
-            mounts = subprocess.check_output(['mount'], text=True)
-            for line in mounts.splitlines():
-                if 'type tmpfs' in line:
-                    import re
-                    m = re.match(r'(.+) on (.+) type tmpfs', line)
-                    if m:
-                        _, mountpoint = m.groups()
-                        ram_mounts.add(mountpoint)
-        except Exception:
-            pass
+        ram_mounts = {m['mountpoint'] for m in tmpfs_mounts()}
         for s in suggestions:
             idx = self.mountpoint_combo.count()
             self.mountpoint_combo.addItem(s)
@@ -85,19 +74,7 @@ class FileDiskDialog(QDialog):
         self.mountpoint_combo = QComboBox()
         suggestions = self.suggest_mountpoints()
         # Detecta mountpoints de RAM disks ativos
-        import subprocess
-        ram_mounts = set()
-        try:
-            mounts = subprocess.check_output(['mount'], text=True)
-            for line in mounts.splitlines():
-                if 'type tmpfs' in line:
-                    import re
-                    m = re.match(r'(.+) on (.+) type tmpfs', line)
-                    if m:
-                        _, mountpoint = m.groups()
-                        ram_mounts.add(mountpoint)
-        except Exception:
-            pass
+        ram_mounts = {m['mountpoint'] for m in tmpfs_mounts()}
         for s in suggestions:
             idx = self.mountpoint_combo.count()
             self.mountpoint_combo.addItem(s)
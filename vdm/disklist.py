@@ -0,0 +1,175 @@
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QStyleOptionViewItem, QStyle, QApplication, QAbstractItemView
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QSize
+from PySide6.QtGui import QFont, QColor
+from vdm import icons
+from vdm.logic import tmpfs, filesystems
+from vdm.logic.utils import format_size
+
+ROW_HEIGHT = 40
+TEXT_COLOR = QColor('#e0e0e0')
+# (icon, size) painted on the rows, rendered at startup by icons.warm()
+ROW_ICONS = (('fa5s.memory', 24), ('fa5s.compress', 24), ('fa5s.hdd', 24), ('fa5s.check-circle', 18), ('fa5s.times-circle', 18), ('fa5s.lock', 16))
+
+def disk_key(disk):
+    """Identity of a row across refreshes."""
+    return (disk.get('device_or_file'), disk.get('mountpoint'))
+
+class DiskListModel(QAbstractListModel):
+    """Disks shown in the main window, updated by diffing snapshots."""
+    DiskRole = Qt.UserRole
+    SizeRole = Qt.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        disk, size_text = self._rows[index.row()]
+        if role == self.DiskRole:
+            return disk
+        if role == self.SizeRole:
+            return size_text
+        if role == Qt.DisplayRole:
+            return f"{disk['type']}  |  {disk.get('device_or_file')}  |  {disk.get('mountpoint')}  |  {size_text}"
+        if role == Qt.ToolTipRole:
+            tip = disk.get('mountpoint')
+            if disk['type'] in ('File', 'zram'):
+                tip += f"\nFilesystem: {filesystems.describe(disk)}"
+            if disk['type'] == 'zram':
+                tip += f"\nCompression: {disk.get('zram_effective') or 'device gone, contents lost'}"
+                if disk.get('mem_limit'):
+                    tip += f"\nMemory limit: {format_size(disk['mem_limit'])}"
+            if disk.get('loop_effective'):
+                tip += f"\nLoop device: {disk['loop_effective']}"
+            if disk.get('loop_mismatch'):
+                tip += f"\nProfile '{disk.get('loop_profile', '')}' not applied: {', '.join(disk['loop_mismatch'])}"
+            if disk['type'] == 'File':
+                # SEEK_DATA scan only when the tooltip is asked for, never on refresh
+                from vdm.logic import compact
+                tip += f"\nOn the host: {compact.describe(compact.footprint(disk['device_or_file']))}"
+            if disk.get('snapshots'):
+                tip += f"\nSnapshots: {', '.join(record['name'] for record in disk['snapshots'])}"
+            if disk.get('cloned_from'):
+                tip += f"\nCloned from: {disk['cloned_from']}"
+            return tip
+        return None
+
+    def disk(self, row):
+        return self._rows[row][0]
+
+    def update_disks(self, entries):
+        """Apply a new snapshot [(disk, size_text), ...] with row-level signals.
+
+        Unchanged rows emit nothing, so the view keeps its selection and only
+        repaints what changed.
+        """
+        snapshot, seen = [], set()
+        for disk, size_text in entries:
+            key = disk_key(disk)
+            if key not in seen:
+                seen.add(key)
+                snapshot.append((dict(disk), size_text))
+        for row in range(len(self._rows) - 1, -1, -1):
+            if disk_key(self._rows[row][0]) not in seen:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._rows[row]
+                self.endRemoveRows()
+        present = {disk_key(disk) for disk, _ in self._rows}
+        for i, new in enumerate(snapshot):
+            key = disk_key(new[0])
+            if i < len(self._rows) and disk_key(self._rows[i][0]) == key:
+                pass
+            elif key in present:
+                j = next(j for j in range(i + 1, len(self._rows)) if disk_key(self._rows[j][0]) == key)
+                self.beginMoveRows(QModelIndex(), j, j, QModelIndex(), i)
+                self._rows.insert(i, self._rows.pop(j))
+                self.endMoveRows()
+            else:
+                self.beginInsertRows(QModelIndex(), i, i)
+                self._rows.insert(i, new)
+                self.endInsertRows()
+                continue
+            if self._rows[i] != new:
+                self._rows[i] = new
+                idx = self.index(i)
+                self.dataChanged.emit(idx, idx)
+
+class DiskItemDelegate(QStyledItemDelegate):
+    """Paints a disk row: type icon, description, lock and status."""
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), ROW_HEIGHT)
+
+    def paint(self, painter, option, index):
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        opt.text = ''
+        style = opt.widget.style() if opt.widget else QApplication.style()
+        style.drawControl(QStyle.CE_ItemViewItem, opt, painter, opt.widget)
+        disk = index.data(DiskListModel.DiskRole)
+        size_text = index.data(DiskListModel.SizeRole)
+        rect = option.rect.adjusted(12, 0, -12, 0)
+        middle = rect.center().y()
+        dpr = painter.device().devicePixelRatioF()
+        painter.save()
+        painter.setPen(TEXT_COLOR)
+        type_icon = {'RAM Disk': 'fa5s.memory', 'zram': 'fa5s.compress'}.get(disk['type'], 'fa5s.hdd')
+        painter.drawPixmap(rect.left(), middle - 12, icons.pixmap(type_icon, 24, dpr=dpr))
+        # Status block, right aligned
+        font = QFont(option.font)
+        font.setPixelSize(14)
+        painter.setFont(font)
+        status = disk.get('status', '')
+        status_width = painter.fontMetrics().horizontalAdvance(status)
+        right = rect.right() - status_width
+        painter.drawText(QRect(right, rect.top(), status_width, rect.height()), Qt.AlignVCenter, status)
+        status_icon = 'fa5s.check-circle' if status == 'Mounted' else 'fa5s.times-circle'
+        right -= 4 + 18
+        painter.drawPixmap(right, middle - 9, icons.pixmap(status_icon, 18, dpr=dpr))
+        if disk.get('encrypted'):
+            right -= 4 + 16
+            painter.drawPixmap(right, middle - 8, icons.pixmap('fa5s.lock', 16, dpr=dpr))
+        # Description: bold type, then device | mountpoint | size
+        x = rect.left() + 24 + 16
+        font.setPixelSize(15)
+        font.setBold(True)
+        painter.setFont(font)
+        type_width = painter.fontMetrics().horizontalAdvance(disk['type'])
+        painter.drawText(QRect(x, rect.top(), type_width, rect.height()), Qt.AlignVCenter, disk['type'])
+        x += type_width
+        font.setBold(False)
+        painter.setFont(font)
+        available = max(0, right - 16 - x)
+        text = f"  |  {disk.get('device_or_file')}  |  {disk.get('mountpoint')}  |  {size_text}"
+        if disk.get('tmpfs_options'):
+            text += f"  |  {tmpfs.describe(disk['tmpfs_options'])}"
+        if disk.get('zram_effective'):
+            text += f"  |  {disk['zram_effective']}"
+        if disk.get('loop_mismatch'):
+            text += '  |  profile not applied'
+        elif disk.get('loop_profile', 'default') != 'default' and disk.get('loop_effective'):
+            text += f"  |  {disk['loop_effective']}"
+        text = painter.fontMetrics().elidedText(text, Qt.ElideMiddle, available)
+        painter.drawText(QRect(x, rect.top(), available, rect.height()), Qt.AlignVCenter, text)
+        painter.restore()
+
+class DiskListView(QListView):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setStyleSheet('QListView { background: #111112; color: #e0e0e0; border: none; font-size: 14px; }')
+        self.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.setAlternatingRowColors(False)
+        self.setUniformItemSizes(True)
+        self.setSpacing(2)
+        self.disk_model = DiskListModel(self)
+        self.setModel(self.disk_model)
+        self.setItemDelegate(DiskItemDelegate(self))
+
+    def selected_disks(self):
+        rows = sorted(index.row() for index in self.selectionModel().selectedRows())
+        return [self.disk_model.disk(row) for row in rows]
@@ -1,7 +1,8 @@
-from PySide6.QtWidgets import QDialog, QVBoxLayout, QFormLayout, QComboBox, QLineEdit, QLabel, QDialogButtonBox, QMessageBox
+from PySide6.QtWidgets import QDialog, QVBoxLayout, QFormLayout, QComboBox, QLineEdit, QLabel, QDialogButtonBox, QMessageBox, QCheckBox
 from vdm.logic.utils import format_size, get_disk_usage
+from vdm.logic import actions, filesystems, zram
+from vdm.logic.disks import save_disks, list_disks, size_to_mb
 import os
-import subprocess
 
 class EditDiskDialog(QDialog):
     def __init__(self, parent, discos):
@@ -10,47 +11,21 @@ class EditDiskDialog(QDialog):
         self.setModal(True)
         self.resize(400, 180)
         self.selected_disk = None
-        # Detect RAM disks ativos via mount
-        ram_disks = []
-        try:
-            mounts = subprocess.check_output(['mount'], text=True)
-            for line in mounts.splitlines():
-                if 'type tmpfs' in line:
-                    import re
-                    m = re.match(r'(.+) on (.+) type tmpfs .+size=([^, ]+)', line)
-                    if m:
-                        device, mountpoint, size = m.groups()
-                    else:
-                        parts = line.split()
-                        device, mountpoint = parts[0], parts[2]
-                        size = '-'
-                    ram_disks.append({
-                        'type': 'RAM Disk',
-                        'device_or_file': device,
-                        'mountpoint': mountpoint,
-                        'size': size,
-                        'status': 'Mounted'
-                    })
-        except Exception:
-            pass
-        # Remove system disks (mountpoints in MainWindow.SYSTEM_MOUNTPOINTS)
-        system_mounts = set(getattr(parent, 'SYSTEM_MOUNTPOINTS', []))
-        ram_disks = [d for d in ram_disks if d.get('mountpoint') and not any(d['mountpoint'].startswith(sysmp) for sysmp in system_mounts)]
-        # Discos do json (file disks)
-        file_disks = [d for d in discos if d.get('type') == 'File' and d.get('mountpoint') and not any(d['mountpoint'].startswith(sysmp) for sysmp in system_mounts)]
-        self.discos = file_disks + ram_disks
+        # File and zram disks first, then the RAM disks found in the mount table (system ones excluded)
+        disks = [d for d in list_disks(discos) if d.get('mountpoint')]
+        self.discos = [d for d in disks if d['type'] in ('File', 'zram')] + [d for d in disks if d['type'] == 'RAM Disk']
         layout = QVBoxLayout(self)
         form = QFormLayout()
         self.disk_combo = QComboBox()
         self.disk_map = {}
         for idx, d in enumerate(self.discos):
             label = f"{d['type']} - {d['mountpoint']} ({d['device_or_file'] if 'device_or_file' in d else ''})"
-            if d.get('type') == 'File':
-                label += ' (unsupported)'
+            if d.get('type') in ('File', 'zram') and d.get('status') != 'Mounted':
+                label += ' (not mounted)'
             self.disk_combo.addItem(label)
             self.disk_map[label] = d
-            # Desabilita item se for File
-            if d.get('type') == 'File':
+            # Só cresce file disks montados (o loop device precisa existir); zram idem
+            if d.get('type') in ('File', 'zram') and d.get('status') != 'Mounted':
                 self.disk_combo.model().item(idx).setEnabled(False)
         self.disk_combo.setCurrentIndex(-1)  # Nenhum selecionado por padrão
         self.disk_combo.currentIndexChanged.connect(self.update_info)
@@ -66,6 +41,12 @@ class EditDiskDialog(QDialog):
         self.size_edit.setPlaceholderText('Enter new size in MB (e.g. 1024)')
         self.size_edit.focusOutEvent = self.size_edit_focus_out
         form.addRow('New size (MB):', self.size_combo)
+        self.password_edit = QLineEdit()
+        self.password_edit.setEchoMode(QLineEdit.Password)
+        self.password_edit.setPlaceholderText('Only needed for LUKS2 containers')
+        form.addRow('LUKS password:', self.password_edit)
+        self.offline_check = QCheckBox('Offline resize (unmount and run a full fsck)')
+        form.addRow('', self.offline_check)
         layout.addLayout(form)
         buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         buttons.accepted.connect(self.accept)
@@ -75,24 +56,45 @@ class EditDiskDialog(QDialog):
 
     def update_info(self):
         idx = self.disk_combo.currentIndex()
-        if idx < 0 or (idx < len(self.discos) and self.discos[idx].get('type') == 'File'):
+        disk = self.discos[idx] if 0 <= idx < len(self.discos) else None
+        is_file = disk is not None and disk.get('type') == 'File'
+        # xfs e btrfs só crescem montados
+        self.offline_check.setEnabled(is_file and filesystems.filesystem(disk.get('filesystem'))['offline_resize'])
+        if not self.offline_check.isEnabled():
+            self.offline_check.setChecked(False)
+        self.password_edit.setEnabled(is_file and bool(disk.get('encrypted')))
+        if disk is None:
             self.info_label.setText('')
             self.size_edit.setText('')
             return
-        disk = self.discos[idx]
         mountpoint = disk.get('mountpoint')
+        if disk.get('type') == 'zram':
+            # zram: a capacidade é fixa, o tamanho editado é o limite de RAM
+            entry = zram.find_device(zram.scan_zram(), disk) or {}
+            used_mb = int(entry.get('mem_used_total', 0) / (1024*1024))
+            self.info_label.setText(f"Stored: {format_size(entry.get('orig_data_size', 0))} in {used_mb} MB of RAM (new size = memory limit)")
+            self.size_edit.setText(str(int((disk.get('mem_limit') or disk['disksize']) / (1024*1024))))
+            self._used_mb = used_mb
+            return
         try:
             used, total = get_disk_usage(mountpoint)
             used_mb = int(used / (1024*1024))
             total_mb = int(total / (1024*1024))
             self.info_label.setText(f"Used: {used_mb} MB / Total: {total_mb} MB")
             self.size_edit.setText(str(total_mb))
-            self._used_mb = used_mb
+            # File disks only grow: the image is the lower bound
+            self._used_mb = max(used_mb, self._image_mb(disk)) if is_file else used_mb
         except Exception:
             self.info_label.setText('Unable to get usage info.')
             self.size_edit.setText('')
             self._used_mb = 0
 
+    def _image_mb(self, disk):
+        try:
+            return int(os.path.getsize(disk['device_or_file']) / (1024*1024))
+        except OSError:
+            return size_to_mb(disk['size'])
+
     def size_edit_focus_out(self, event):
         try:
             val = int(float(self.size_edit.text().replace(',', '.')))
@@ -105,23 +107,27 @@ class EditDiskDialog(QDialog):
         return super(type(self.size_edit), self.size_edit).focusOutEvent(event)
 
     def accept(self):
-        import subprocess
         idx = self.disk_combo.currentIndex()
-        if idx < 0 or (idx < len(self.discos) and self.discos[idx].get('type') == 'File'):
+        if idx < 0 or idx >= len(self.discos):
             return
         disk = self.discos[idx]
         mountpoint = disk.get('mountpoint')
         new_size_mb = self.size_edit.text().strip().replace(',', '.')
-        try:
-            used, total = get_disk_usage(mountpoint)
-        except Exception:
-            used = 0
-        used_mb = int(used / (1024*1024))
+        if disk['type'] == 'zram':
+            used_mb = getattr(self, '_used_mb', 0)
+        else:
+            try:
+                used, total = get_disk_usage(mountpoint)
+            except Exception:
+                used = 0
+            used_mb = int(used / (1024*1024))
         try:
             new_mb = int(float(new_size_mb))
         except Exception:
             QMessageBox.warning(self, 'Invalid size', 'Please enter a valid number for the new size in MB (e.g. 1024).')
             return
+        if disk['type'] == 'File':
+            used_mb = max(used_mb, self._image_mb(disk))
         if new_mb < used_mb:
             self.size_edit.setText(str(used_mb))
             new_mb = used_mb
@@ -130,52 +136,46 @@ class EditDiskDialog(QDialog):
         # File Disk: converter para GB para o campo size
         new_size_gb = new_mb / 1024
         file_size_str = f"{new_size_gb:.2f}G"
-        # --- Resize logic ---
-        try:
-            if disk['type'] == 'RAM Disk':
-                subprocess.run(['sudo', 'mount', '-o', f'remount,size={new_size_str}', mountpoint], check=True)
-                QMessageBox.information(self, 'Success', f'RAM Disk resized to {new_size_str}.')
-            elif disk['type'] == 'File':
-                device_file = disk['device_or_file']
-                losetup = subprocess.check_output(['sudo', 'losetup', '-a'], text=True)
-                loopdev = None
-                for line in losetup.splitlines():
-                    if device_file in line:
-                        import re
-                        m = re.match(r'(/dev/loop\d+):', line)
-                        if m:
-                            loopdev = m.group(1)
-                            break
-                if not loopdev:
-                    QMessageBox.warning(self, 'Error', 'Loop device not found. Is the disk mounted?')
-                    return
-                subprocess.run(['sudo', 'umount', mountpoint], check=True)
-                subprocess.run(['sudo', 'dd', 'if=/dev/zero', f'of={device_file}', 'bs=1M', f'count=0', f'seek={new_mb}'], check=True)
-                subprocess.run(['sudo', 'e2fsck', '-f', loopdev], check=True)
-                subprocess.run(['sudo', 'resize2fs', loopdev], check=True)
-                subprocess.run(['sudo', 'mount', loopdev, mountpoint], check=True)
-                subprocess.run(['sudo', 'chmod', '777', mountpoint], check=True)
-                self.update_disk_size_in_json(device_file, mountpoint, file_size_str)
-                QMessageBox.information(self, 'Success', f'File disk resized to {file_size_str}.')
-            else:
-                QMessageBox.warning(self, 'Error', 'Unsupported disk type.')
-                return
-        except subprocess.CalledProcessError as e:
-            QMessageBox.critical(self, 'Resize failed', f'Error during resize:\n{e}')
+        # --- Resize logic (runs on the main window's operation queue) ---
+        window = self.parent()
+        if disk['type'] == 'RAM Disk':
+            def done(result):
+                QMessageBox.information(window, 'Success', f'RAM Disk resized to {new_size_str}.')
+                window.update_table()
+            key = mountpoint
+            op_args = (actions.resize_ram_disk, mountpoint, new_mb)
+            op_kwargs = {}
+        elif disk['type'] == 'zram':
+            def done(result):
+                save_disks(window.discos, window.registry)
+                QMessageBox.information(window, 'Success', f'zram disk may now use up to {new_size_str} of RAM.')
+                window.update_table()
+            key = mountpoint
+            op_args = (actions.resize_zram_disk, disk, new_mb)
+            op_kwargs = {}
+        elif disk['type'] == 'File':
+            device_file = disk['device_or_file']
+            offline = self.offline_check.isChecked()
+            def done(result):
+                # disk is the main window's own entry, so saving its list persists the change
+                disk['size'] = file_size_str
+                save_disks(window.discos, window.registry)
+                QMessageBox.information(window, 'Success', f'File disk resized to {file_size_str}.')
+                window.update_table()
+            key = device_file
+            op_args = (actions.resize_file_disk, disk, new_mb)
+            op_kwargs = {'offline': offline, 'password': self.password_edit.text() or None}
+        else:
+            QMessageBox.warning(self, 'Error', 'Unsupported disk type.')
             return
-        super().accept()
 
-    def update_disk_size_in_json(self, device_file, mountpoint, new_size_str):
-        import json
-        discos_json = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'discos.json')
-        try:
-            with open(discos_json, 'r') as f:
-                discos = json.load(f)
-            for d in discos:
-                if d.get('device_or_file') == device_file and d.get('mountpoint') == mountpoint:
-                    d['size'] = new_size_str
-            with open(discos_json, 'w') as f:
-                json.dump(discos, f, indent=2)
-        except Exception:
-            pass 
-            pass 
\ No newline at end of file
+        can_offline = self.offline_check.isEnabled()
+
+        def failed(e):
+            hint = ''
+            if disk['type'] == 'File' and not op_kwargs['offline'] and can_offline:
+                hint = '\n\nIf the filesystem cannot be grown while mounted, retry with "Offline resize".'
+            QMessageBox.critical(window, 'Resize failed', f'Error during resize:\n{getattr(e, "stderr", None) or e}{hint}')
+
+        window.operations.submit(key, f'Resize {mountpoint}', *op_args, on_done=done, on_error=failed, **op_kwargs)
+        super().accept()
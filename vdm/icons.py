@@ -0,0 +1,25 @@
+from PySide6.QtCore import QSize
+
+# Cache de ícones para todo o processo: o qtawesome só rasteriza cada glifo uma vez
+_icons = {}
+_pixmaps = {}
+
+def icon(name, color='white'):
+    """QIcon for a qtawesome name, shared by every widget that uses it."""
+    key = (name, color)
+    if key not in _icons:
+        import qtawesome as qta
+        _icons[key] = qta.icon(name, color=color)
+    return _icons[key]
+
+def pixmap(name, size, color='white', dpr=1.0):
+    """Rasterized size x size (logical pixels) icon for a device pixel ratio."""
+    key = (name, color, size, dpr)
+    if key not in _pixmaps:
+        _pixmaps[key] = icon(name, color).pixmap(QSize(size, size), dpr)
+    return _pixmaps[key]
+
+def warm(specs, dpr=1.0, color='white'):
+    """Render (name, size) pairs ahead of the first paint."""
+    for name, size in specs:
+        pixmap(name, size, color, dpr)
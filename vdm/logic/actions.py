@@ -0,0 +1,342 @@
+import logging
+import os
+import threading
+from vdm.logic.disks import size_to_mb
+from vdm.logic.loops import scan_loops, find_loop
+from vdm.logic.helper import get_client, Cancelled
+from vdm.logic.alloc import DEFAULT_ALLOCATION
+from vdm.logic import tmpfs, filesystems, zram
+from vdm.logic.loopprofiles import DEFAULT_LOOP_PROFILE, profile_settings, attach_op, tune_ops
+
+log = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+class OperationContext:
+    """Progress, cancellation and privileged execution for one disk operation.
+
+    Actions receive a context as first argument and call step()/progress()
+    to report what they are doing; batch()/call() send operations to the
+    privileged helper and abort them if the operation is cancelled meanwhile.
+    """
+
+    def __init__(self, on_step=None, on_progress=None, helper=None):
+        self.on_step = on_step
+        self.on_progress = on_progress
+        self.helper = helper
+        self.warnings = []
+        self._cancelled = threading.Event()
+
+    def step(self, text):
+        self.check()
+        if self.on_step:
+            self.on_step(text)
+
+    def progress(self, done, total=None):
+        if self.on_progress:
+            self.on_progress(done, total)
+
+    def warn(self, message):
+        self.warnings.append(message)
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise Cancelled()
+
+    def batch(self, ops, cancellable=True):
+        """Run a list of helper operations in one request and return their results."""
+        if cancellable:
+            self.check()
+        helper = self.helper or get_client()
+        return helper.batch(ops, on_step=self.step if cancellable else self.on_step, on_progress=self.progress,
+                            cancelled=self._cancelled.is_set if cancellable else None)
+
+    def call(self, op, check=True, cancellable=True, **args):
+        """Run a single helper operation and return its result dict."""
+        return self.batch([dict(args, op=op, check=check)], cancellable=cancellable)[0]
+
+def luks_name(device_or_file):
+    """Device-mapper name VDM uses for an encrypted file disk."""
+    return os.path.basename(device_or_file) + '_luks'
+
+def mount_op(disk, device, mountpoint, step=None):
+    """Helper 'mount' operation with the filesystem and mount options recorded for the disk."""
+    op = {'op': 'mount', 'device': device, 'mountpoint': mountpoint, 'fstype': disk.get('filesystem') or filesystems.DEFAULT_FILESYSTEM,
+          'options': disk.get('mount_options') or {}}
+    if step:
+        op['step'] = step
+    return op
+
+def create_ram_disk(ctx, size, mountpoint, options=None):
+    """Create mountpoint and mount a tmpfs of the given size on it, with profile options."""
+    options = tmpfs.resolve(options or {})
+    ctx.batch([
+        {'op': 'mkdir', 'path': mountpoint, 'step': 'Creating mount point'},
+        dict(options, op='mount_tmpfs', size=size, mountpoint=mountpoint, step='Mounting tmpfs'),
+    ])
+    return {'type': 'RAM Disk', 'device_or_file': 'tmpfs', 'mountpoint': mountpoint, 'size': size, 'status': 'Mounted'}
+
+def create_file_disk(ctx, file_path, size, mountpoint, encrypt=False, password=None, allocation=DEFAULT_ALLOCATION, loop_profile=DEFAULT_LOOP_PROFILE,
+                     filesystem=filesystems.DEFAULT_FILESYSTEM, mount_options=None, allow_discards=False):
+    """Allocate, (optionally) encrypt, format and mount a file disk. Returns its registry entry.
+
+    allow_discards lets dm-crypt pass discards (fstrim) down to the image,
+    which reveals where the free space of the encrypted disk is.
+    """
+    settings = profile_settings(loop_profile)
+    mount_options = dict(mount_options or {})
+    filesystems.validate_mount_options(filesystem, mount_options)
+    ops = [
+        {'op': 'allocate', 'path': file_path, 'size': size_to_mb(size) * MB, 'mode': allocation, 'create': True, 'step': 'Allocating image'},
+        attach_op(file_path, settings),
+    ]
+    loop = {'ref': 1}
+    if encrypt:
+        # LUKS goes on our own loop device so the profile applies to it
+        name = luks_name(file_path)
+        ops += [
+            {'op': 'luks_format', 'path': loop, 'input': password + '\n', 'step': 'Formatting LUKS container'},
+            {'op': 'luks_open', 'path': loop, 'name': name, 'input': password + '\n', 'allow_discards': bool(allow_discards),
+             'step': 'Unlocking LUKS container'},
+        ]
+        fsdev = f'/dev/mapper/{name}'
+        ops += tune_ops([loop, fsdev], settings)
+    else:
+        fsdev = loop
+        ops += tune_ops([loop], settings)
+    ops += [
+        {'op': 'mkfs', 'device': fsdev, 'fstype': filesystem, 'step': 'Creating filesystem'},
+        {'op': 'mkdir', 'path': mountpoint, 'step': 'Mounting'},
+        mount_op({'filesystem': filesystem, 'mount_options': mount_options}, fsdev, mountpoint),
+        {'op': 'chmod', 'mode': '777', 'path': mountpoint},
+    ]
+    # allocate refuses an existing file; this keeps the rollback off it too
+    existed = os.path.lexists(file_path)
+    try:
+        results = ctx.batch(ops)
+    except BaseException:
+        # Cancelled or failed halfway (luks_format, mkfs, mount): undo what was set up
+        cleanup = []
+        if encrypt:
+            cleanup.append({'op': 'luks_close', 'name': luks_name(file_path), 'check': False})
+        entry = find_loop(scan_loops(), file_path)
+        if entry:
+            cleanup.append({'op': 'detach', 'device': entry['device'], 'check': False})
+        if not existed:
+            cleanup.append({'op': 'remove', 'path': file_path, 'check': False})
+        if cleanup:
+            ctx.batch(cleanup, cancellable=False)
+        raise
+    if 'elapsed' in results[0]:
+        log.info('Allocated %s (%s, %s) in %.3fs', file_path, size, allocation, results[0]['elapsed'])
+    return {
+        'type': 'File',
+        'device_or_file': file_path,
+        'mountpoint': mountpoint,
+        'size': size,
+        'status': 'Mounted',
+        'encrypted': bool(encrypt),
+        'allow_discards': bool(encrypt and allow_discards),
+        'allocation': allocation,
+        'loop_profile': loop_profile,
+        'loop': settings,
+        'filesystem': filesystem,
+        'mount_options': mount_options
+    }
+
+def mount_file_disk(ctx, disk, mountpoint, password=None):
+    """Attach (and unlock) a file disk with its loop profile and mount it at mountpoint with its mount options."""
+    device_or_file = disk['device_or_file']
+    settings = disk.get('loop') or {}
+    ops = []
+    entry = find_loop(scan_loops(), device_or_file)
+    if entry:
+        loopdev = entry['device']
+    else:
+        ops.append(attach_op(device_or_file, settings))
+        loopdev = {'ref': 0}
+    if disk.get('encrypted'):
+        name = luks_name(device_or_file)
+        fsdev = f'/dev/mapper/{name}'
+        if not os.path.exists(fsdev):
+            ops.append({'op': 'luks_open', 'path': loopdev, 'name': name, 'input': (password or '') + '\n', 'allow_discards': bool(disk.get('allow_discards')),
+                        'step': 'Unlocking LUKS container'})
+        devices = [loopdev, fsdev]
+    else:
+        fsdev = loopdev
+        devices = [loopdev]
+    if not entry:
+        ops += tune_ops(devices, settings)
+    ops += [
+        {'op': 'mkdir', 'path': mountpoint, 'step': 'Mounting'},
+        mount_op(disk, fsdev, mountpoint),
+    ]
+    ctx.batch(ops)
+    return mountpoint
+
+def _zram_format_ops(disk, device, mountpoint):
+    return [
+        {'op': 'zram_setup', 'device': device, 'algorithm': disk['algorithm'], 'disksize': disk['disksize'],
+         'mem_limit': disk.get('mem_limit'), 'step': 'Configuring zram device'},
+        {'op': 'mkfs', 'device': device, 'fstype': disk['filesystem'], 'step': 'Creating filesystem'},
+        {'op': 'mkdir', 'path': mountpoint, 'step': 'Mounting'},
+        mount_op(disk, device, mountpoint),
+        {'op': 'chmod', 'mode': '777', 'path': mountpoint},
+    ]
+
+def _new_zram(ctx, disk, mountpoint):
+    """Hot-add, configure, format and mount a zram device for disk; returns its /dev path."""
+    device = ctx.call('zram_add', step='Adding zram device')['stdout'].strip()
+    try:
+        ctx.batch(_zram_format_ops(disk, device, mountpoint))
+    except BaseException:
+        ctx.batch([{'op': 'umount', 'mountpoint': mountpoint, 'check': False},
+                   {'op': 'zram_remove', 'device': device, 'check': False}], cancellable=False)
+        raise
+    return device
+
+def create_zram_disk(ctx, size, mountpoint, algorithm=zram.DEFAULT_ALGORITHM, mem_limit_mb=None):
+    """Create a compressed RAM disk on a new zram device. Returns its registry entry."""
+    disk = {
+        'type': 'zram',
+        'mountpoint': mountpoint,
+        'size': size,
+        'disksize': size_to_mb(size) * MB,
+        'algorithm': algorithm,
+        'mem_limit': mem_limit_mb * MB if mem_limit_mb else None,
+        'filesystem': zram.FILESYSTEM,
+        'mount_options': dict(zram.MOUNT_OPTIONS),
+    }
+    disk['device_or_file'] = _new_zram(ctx, disk, mountpoint)
+    disk['status'] = 'Mounted'
+    return disk
+
+def mount_zram_disk(ctx, disk, mountpoint, password=None):
+    """Mount a zram disk again; if its device is gone (reboot) a new, empty one is created."""
+    if zram.find_device(zram.scan_zram(), disk):
+        ctx.batch([{'op': 'mkdir', 'path': mountpoint, 'step': 'Mounting'}, mount_op(disk, disk['device_or_file'], mountpoint)])
+        return mountpoint
+    # The entry follows the new device; the caller saves the registry
+    disk['device_or_file'] = _new_zram(ctx, disk, mountpoint)
+    ctx.warn(f'The zram device of {mountpoint} no longer existed; an empty one was created.')
+    return mountpoint
+
+def resize_zram_disk(ctx, disk, size_mb):
+    """Limit the RAM a zram disk may use; its capacity is fixed once the device is set up."""
+    if not zram.find_device(zram.scan_zram(), disk):
+        raise RuntimeError('zram device not found. Is the disk mounted?')
+    ctx.call('zram_limit', device=disk['device_or_file'], mem_limit=size_mb * MB, step='Setting memory limit')
+    disk['mem_limit'] = size_mb * MB
+
+def mount_disk(ctx, disk, mountpoint, password=None):
+    """Mount a registered disk of any type."""
+    if disk.get('type') == 'zram':
+        return mount_zram_disk(ctx, disk, mountpoint, password)
+    return mount_file_disk(ctx, disk, mountpoint, password)
+
+def unmount_disk(ctx, disk):
+    """Unmount a registered disk; a zram device keeps its contents until deleted."""
+    if disk.get('type') == 'zram':
+        ctx.call('umount', mountpoint=disk['mountpoint'], step='Unmounting')
+        return
+    unmount_file_disk(ctx, disk)
+
+def unmount_file_disk(ctx, disk):
+    """Unmount a file disk, closing its LUKS mapping and loop device if encrypted."""
+    device_or_file = disk['device_or_file']
+    ops = [{'op': 'umount', 'mountpoint': disk['mountpoint'], 'step': 'Unmounting'}]
+    if disk.get('encrypted'):
+        ops.append({'op': 'luks_close', 'name': luks_name(device_or_file), 'step': 'Closing LUKS container'})
+    ctx.batch(ops)
+    if disk.get('encrypted'):
+        # Desassociar loop device
+        entry = find_loop(scan_loops(), device_or_file)
+        if entry:
+            ctx.call('detach', device=entry['device'], check=False)
+
+def delete_disk(ctx, disk):
+    """Unmount and remove a disk: the tmpfs mount point, the zram device, or the file image, its snapshots and its loop device."""
+    tipo = disk.get('type')
+    device_or_file = disk.get('device_or_file')
+    mountpoint = disk.get('mountpoint')
+    ops = []
+    if mountpoint != '-' and mountpoint and disk.get('status') == 'Mounted':
+        ops.append({'op': 'umount', 'mountpoint': mountpoint, 'step': 'Unmounting'})
+    if tipo == 'RAM Disk':
+        ops.append({'op': 'rmdir', 'path': mountpoint, 'check': False, 'step': 'Removing mount point'})
+    elif tipo == 'zram':
+        if zram.find_device(zram.scan_zram(), disk):
+            ops.append({'op': 'zram_remove', 'device': device_or_file, 'step': 'Removing zram device'})
+        ops.append({'op': 'rmdir', 'path': mountpoint, 'check': False, 'step': 'Removing mount point'})
+    elif tipo == 'File':
+        entry = find_loop(scan_loops(), device_or_file)
+        # Se for criptografado, fechar LUKS antes de desassociar o loop
+        if disk.get('encrypted'):
+            ops.append({'op': 'luks_close', 'name': luks_name(device_or_file), 'check': False, 'step': 'Closing LUKS container'})
+        if entry:
+            ops.append({'op': 'detach', 'device': entry['device'], 'check': False, 'step': 'Detaching loop device'})
+        ops.append({'op': 'remove', 'path': device_or_file, 'check': False, 'step': 'Removing image'})
+        snapshots = disk.get('snapshots') or []
+        for record in snapshots:
+            ops.append({'op': 'remove', 'path': record['file'], 'check': False, 'step': 'Removing snapshots'})
+        if snapshots:
+            ops.append({'op': 'rmdir', 'path': device_or_file + '.snapshots', 'check': False})
+        ops.append({'op': 'rmdir', 'path': mountpoint, 'check': False})
+    else:
+        return
+    results = ctx.batch(ops)
+    if results[-1]['returncode'] != 0:
+        ctx.warn(f'Could not remove directory {mountpoint}. Make sure it is empty and not mounted.')
+
+def resize_ram_disk(ctx, mountpoint, size_mb):
+    """Change the size limit of a mounted tmpfs."""
+    ctx.call('remount_tmpfs', size=f'{size_mb}M', mountpoint=mountpoint, step='Remounting tmpfs')
+
+def resize_file_disk(ctx, disk, size_mb, offline=False, password=None):
+    """Grow a file disk to size_mb.
+
+    By default the filesystem is grown while mounted: extend the image, make
+    the loop device pick up the new size, resize the LUKS mapping and grow
+    the mounted filesystem (resize2fs, xfs_growfs or btrfs resize). For ext4,
+    offline=True is the fallback that unmounts and runs a full fsck before
+    resize2fs.
+    """
+    fstype = disk.get('filesystem') or filesystems.DEFAULT_FILESYSTEM
+    if offline and not filesystems.filesystem(fstype)['offline_resize']:
+        raise ValueError(f'{fstype} can only be grown while mounted')
+    device_file = disk['device_or_file']
+    mountpoint = disk['mountpoint']
+    entry = find_loop(scan_loops(), device_file)
+    if not entry:
+        raise RuntimeError('Loop device not found. Is the disk mounted?')
+    loopdev = entry['device']
+    encrypted = disk.get('encrypted')
+    if encrypted and not entry['mapper']:
+        raise RuntimeError('LUKS mapping not found. Is the disk unlocked?')
+    fsdev = entry['mapper'] if encrypted else loopdev
+    grow = [
+        {'op': 'allocate', 'path': device_file, 'size': size_mb * MB, 'mode': disk.get('allocation', DEFAULT_ALLOCATION), 'step': 'Extending image'},
+        {'op': 'loop_set_capacity', 'device': loopdev, 'step': 'Updating loop device size'},
+    ]
+    if encrypted:
+        resize = {'op': 'luks_resize', 'name': luks_name(device_file), 'step': 'Resizing LUKS mapping'}
+        if password:
+            resize['input'] = password + '\n'
+        grow.append(resize)
+    grow_fs = {'op': 'grow_fs', 'fstype': fstype, 'device': fsdev, 'mountpoint': mountpoint}
+    if not offline:
+        ctx.batch(grow + [dict(grow_fs, step='Growing mounted filesystem')])
+        return
+    ctx.batch([{'op': 'umount', 'mountpoint': mountpoint, 'step': 'Unmounting'}] + grow + [
+        {'op': 'fsck', 'device': fsdev, 'step': 'Checking filesystem'},
+        dict(grow_fs, step='Resizing filesystem'),
+        mount_op(disk, fsdev, mountpoint, step='Remounting'),
+        {'op': 'chmod', 'mode': '777', 'path': mountpoint},
+    ])
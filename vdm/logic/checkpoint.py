@@ -0,0 +1,247 @@
+# Checkpoint and restore of tmpfs RAM disks.
+#
+# A checkpoint streams the disk through `tar | zstd -T0` straight into an
+# archive, so the data never passes through Python. Each disk has its own
+# directory holding a chain of archives: one full archive followed by
+# incremental ones (GNU tar --listed-incremental), which only hold files
+# changed since the previous checkpoint. Restore mounts the tmpfs again and
+# replays the chain through `zstd -d | tar -x`, decompression and
+# extraction running side by side. The archives are replayed one after the
+# other: an incremental archive overwrites and deletes what the ones before
+# it restored.
+#
+# The checkpoint policy of a disk (directory, incremental, checkpoint when
+# the disk is deleted) lives in the registry meta table, keyed by
+# mountpoint, since RAM disks themselves are not in the registry.
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import time
+from vdm.logic import tmpfs
+from vdm.logic.actions import create_ram_disk, delete_disk
+from vdm.logic.helper import Cancelled
+from vdm.logic.mounts import find_mount, invalidate
+from vdm.logic.utils import format_size
+
+META_KEY = 'checkpoint_policies'
+MANIFEST = 'manifest.json'
+SNAPSHOT = 'state.snar'
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'vdm', 'checkpoints')
+ZSTD_LEVEL = 3
+_TOTALS = re.compile(r'Total bytes written: (\d+)')
+
+def load_policies(registry):
+    try:
+        return json.loads(registry.get_meta(META_KEY, '{}'))
+    except ValueError:
+        return {}
+
+def get_policy(registry, mountpoint):
+    """Checkpoint policy of a RAM disk, or None."""
+    return load_policies(registry).get(mountpoint)
+
+def set_policy(registry, mountpoint, directory, incremental=True, on_unmount=False):
+    policies = load_policies(registry)
+    policies[mountpoint] = {'directory': os.path.abspath(directory), 'incremental': bool(incremental), 'on_unmount': bool(on_unmount)}
+    registry.set_meta(META_KEY, json.dumps(policies, sort_keys=True))
+    return policies[mountpoint]
+
+def clear_policy(registry, mountpoint):
+    policies = load_policies(registry)
+    if policies.pop(mountpoint, None) is not None:
+        registry.set_meta(META_KEY, json.dumps(policies, sort_keys=True))
+
+def disk_directory(directory, mountpoint):
+    """Where the archives of the disk at mountpoint go inside a checkpoint directory."""
+    return os.path.join(directory, mountpoint.strip('/').replace('/', '_') or 'root')
+
+def load_manifest(target):
+    try:
+        with open(os.path.join(target, MANIFEST), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_manifest(target, manifest):
+    path = os.path.join(target, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + '.tmp', path)
+
+def _read_chars(pid):
+    """Bytes a process has read so far (/proc/<pid>/io rchar), for progress."""
+    try:
+        with open(f'/proc/{pid}/io', 'r') as f:
+            for line in f:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _pipeline(ctx, first, second, total):
+    """Run `first | second`, reporting the bytes read by first against total.
+
+    Returns the stderr of both. Raises CalledProcessError if either fails and
+    Cancelled (after killing both) if the operation is cancelled.
+    """
+    # stderr goes to files: a pipe nobody reads could fill up and stall tar
+    logs = (tempfile.TemporaryFile(), tempfile.TemporaryFile())
+    producer = subprocess.Popen(first, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=logs[0])
+    consumer = subprocess.Popen(second, stdin=producer.stdout, stdout=subprocess.DEVNULL, stderr=logs[1])
+    # Only the consumer holds the read end now, so it sees EOF when the producer exits
+    producer.stdout.close()
+    try:
+        while True:
+            if ctx.cancelled:
+                raise Cancelled()
+            done = _read_chars(producer.pid)
+            if done is not None:
+                ctx.progress(min(done, total), total)
+            try:
+                consumer.wait(timeout=0.2)
+            except subprocess.TimeoutExpired:
+                continue
+            # If the consumer died early the producer gets SIGPIPE, so this returns
+            producer.wait()
+            break
+    except BaseException:
+        for proc in (producer, consumer):
+            proc.kill()
+            proc.wait()
+        raise
+    finally:
+        errors = []
+        for log in logs:
+            log.seek(0)
+            errors.append(log.read().decode(errors='replace'))
+            log.close()
+    for proc, argv, err in ((producer, first, errors[0]), (consumer, second, errors[1])):
+        if proc.returncode != 0:
+            raise subprocess.CalledProcessError(proc.returncode, argv, '', err)
+    return errors
+
+def _used_bytes(mountpoint):
+    st = os.statvfs(mountpoint)
+    return (st.f_blocks - st.f_bfree) * st.f_frsize
+
+def checkpoint(ctx, mountpoint, directory, incremental=True, level=ZSTD_LEVEL):
+    """Archive the RAM disk at mountpoint into directory; returns the manifest entry.
+
+    With incremental=True and an existing chain, only files changed since
+    the previous checkpoint are written; otherwise a new full chain starts.
+    The entry has the bytes read, the archive size, the elapsed time and the
+    throughput ('rate', bytes per second).
+    """
+    mount = find_mount(mountpoint)
+    if mount is None or mount['fstype'] != 'tmpfs':
+        raise ValueError(f'{mountpoint} is not a mounted RAM disk')
+    target = disk_directory(directory, mountpoint)
+    os.makedirs(target, exist_ok=True)
+    manifest = load_manifest(target)
+    snapshot = os.path.join(target, SNAPSHOT)
+    full = not (incremental and manifest and manifest['archives'] and os.path.exists(snapshot))
+    if full:
+        manifest = {'mountpoint': mountpoint, 'archives': []}
+    # tar rewrites the snapshot file: work on a copy so a failed run leaves the chain intact
+    work = snapshot + '.new'
+    if full:
+        if os.path.exists(work):
+            os.remove(work)
+    else:
+        shutil.copyfile(snapshot, work)
+    index = len(manifest['archives'])
+    name = f"{index:04d}-{'full' if full else 'incremental'}-{time.strftime('%Y%m%d-%H%M%S')}.tar.zst"
+    part = os.path.join(target, name + '.part')
+    ctx.step(f"Writing {'full' if full else 'incremental'} checkpoint")
+    start = time.monotonic()
+    try:
+        errors = _pipeline(ctx, ['tar', '-C', mountpoint, f'--listed-incremental={work}', '--totals', '-cf', '-', '.'],
+                           ['zstd', '-q', '-f', '-T0', f'-{level}', '-o', part], _used_bytes(mountpoint))
+    except BaseException:
+        for path in (part, work):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    elapsed = time.monotonic() - start
+    totals = _TOTALS.search(errors[0])
+    entry = {
+        'file': name,
+        'kind': 'full' if full else 'incremental',
+        'created': time.time(),
+        'bytes': int(totals.group(1)) if totals else 0,
+        'archive_bytes': os.path.getsize(part),
+        'elapsed': elapsed,
+    }
+    entry['rate'] = entry['bytes'] / elapsed if elapsed > 0 else 0
+    os.replace(part, os.path.join(target, name))
+    os.replace(work, snapshot)
+    if full:
+        # The new full archive replaces the previous chain
+        for old in os.listdir(target):
+            if old.endswith('.tar.zst') and old != name:
+                os.remove(os.path.join(target, old))
+    manifest['archives'].append(entry)
+    manifest['size'] = mount['options'].get('size')
+    manifest['tmpfs_options'] = tmpfs.effective_options(mount)
+    _save_manifest(target, manifest)
+    return entry
+
+def mount_options(manifest):
+    """tmpfs options of the checkpointed disk, as create_ram_disk expects them."""
+    options = dict(manifest.get('tmpfs_options') or {})
+    for key in ('uid', 'gid'):
+        if key in options:
+            options[key] = int(options[key])
+    return options
+
+def restore(ctx, mountpoint, directory):
+    """Mount the RAM disk again if needed and replay its checkpoint chain into it.
+
+    Returns {'bytes', 'archive_bytes', 'elapsed', 'rate', 'archives'}.
+    """
+    target = disk_directory(directory, mountpoint)
+    manifest = load_manifest(target)
+    if not manifest or not manifest['archives']:
+        raise ValueError(f'no checkpoint of {mountpoint} in {directory}')
+    mount = find_mount(mountpoint)
+    if mount is None:
+        create_ram_disk(ctx, manifest.get('size') or '1G', mountpoint, options=mount_options(manifest))
+        invalidate()
+    elif mount['fstype'] != 'tmpfs':
+        raise ValueError(f'{mountpoint} is mounted, but not as a RAM disk')
+    archives = manifest['archives']
+    start = time.monotonic()
+    for i, entry in enumerate(archives):
+        ctx.step(f'Restoring checkpoint {i + 1} of {len(archives)}')
+        path = os.path.join(target, entry['file'])
+        # --listed-incremental=/dev/null replays deletions recorded by incremental archives
+        _pipeline(ctx, ['zstd', '-q', '-d', '-c', path], ['tar', '-C', mountpoint, '--listed-incremental=/dev/null', '-xf', '-'],
+                  os.path.getsize(path))
+    elapsed = time.monotonic() - start
+    total = sum(entry['bytes'] for entry in archives)
+    return {
+        'bytes': total,
+        'archive_bytes': sum(entry['archive_bytes'] for entry in archives),
+        'elapsed': elapsed,
+        'rate': total / elapsed if elapsed > 0 else 0,
+        'archives': len(archives),
+    }
+
+def checkpoint_and_delete(ctx, disk, policy):
+    """Delete a RAM disk, checkpointing it first if its policy asks for it."""
+    entry = None
+    if policy and policy.get('on_unmount'):
+        entry = checkpoint(ctx, disk['mountpoint'], policy['directory'], incremental=policy.get('incremental', True))
+    delete_disk(ctx, disk)
+    return entry
+
+def describe(entry):
+    """'1.20 GB in 3.1s (387 MB/s), archive 410 MB'"""
+    return (f"{format_size(entry['bytes'])} in {entry['elapsed']:.1f}s ({format_size(int(entry['rate']))}/s), "
+            f"archive {format_size(entry['archive_bytes'])}")
@@ -0,0 +1,96 @@
+# Host footprint and compaction of file disk images.
+#
+# footprint() measures what an image costs on the host filesystem: its
+# apparent size, the blocks allocated to it (st_blocks) and the bytes that
+# hold data according to SEEK_DATA/SEEK_HOLE (preallocated but never written
+# extents are allocated without being data). Scans are cached per image
+# until its size or mtime changes, but an image being written misses the
+# cache every time: the refresh path uses scan=False (one stat per image)
+# and the data size is scanned on demand.
+#
+# A loop filesystem never gives blocks back to the host by itself: deleted
+# files stay allocated in the image. compact_file_disk() returns them. On a
+# mounted disk fstrim discards the free space, and the loop device turns the
+# discards into holes punched in the image (an encrypted disk must have been
+# opened with allow_discards for dm-crypt to pass them on). On an unmounted
+# image fallocate --dig-holes punches out the ranges that are all zeros.
+import os
+import threading
+import time
+from vdm.logic.reflink import data_bytes
+from vdm.logic.utils import format_size
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+def footprint(path, scan=True):
+    """{'apparent', 'allocated', 'data'} in bytes for an image, or None if it cannot be read.
+
+    'data' is None when scan is False.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    result = {'apparent': st.st_size, 'allocated': st.st_blocks * 512, 'data': None}
+    if not scan:
+        return result
+    key = (st.st_size, st.st_mtime_ns, st.st_blocks)
+    with _cache_lock:
+        cached = _cache.get(path)
+    if cached and cached[0] == key:
+        result['data'] = cached[1]
+        return result
+    try:
+        fd = os.open(path, os.O_RDONLY | os.O_CLOEXEC)
+    except OSError:
+        return result
+    try:
+        result['data'] = data_bytes(fd, st.st_size)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+    with _cache_lock:
+        _cache[path] = (key, result['data'])
+    return result
+
+def footprints(discos, scan=True):
+    """Footprint of every file disk, keyed by image path."""
+    return {disk['device_or_file']: footprint(disk['device_or_file'], scan) for disk in discos if disk.get('type') == 'File'}
+
+def describe(fp):
+    """'812 MB on disk of 4.00 GB, 640 MB data' (the data part only when scanned)"""
+    if fp is None:
+        return 'image missing'
+    text = f"{format_size(fp['allocated'])} on disk of {format_size(fp['apparent'])}"
+    if fp['data'] is not None:
+        text += f", {format_size(fp['data'])} data"
+    return text
+
+def compact_file_disk(ctx, disk):
+    """Give the free space of a file disk back to the host.
+
+    Returns {'method', 'before', 'after', 'reclaimed', 'elapsed'}, sizes in
+    allocated bytes of the image.
+    """
+    if disk.get('type') != 'File':
+        raise ValueError('only file disks can be compacted')
+    image = disk['device_or_file']
+    before = footprint(image, scan=False)
+    start = time.monotonic()
+    if disk.get('status') == 'Mounted':
+        if disk.get('encrypted') and not disk.get('allow_discards'):
+            raise ValueError('this encrypted disk was created without allow_discards, so dm-crypt drops the discards of fstrim')
+        ctx.call('fstrim', mountpoint=disk['mountpoint'], step='Trimming free space')
+        method = 'fstrim'
+    else:
+        if disk.get('encrypted'):
+            raise ValueError('free space of an encrypted image is not zeros; mount the disk and compact it with fstrim')
+        ctx.call('dig_holes', path=image, step='Punching holes in zeroed ranges')
+        method = 'dig-holes'
+    elapsed = time.monotonic() - start
+    after = footprint(image, scan=False)
+    before = before['allocated'] if before else 0
+    after = after['allocated'] if after else 0
+    return {'method': method, 'before': before, 'after': after, 'reclaimed': max(0, before - after), 'elapsed': elapsed}
@@ -1,63 +1,101 @@
 import os
-import json
-import subprocess
+from vdm.logic.mounts import get_mounts, tmpfs_mounts
+from vdm.logic.loops import scan_loops, find_loop
+from vdm.logic.registry import get_registry
+from vdm.logic.loopprofiles import describe, mismatches
+from vdm.logic.tmpfs import effective_options
+from vdm.logic import zram
 
-def load_disks(discos_json):
-    """Load disks from the JSON file, removendo discos cujo mountpoint não existe."""
-    if os.path.exists(discos_json):
-        with open(discos_json, 'r') as f:
-            discos = json.load(f)
-        # Remove discos cujo mountpoint não existe
-        filtered = [d for d in discos if d.get('mountpoint') and os.path.exists(d['mountpoint'])]
-        if len(filtered) != len(discos):
-            save_disks(filtered, discos_json)
-        return filtered
-    return []
+# Disk types kept in the registry (tmpfs RAM disks are found in the mount table)
+REGISTERED_TYPES = ('File', 'zram')
+# tmpfs mounts owned by the system, hidden unless asked for
+SYSTEM_MOUNTPOINTS = [
+    '/run', '/dev/shm', '/run/credentials/systemd-journald.service', '/tmp', '/run/user/1000', '/run/user', '/var/tmp', '/var/run', '/var/lock'
+]
 
-def save_disks(discos, discos_json):
-    """Save disks to the JSON file."""
-    with open(discos_json, 'w') as f:
-        json.dump(discos, f, indent=2)
+def is_system_mount(mountpoint):
+    return any(mountpoint == sysmp or mountpoint.startswith(sysmp + '/') for sysmp in SYSTEM_MOUNTPOINTS)
 
-def add_disk(discos, disk, discos_json):
-    """Add a file disk to the list and save."""
-    if disk['type'] == 'File':
+def list_disks(discos, include_system=False, mounts=None):
+    """RAM disks found in the mount table followed by the registered file disks."""
+    ram = {}
+    tmpfs = tmpfs_mounts() if mounts is None else [m for m in mounts if m['fstype'] == 'tmpfs']
+    for mount in tmpfs:
+        if not include_system and is_system_mount(mount['mountpoint']):
+            continue
+        # Montagens empilhadas no mesmo ponto: vale a de cima
+        ram[mount['mountpoint']] = {
+            'type': 'RAM Disk',
+            'device_or_file': mount['device'],
+            'mountpoint': mount['mountpoint'],
+            'size': mount['options'].get('size', '-'),
+            'status': 'Mounted',
+            'tmpfs_options': effective_options(mount)
+        }
+    return list(ram.values()) + list(discos)
+
+def load_disks(registry=None):
+    """Load disks from the registry, removendo discos cujo mountpoint não existe."""
+    registry = registry or get_registry()
+    discos = registry.all()
+    # Remove discos cujo mountpoint não existe
+    filtered = [d for d in discos if d.get('mountpoint') and os.path.exists(d['mountpoint'])]
+    if len(filtered) != len(discos):
+        save_disks(filtered, registry)
+    return filtered
+
+def save_disks(discos, registry=None):
+    """Persist the disk list; entries that did not change are not rewritten."""
+    return (registry or get_registry()).sync(discos)
+
+def add_disk(discos, disk, registry=None):
+    """Add a file or zram disk to the list and save."""
+    if disk['type'] in REGISTERED_TYPES:
         discos.append(disk)
-        save_disks(discos, discos_json)
+        save_disks(discos, registry)
 
-def remove_disk(discos, idx, discos_json):
+def remove_disk(discos, idx, registry=None):
     """Remove a disk by index and save."""
     discos.pop(idx)
-    save_disks(discos, discos_json)
+    save_disks(discos, registry)
 
-def sync_disks_status(discos):
-    """Update the status of file disks based on system state, including LUKS encrypted disks."""
-    try:
-        mounts = subprocess.check_output(['mount'], text=True)
-    except Exception:
-        mounts = ''
-    try:
-        losetup = subprocess.check_output(['sudo', 'losetup', '-a'], text=True)
-    except Exception:
-        losetup = ''
+def sync_disks_status(discos, mounts=None, loops=None, zrams=None):
+    """Update the status of file and zram disks based on system state, including LUKS encrypted disks.
+
+    mounts, loops and zrams default to the live mount table, loop index and zram index.
+    """
+    if mounts is None:
+        mounts = get_mounts()
+    if loops is None:
+        loops = scan_loops()
+    mounted = {m['device'] for m in mounts} | {m['devno'] for m in mounts}
+    swaps = set()
+    if any(disk['type'] == 'zram' for disk in discos):
+        swaps = zram.swap_devices()
+        if zrams is None:
+            zrams = zram.scan_zram()
     for disk in discos:
+        if disk['type'] == 'zram':
+            entry = zram.find_device(zrams, disk, swaps)
+            # Live compression ratio from mm_stat, shown next to the disk
+            disk['zram_effective'] = zram.describe(entry) if entry else None
+            disk['status'] = 'Mounted' if entry and (entry['device'] in mounted or entry['devno'] in mounted) else 'Unmounted'
+            continue
         if disk['type'] == 'File':
-            loopdev = None
+            entry = find_loop(loops, disk['device_or_file'])
+            if entry is None:
+                disk['status'] = 'Unmounted'
+                disk.pop('loop_effective', None)
+                disk.pop('loop_mismatch', None)
+                continue
+            # What the kernel actually applied, shown next to the disk
+            disk['loop_effective'] = describe(entry)
+            disk['loop_mismatch'] = mismatches(disk.get('loop') or {}, entry)
             if disk.get('encrypted'):
-                import os
-                luks_name = os.path.basename(disk['device_or_file']) + '_luks'
-                luks_path = f'/dev/mapper/{luks_name}'
-                if os.path.exists(luks_path):
-                    loopdev = luks_path
+                devices = (entry['mapper'], entry['mapper_devno'])
             else:
-                for line in losetup.splitlines():
-                    if disk['device_or_file'] in line:
-                        import re
-                        m = re.match(r'(/dev/loop\d+):', line)
-                        if m:
-                            loopdev = m.group(1)
-                            break
-            if loopdev and any(loopdev in mline for mline in mounts.splitlines()):
+                devices = (entry['device'], entry['devno'])
+            if any(dev and dev in mounted for dev in devices):
                 disk['status'] = 'Mounted'
             else:
                 disk['status'] = 'Unmounted'
@@ -0,0 +1,111 @@
+# Filesystems for file disks.
+#
+# mkfs: fast-format command, the device is appended. ext4 leaves inode tables
+#   and the journal to be initialised lazily by the kernel after the first
+#   mount, nothing is discarded (the image is fresh anyway) and there is one
+#   inode per 32 KiB instead of 16 KiB, so a large image formats about as
+#   fast as a small one.
+# type: filesystem type passed to mount -t.
+# mount_options: the options VDM may set on this filesystem (discard is used
+#   on zram, where freed blocks give memory back).
+# grow: command growing the mounted filesystem; grow_target says whether the
+#   device or the mountpoint is appended.
+# offline_resize: can be checked and resized while unmounted (xfs and btrfs
+#   only grow while mounted).
+# new_uuid: command giving a cloned filesystem its own UUID, the device is
+#   appended (ext4 wants an fsck first). XFS clones are mounted with nouuid
+#   instead, since xfs_admin refuses a log that was not cleanly unmounted.
+FILESYSTEMS = {
+    'ext4': {
+        'label': 'ext4',
+        'mkfs': ['mkfs.ext4', '-F', '-q', '-m', '0', '-i', '32768', '-E', 'lazy_itable_init=1,lazy_journal_init=1,nodiscard'],
+        'type': 'ext4',
+        'mount_options': ('noatime', 'nobarrier', 'commit', 'discard'),
+        'grow': ['resize2fs'], 'grow_target': 'device',
+        'offline_resize': True,
+        'new_uuid': ['tune2fs', '-U', 'random'],
+    },
+    'ext4-nojournal': {
+        'label': 'ext4 without journal (scratch data)',
+        'mkfs': ['mkfs.ext4', '-F', '-q', '-m', '0', '-i', '32768', '-O', '^has_journal', '-E', 'lazy_itable_init=1,nodiscard'],
+        'type': 'ext4',
+        'mount_options': ('noatime', 'discard'),
+        'grow': ['resize2fs'], 'grow_target': 'device',
+        'offline_resize': True,
+        'new_uuid': ['tune2fs', '-U', 'random'],
+    },
+    'xfs': {
+        'label': 'XFS',
+        'mkfs': ['mkfs.xfs', '-f', '-q', '-K'],
+        'type': 'xfs',
+        # nobarrier was removed from XFS in Linux 4.19
+        'mount_options': ('noatime', 'discard', 'nouuid'),
+        'grow': ['xfs_growfs'], 'grow_target': 'mountpoint',
+        'offline_resize': False,
+        'new_uuid': None,
+    },
+    'btrfs': {
+        'label': 'Btrfs',
+        'mkfs': ['mkfs.btrfs', '-f', '-q', '-K'],
+        'type': 'btrfs',
+        'mount_options': ('noatime', 'nobarrier', 'commit', 'discard'),
+        'grow': ['btrfs', 'filesystem', 'resize', 'max'], 'grow_target': 'mountpoint',
+        'offline_resize': False,
+        # metadata_uuid: changes the UUID without rewriting every metadata block
+        'new_uuid': ['btrfstune', '-f', '-m'],
+    },
+}
+DEFAULT_FILESYSTEM = 'ext4'
+# Mount option presets; options a filesystem does not support are left out.
+MOUNT_PRESETS = {
+    'default': {},
+    'noatime': {'noatime': True},
+    'scratch': {'noatime': True, 'nobarrier': True, 'commit': 60},
+}
+DEFAULT_MOUNT_PRESET = 'default'
+COMMIT_MAX = 300
+
+def filesystem(name):
+    """Definition of a filesystem; disks created before the choice existed are ext4."""
+    name = name or DEFAULT_FILESYSTEM
+    if name not in FILESYSTEMS:
+        raise ValueError(f'unknown filesystem {name!r}')
+    return FILESYSTEMS[name]
+
+def preset(fstype, name):
+    """Options of a mount preset that fstype supports."""
+    if name not in MOUNT_PRESETS:
+        raise ValueError(f'unknown mount preset {name!r}')
+    supported = filesystem(fstype)['mount_options']
+    return {key: value for key, value in MOUNT_PRESETS[name].items() if key in supported}
+
+def validate_mount_options(fstype, options):
+    """Raise ValueError if fstype does not support one of the options."""
+    supported = filesystem(fstype)['mount_options']
+    for key in options:
+        if key not in supported:
+            raise ValueError(f'{key} is not supported on {fstype} (supported: {", ".join(supported)})')
+    option_string(options)
+
+def option_string(options):
+    """The -o argument of mount for an options dict."""
+    parts = []
+    for key, value in options.items():
+        if key in ('noatime', 'nobarrier', 'discard', 'nouuid'):
+            if value is True:
+                parts.append(key)
+        elif key == 'commit':
+            if not isinstance(value, int) or isinstance(value, bool) or not 0 < value <= COMMIT_MAX:
+                raise ValueError(f'commit: seconds between 1 and {COMMIT_MAX} required')
+            parts.append(f'commit={value}')
+        else:
+            raise ValueError(f'unknown mount option {key!r}')
+    return ','.join(parts)
+
+def describe(disk):
+    """Short text of the filesystem and mount options of a disk entry."""
+    parts = [disk.get('filesystem') or DEFAULT_FILESYSTEM]
+    options = disk.get('mount_options') or {}
+    if options:
+        parts.append(option_string(options))
+    return ', '.join(parts)
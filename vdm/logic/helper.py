@@ -0,0 +1,527 @@
+"""Long-lived privileged helper.
+
+The GUI (or CLI) starts this module once through sudo. It listens on a Unix
+socket that only the invoking user can reach and runs batches of named disk
+operations, so a whole create/mount/delete costs one request instead of one
+sudo per command. Each connection carries one batch:
+
+    -> {"batch": [{"op": "mkdir", "path": "/mnt/x"}, {"op": "mount", ...}]}
+    <- {"event": "step", "index": 0, "text": "..."}
+    <- {"event": "progress", "done": 1048576, "total": 4294967296}
+    <- {"event": "done", "results": [{"returncode": 0, "stdout": "", "stderr": ""}, ...]}
+       or {"event": "error", "index": 1, "argv": [...], "returncode": 32, ...}
+
+Closing the connection cancels the batch and kills the running command.
+Running the helper with --fake executes nothing, which is how the protocol
+can be exercised without root.
+"""
+import argparse
+import json
+import os
+import re
+import select
+import selectors
+import shutil
+import signal
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+from vdm.logic.alloc import allocate_file, DEFAULT_ALLOCATION
+from vdm.logic.reflink import clone_file
+from vdm.logic.loopprofiles import QUEUE_SETTINGS
+from vdm.logic import filesystems
+
+
+class Cancelled(Exception):
+    """Raised inside an operation once it has been cancelled."""
+
+class HelperError(RuntimeError):
+    """The helper could not be started or rejected a request."""
+
+# --- argument validation -----------------------------------------------------
+
+_SIZE = re.compile(r'^\d+(\.\d+)?[KMGkmg]?$')
+_NAME = re.compile(r'^[A-Za-z0-9._-]+$')
+_MODE = re.compile(r'^[0-7]{3,4}$')
+
+def _path(args, key):
+    value = args.get(key)
+    if not isinstance(value, str) or not value.startswith('/') or '\0' in value:
+        raise ValueError(f'{key}: absolute path required')
+    return value
+
+def _match(args, key, pattern):
+    value = str(args.get(key, ''))
+    if not pattern.match(value):
+        raise ValueError(f'{key}: invalid value {value!r}')
+    return value
+
+def _attach(a):
+    argv = ['losetup', '--find', '--show']
+    if a.get('direct_io'):
+        argv.append('--direct-io=on')
+    if a.get('sector_size'):
+        if a['sector_size'] not in (512, 1024, 2048, 4096):
+            raise ValueError('sector_size: must be 512, 1024, 2048 or 4096')
+        argv += ['--sector-size', str(a['sector_size'])]
+    return argv + [_path(a, 'path')]
+
+def _mount(a):
+    argv = ['mount']
+    if a.get('fstype'):
+        argv += ['-t', filesystems.filesystem(a['fstype'])['type']]
+    options = filesystems.option_string(a.get('options') or {})
+    if options:
+        argv += ['-o', options]
+    return argv + [_path(a, 'device'), _path(a, 'mountpoint')]
+
+def _new_uuid(a):
+    fs = filesystems.filesystem(a.get('fstype'))
+    if not fs['new_uuid']:
+        raise ValueError(f"fstype: {a.get('fstype')} gets no new UUID")
+    return fs['new_uuid'] + [_path(a, 'device')]
+
+def _grow_fs(a):
+    fs = filesystems.filesystem(a.get('fstype'))
+    return fs['grow'] + [_path(a, fs['grow_target'])]
+
+_HUGE = re.compile(r'^(never|always|within_size|advise)$')
+
+def _tmpfs_options(a):
+    options = [f"size={_match(a, 'size', _SIZE)}"]
+    if a.get('huge'):
+        options.append(f"huge={_match(a, 'huge', _HUGE)}")
+    if a.get('nr_inodes'):
+        options.append(f"nr_inodes={_match(a, 'nr_inodes', _SIZE)}")
+    if a.get('mode'):
+        options.append(f"mode={_match(a, 'mode', _MODE)}")
+    for key in ('uid', 'gid'):
+        if a.get(key) is not None:
+            options.append(f'{key}={_int(a, key)}')
+    if a.get('noatime'):
+        options.append('noatime')
+    return ','.join(options)
+
+def _int(args, key):
+    value = args.get(key)
+    if not isinstance(value, int) or value < 0:
+        raise ValueError(f'{key}: non-negative integer required')
+    return value
+
+# --- operations ----------------------------------------------------------------
+
+OPS = {
+    'mkdir': lambda a: ['mkdir', '-p', _path(a, 'path')],
+    'rmdir': lambda a: ['rmdir', _path(a, 'path')],
+    'remove': lambda a: ['rm', '-f', _path(a, 'path')],
+    'rename': lambda a: ['mv', '-f', '-T', _path(a, 'path'), _path(a, 'target')],
+    'chmod': lambda a: ['chmod', _match(a, 'mode', _MODE), _path(a, 'path')],
+    'mount_tmpfs': lambda a: ['mount', '-t', 'tmpfs', '-o', _tmpfs_options(a), 'tmpfs', _path(a, 'mountpoint')],
+    'remount_tmpfs': lambda a: ['mount', '-o', f"remount,size={_match(a, 'size', _SIZE)}", _path(a, 'mountpoint')],
+    'mount': _mount,
+    'umount': lambda a: ['umount', _path(a, 'mountpoint')],
+    'fsfreeze': lambda a: ['fsfreeze', '-f', _path(a, 'mountpoint')],
+    'fsthaw': lambda a: ['fsfreeze', '-u', _path(a, 'mountpoint')],
+    'fstrim': lambda a: ['fstrim', '-v', _path(a, 'mountpoint')],
+    'dig_holes': lambda a: ['fallocate', '--dig-holes', _path(a, 'path')],
+    'attach': _attach,
+    'detach': lambda a: ['losetup', '-d', _path(a, 'device')],
+    'loop_set_capacity': lambda a: ['losetup', '-c', _path(a, 'device')],
+    'luks_format': lambda a: ['cryptsetup', 'luksFormat', _path(a, 'path'), '--batch-mode'],
+    'luks_open': lambda a: ['cryptsetup', 'luksOpen'] + (['--allow-discards'] if a.get('allow_discards') else []) + [_path(a, 'path'), _match(a, 'name', _NAME)],
+    'luks_close': lambda a: ['cryptsetup', 'luksClose', _match(a, 'name', _NAME)],
+    'luks_resize': lambda a: ['cryptsetup', 'resize', _match(a, 'name', _NAME)],
+    'mkfs': lambda a: filesystems.filesystem(a.get('fstype'))['mkfs'] + [_path(a, 'device')],
+    'fsck': lambda a: ['e2fsck', '-f', '-p', _path(a, 'device')],
+    'grow_fs': _grow_fs,
+    'new_uuid': _new_uuid,
+}
+# Operations that read a secret (LUKS passphrase) on stdin; luks_resize only needs it for LUKS2.
+TAKES_INPUT = {'luks_format', 'luks_open', 'luks_resize'}
+
+def _allocate(args, emit, stop):
+    def progress(done, total):
+        emit({'event': 'progress', 'done': done, 'total': total})
+    try:
+        elapsed = allocate_file(_path(args, 'path'), _int(args, 'size'), args.get('mode', DEFAULT_ALLOCATION), progress, stop,
+                                bool(args.get('create')))
+    except InterruptedError:
+        raise Cancelled()
+    except (OSError, ValueError) as e:
+        return {'returncode': 1, 'stdout': '', 'stderr': str(e)}
+    return {'returncode': 0, 'stdout': '', 'stderr': '', 'elapsed': elapsed}
+
+def _clone(args, emit, stop):
+    """Copy the image at path to the new file target (reflink or sparse copy); stdout is the method used."""
+    def progress(done, total):
+        emit({'event': 'progress', 'done': done, 'total': total})
+    try:
+        result = clone_file(_path(args, 'path'), _path(args, 'target'), progress, stop, bool(args.get('reflink_only')))
+    except InterruptedError:
+        raise Cancelled()
+    except (OSError, ValueError) as e:
+        return {'returncode': 1, 'stdout': '', 'stderr': str(e)}
+    return {'returncode': 0, 'stdout': result['method'] + '\n', 'stderr': '', 'bytes': result['bytes'], 'elapsed': result['elapsed']}
+
+_QUEUE_DEVICE = re.compile(r'^(loop|dm-)\d+$')
+def _tune_queue(args, emit, stop):
+    """Write block queue settings (read_ahead_kb, nr_requests) of a loop or dm device."""
+    try:
+        name = os.path.basename(os.path.realpath(_path(args, 'device')))
+        if not _QUEUE_DEVICE.match(name):
+            raise ValueError('device: loop or device-mapper device required')
+        values = {key: _int(args, key) for key in QUEUE_SETTINGS if args.get(key) is not None}
+    except ValueError as e:
+        return {'returncode': 1, 'stdout': '', 'stderr': str(e)}
+    errors = []
+    for key, value in values.items():
+        try:
+            with open(f'/sys/block/{name}/queue/{key}', 'w') as f:
+                f.write(str(value))
+        except OSError as e:
+            errors.append(f'{key}: {e.strerror}')
+    return {'returncode': 1 if errors else 0, 'stdout': '', 'stderr': '; '.join(errors)}
+
+_ZRAM_DEVICE = re.compile(r'^zram(\d+)$')
+ZRAM_CONTROL = '/sys/class/zram-control'
+
+def _zram_name(args):
+    name = os.path.basename(_path(args, 'device'))
+    if not _ZRAM_DEVICE.match(name):
+        raise ValueError('device: zram device required')
+    return name
+
+def _sysfs_ops(writes):
+    """Write (path, value) pairs in order, stopping at the first error."""
+    for path, value in writes:
+        try:
+            with open(path, 'w') as f:
+                f.write(str(value))
+        except OSError as e:
+            return {'returncode': 1, 'stdout': '', 'stderr': f'{path}: {e.strerror}'}
+    return {'returncode': 0, 'stdout': '', 'stderr': ''}
+
+def _zram_add(args, emit, stop):
+    """Hot-add a zram device; stdout is its /dev path."""
+    try:
+        with open(os.path.join(ZRAM_CONTROL, 'hot_add'), 'r') as f:
+            number = int(f.read().strip())
+    except (OSError, ValueError) as e:
+        return {'returncode': 1, 'stdout': '', 'stderr': f'zram hot_add failed: {e} (is the zram module loaded?)'}
+    return {'returncode': 0, 'stdout': f'/dev/zram{number}\n', 'stderr': ''}
+
+def _zram_setup(args, emit, stop):
+    """Set algorithm, memory limit and size of a fresh zram device (the size goes last: it initialises the device)."""
+    try:
+        base = f'/sys/block/{_zram_name(args)}'
+        writes = [(f'{base}/comp_algorithm', _match(args, 'algorithm', _NAME))]
+        if args.get('mem_limit') is not None:
+            writes.append((f'{base}/mem_limit', _int(args, 'mem_limit')))
+        writes.append((f'{base}/disksize', _int(args, 'disksize')))
+    except ValueError as e:
+        return {'returncode': 1, 'stdout': '', 'stderr': str(e)}
+    return _sysfs_ops(writes)
+
+def _zram_limit(args, emit, stop):
+    """Change the memory limit of a zram device (0 removes it)."""
+    try:
+        writes = [(f'/sys/block/{_zram_name(args)}/mem_limit', _int(args, 'mem_limit'))]
+    except ValueError as e:
+        return {'returncode': 1, 'stdout': '', 'stderr': str(e)}
+    return _sysfs_ops(writes)
+
+def _zram_remove(args, emit, stop):
+    """Reset and hot-remove a zram device, refusing devices used as swap."""
+    try:
+        name = _zram_name(args)
+    except ValueError as e:
+        return {'returncode': 1, 'stdout': '', 'stderr': str(e)}
+    try:
+        with open('/proc/swaps', 'r') as f:
+            swaps = f.read().split()
+    except OSError:
+        swaps = []
+    if f'/dev/{name}' in swaps:
+        return {'returncode': 1, 'stdout': '', 'stderr': f'/dev/{name} is in use as swap'}
+    number = _ZRAM_DEVICE.match(name).group(1)
+    return _sysfs_ops([(f'/sys/block/{name}/reset', 1), (os.path.join(ZRAM_CONTROL, 'hot_remove'), number)])
+
+# Operations implemented in Python rather than by running a command.
+HANDLERS = {'allocate': _allocate, 'clone': _clone, 'tune_queue': _tune_queue, 'zram_add': _zram_add, 'zram_setup': _zram_setup,
+            'zram_limit': _zram_limit, 'zram_remove': _zram_remove}
+
+def run_command(argv, input=None, stop=None):
+    """Run argv, feeding input; kill it when stop() turns true.
+
+    Returns (returncode, stdout, stderr), or raises Cancelled.
+    """
+    proc = subprocess.Popen(argv, stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if input is not None:
+        try:
+            proc.stdin.write(input.encode())
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+    out, err = [], []
+    with selectors.DefaultSelector() as sel:
+        sel.register(proc.stdout, selectors.EVENT_READ, out)
+        sel.register(proc.stderr, selectors.EVENT_READ, err)
+        while sel.get_map():
+            if stop is not None and stop():
+                proc.kill()
+                proc.wait()
+                raise Cancelled()
+            for key, _ in sel.select(0.2):
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    sel.unregister(key.fileobj)
+                    continue
+                key.data.append(chunk)
+    proc.wait()
+    return proc.returncode, b''.join(out).decode(errors='replace'), b''.join(err).decode(errors='replace')
+
+def _resolve(args, results):
+    """Replace {"ref": i} values with the stripped stdout of op i of the batch."""
+    resolved = {}
+    for key, value in args.items():
+        if isinstance(value, dict) and 'ref' in value:
+            value = results[value['ref']]['stdout'].strip()
+        resolved[key] = value
+    return resolved
+
+def _fake_result(name, args):
+    if name == 'attach':
+        return {'returncode': 0, 'stdout': '/dev/loop99\n', 'stderr': ''}
+    if name == 'zram_add':
+        return {'returncode': 0, 'stdout': '/dev/zram99\n', 'stderr': ''}
+    if name == 'clone':
+        return {'returncode': 0, 'stdout': 'reflink\n', 'stderr': '', 'bytes': 0, 'elapsed': 0.0}
+    return {'returncode': 0, 'stdout': '', 'stderr': ''}
+
+def execute_batch(batch, emit, stop=None, fake=False):
+    """Run a batch of operations in order, reporting through emit(); returns the final message."""
+    results = []
+    for index, item in enumerate(batch):
+        name = item.get('op')
+        handler = HANDLERS.get(name)
+        try:
+            args = _resolve(item, results)
+            argv = OPS[name](args) if handler is None else [name, str(args.get('path') or args.get('device', ''))]
+        except KeyError:
+            return {'event': 'error', 'index': index, 'message': f'unknown operation {name!r}', 'results': results}
+        except (ValueError, IndexError, TypeError) as e:
+            return {'event': 'error', 'index': index, 'message': f'{name}: {e}', 'results': results}
+        if item.get('step'):
+            emit({'event': 'step', 'index': index, 'text': item['step']})
+        if fake:
+            sys.stderr.write('vdm-helper (fake): ' + ' '.join(argv) + '\n')
+            results.append(_fake_result(name, args))
+            continue
+        if handler is not None:
+            result = handler(args, emit, stop)
+        else:
+            returncode, stdout, stderr = run_command(
+                argv, input=args.get('input') if name in TAKES_INPUT else None, stop=stop)
+            result = {'returncode': returncode, 'stdout': stdout, 'stderr': stderr}
+        results.append(result)
+        if result['returncode'] != 0 and item.get('check', True):
+            return {'event': 'error', 'index': index, 'argv': argv, 'returncode': result['returncode'],
+                    'stdout': result['stdout'], 'stderr': result['stderr'], 'results': results}
+    return {'event': 'done', 'results': results}
+
+# --- server ----------------------------------------------------------------------
+
+def _peer_uid(conn):
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    return struct.unpack('3i', creds)[1]
+
+def _handle(conn, owner, fake):
+    with conn:
+        if _peer_uid(conn) not in (0, owner):
+            return
+        reader = conn.makefile('r')
+        line = reader.readline()
+        if not line:
+            return
+        try:
+            batch = json.loads(line)['batch']
+        except (ValueError, KeyError, TypeError):
+            conn.sendall(b'{"event": "error", "message": "malformed request"}\n')
+            return
+        hangup = threading.Event()
+
+        def emit(message):
+            try:
+                conn.sendall(json.dumps(message).encode() + b'\n')
+            except OSError:
+                hangup.set()
+
+        def stop():
+            # The client sends nothing after its request, so readable means EOF.
+            if not hangup.is_set():
+                readable, _, _ = select.select([conn], [], [], 0)
+                if readable:
+                    hangup.set()
+            return hangup.is_set()
+
+        try:
+            emit(execute_batch(batch, emit, stop=stop, fake=fake))
+        except Cancelled:
+            pass
+
+def _parent_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+def serve(socket_path, owner, parent=None, fake=False):
+    """Accept batches on socket_path until the parent process goes away."""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(socket_path)
+    finally:
+        os.umask(old_umask)
+    if os.geteuid() == 0:
+        os.chown(socket_path, owner, -1)
+    server.listen(16)
+    server.settimeout(1.0)
+    sys.stdout.write('ready\n')
+    sys.stdout.flush()
+    try:
+        while parent is None or _parent_alive(parent):
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                continue
+            conn.settimeout(None)
+            threading.Thread(target=_handle, args=(conn, owner, fake), daemon=True).start()
+    finally:
+        server.close()
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='vdm-helper', description='VDM privileged helper')
+    parser.add_argument('--socket', required=True)
+    parser.add_argument('--owner', type=int, required=True)
+    parser.add_argument('--parent', type=int)
+    parser.add_argument('--fake', action='store_true', help='log operations instead of running them')
+    args = parser.parse_args(argv)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    serve(args.socket, args.owner, args.parent, args.fake)
+    return 0
+
+# --- client ----------------------------------------------------------------------
+
+class HelperClient:
+    """Starts the helper on first use and sends it batches."""
+
+    def __init__(self, fake=None):
+        if fake is None:
+            fake = os.environ.get('VDM_HELPER') == 'fake'
+        self.fake = fake
+        self.socket_path = None
+        self._proc = None
+        self._lock = threading.Lock()
+
+    def _command(self):
+        args = ['--socket', self.socket_path, '--owner', str(os.getuid()), '--parent', str(os.getpid())]
+        if self.fake:
+            args.append('--fake')
+        if getattr(sys, 'frozen', False):
+            cmd = [sys.executable, '--vdm-helper'] + args
+        else:
+            cmd = [sys.executable, '-m', 'vdm.logic.helper'] + args
+        return cmd if self.fake else ['sudo'] + cmd
+
+    def start(self):
+        with self._lock:
+            if self._proc is not None and self._proc.poll() is None:
+                return
+            self.socket_path = os.path.join(tempfile.mkdtemp(prefix='vdm-'), 'helper.sock')
+            package_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+            self._proc = subprocess.Popen(self._command(), stdout=subprocess.PIPE, text=True, cwd=package_root)
+            if self._proc.stdout.readline().strip() != 'ready':
+                self._proc.wait()
+                self._proc = None
+                shutil.rmtree(os.path.dirname(self.socket_path), ignore_errors=True)
+                raise HelperError('Could not start the privileged helper (sudo failed?)')
+
+    def close(self):
+        with self._lock:
+            if self._proc is not None:
+                self._proc.terminate()
+                self._proc.wait()
+                self._proc = None
+                shutil.rmtree(os.path.dirname(self.socket_path), ignore_errors=True)
+
+    def batch(self, ops, on_step=None, on_progress=None, cancelled=None):
+        """Run ops (list of dicts) and return their result dicts.
+
+        Raises subprocess.CalledProcessError for the first failing op that
+        has check enabled, HelperError for rejected requests and Cancelled
+        when cancelled() turns true.
+        """
+        self.start()
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(self.socket_path)
+            conn.sendall(json.dumps({'batch': ops}).encode() + b'\n')
+            conn.settimeout(0.2)
+            buf = b''
+            while True:
+                if cancelled is not None and cancelled():
+                    raise Cancelled()
+                try:
+                    chunk = conn.recv(65536)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    raise HelperError('Privileged helper closed the connection')
+                buf += chunk
+                while b'\n' in buf:
+                    line, buf = buf.split(b'\n', 1)
+                    message = json.loads(line)
+                    event = message.get('event')
+                    if event == 'step':
+                        if on_step:
+                            on_step(message['text'])
+                    elif event == 'progress':
+                        if on_progress:
+                            on_progress(message['done'], message['total'])
+                    elif event == 'done':
+                        return message['results']
+                    elif 'returncode' in message:
+                        raise subprocess.CalledProcessError(message['returncode'], message['argv'],
+                                                            message['stdout'], message['stderr'])
+                    else:
+                        raise HelperError(message.get('message', 'helper error'))
+        finally:
+            conn.close()
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Process-wide helper client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HelperClient()
+        return _client
+
+if __name__ == '__main__':
+    sys.exit(main())
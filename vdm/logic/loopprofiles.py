@@ -0,0 +1,60 @@
+# Loop device performance profiles.
+#
+# direct_io: the loop device bypasses its own page cache, so each page is
+#   cached once (by the backing filesystem) instead of twice.
+# sector_size: logical block size of the loop device. Fixed when the disk is
+#   created, since the filesystem is formatted for it.
+# read_ahead_kb / nr_requests: block queue tuning, written to sysfs after attach.
+LOOP_PROFILES = {
+    'default': {},
+    'direct-io': {'direct_io': True, 'sector_size': 4096},
+    'build-cache': {'direct_io': True, 'sector_size': 4096, 'read_ahead_kb': 1024, 'nr_requests': 256},
+}
+DEFAULT_LOOP_PROFILE = 'default'
+SETTINGS = ('direct_io', 'sector_size', 'read_ahead_kb', 'nr_requests')
+QUEUE_SETTINGS = ('read_ahead_kb', 'nr_requests')
+
+def profile_settings(name):
+    """Settings dict of a named profile."""
+    if name not in LOOP_PROFILES:
+        raise ValueError(f'unknown loop profile {name!r}')
+    return dict(LOOP_PROFILES[name])
+
+def attach_op(path, settings, step='Attaching loop device'):
+    """Helper 'attach' operation applying the attach-time settings."""
+    op = {'op': 'attach', 'path': path, 'step': step}
+    if settings.get('direct_io'):
+        op['direct_io'] = True
+    if settings.get('sector_size'):
+        op['sector_size'] = settings['sector_size']
+    return op
+
+def tune_ops(devices, settings):
+    """Helper operations applying the queue settings to each device (loop, then LUKS mapper)."""
+    values = {key: settings[key] for key in QUEUE_SETTINGS if settings.get(key)}
+    if not values:
+        return []
+    # Best effort: a kernel that refuses a value should not fail the mount
+    return [dict(values, op='tune_queue', device=device, check=False) for device in devices]
+
+def mismatches(settings, entry):
+    """Settings of the profile that the attached loop device (scan_loops entry) does not have."""
+    if entry is None:
+        return []
+    wrong = []
+    for key in SETTINGS:
+        wanted = settings.get(key)
+        if wanted and entry.get(key) != wanted:
+            wrong.append(key)
+    return wrong
+
+def describe(entry):
+    """Short text of the effective settings of an attached loop device."""
+    parts = ['direct-io' if entry.get('direct_io') else 'buffered']
+    if entry.get('sector_size'):
+        parts.append(f"{entry['sector_size']}B sectors")
+    if entry.get('read_ahead_kb'):
+        parts.append(f"readahead {entry['read_ahead_kb']}K")
+    if entry.get('nr_requests'):
+        parts.append(f"{entry['nr_requests']} requests")
+    return ', '.join(parts)
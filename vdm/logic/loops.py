@@ -0,0 +1,94 @@
+import os
+
+SYSFS_BLOCK = '/sys/block'
+_DELETED = ' (deleted)'
+
+def _read(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _read_int(path):
+    value = _read(path)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+def _block_sort_key(name):
+    digits = ''.join(c for c in name if c.isdigit())
+    return (name.rstrip('0123456789'), int(digits) if digits else -1)
+
+def canonical(path):
+    """Canonical form of a backing file path, as the kernel reports it in sysfs."""
+    return os.path.realpath(path)
+
+def _scan_mappers(sysfs, names):
+    """Map loop device name -> (/dev/mapper/<name>, devno) for dm devices stacked on a loop."""
+    mappers = {}
+    for name in names:
+        if not name.startswith('dm-'):
+            continue
+        dm_name = _read(os.path.join(sysfs, name, 'dm', 'name'))
+        if not dm_name:
+            continue
+        try:
+            slaves = os.listdir(os.path.join(sysfs, name, 'slaves'))
+        except OSError:
+            continue
+        for slave in slaves:
+            if slave.startswith('loop'):
+                mappers[slave] = (f'/dev/mapper/{dm_name}', _read(os.path.join(sysfs, name, 'dev')))
+    return mappers
+
+def scan_loops(sysfs=SYSFS_BLOCK):
+    """Index attached loop devices by canonical backing file, without privileges.
+
+    Each value is a dict with the loop 'device', 'devno', 'offset', 'sizelimit',
+    the effective 'direct_io', 'sector_size', 'read_ahead_kb' and 'nr_requests'
+    and, when a device-mapper target (LUKS) sits on top of it, 'mapper' and
+    'mapper_devno'. If a file is attached more than once the lowest loop wins.
+    """
+    index = {}
+    try:
+        names = sorted(os.listdir(sysfs), key=_block_sort_key)
+    except OSError:
+        return index
+    mappers = _scan_mappers(sysfs, names)
+    for name in names:
+        if not name.startswith('loop'):
+            continue
+        base = os.path.join(sysfs, name)
+        backing = _read(os.path.join(base, 'loop', 'backing_file'))
+        if not backing:
+            continue
+        deleted = backing.endswith(_DELETED)
+        if deleted:
+            backing = backing[:-len(_DELETED)]
+        mapper, mapper_devno = mappers.get(name, (None, None))
+        index.setdefault(backing, {
+            'device': f'/dev/{name}',
+            'name': name,
+            'devno': _read(os.path.join(base, 'dev')),
+            'backing_file': backing,
+            'offset': _read_int(os.path.join(base, 'loop', 'offset')),
+            'sizelimit': _read_int(os.path.join(base, 'loop', 'sizelimit')),
+            'deleted': deleted,
+            # Effective I/O settings, to check a performance profile against
+            'direct_io': _read(os.path.join(base, 'loop', 'dio')) == '1',
+            'sector_size': _read_int(os.path.join(base, 'queue', 'logical_block_size')),
+            'read_ahead_kb': _read_int(os.path.join(base, 'queue', 'read_ahead_kb')),
+            'nr_requests': _read_int(os.path.join(base, 'queue', 'nr_requests')),
+            'mapper': mapper,
+            'mapper_devno': mapper_devno,
+        })
+    return index
+
+def find_loop(index, path):
+    """Look up the loop entry for a backing file path in an index from scan_loops()."""
+    entry = index.get(path)
+    if entry is None:
+        entry = index.get(canonical(path))
+    return entry
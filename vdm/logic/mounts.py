@@ -0,0 +1,120 @@
+import os
+import re
+import select
+import threading
+import time
+
+MOUNTINFO = '/proc/self/mountinfo'
+# Fallback lifetime of a cached table, for kernels/sandboxes where poll() on
+# mountinfo never reports changes.
+CACHE_TTL = 5.0
+
+_lock = threading.Lock()
+_state = {'fd': None, 'poller': None, 'generation': 0, 'stamp': 0.0, 'mounts': None}
+_ESCAPE = re.compile(r'\\([0-7]{3})')
+
+def _unescape(field):
+    """Decode the octal escapes (\\040 etc.) the kernel uses for paths in mountinfo."""
+    if '\\' not in field:
+        return field
+    return _ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), field)
+
+def parse_options(text):
+    """Parse a comma separated option string into a dict ('ro' -> True, 'size=1g' -> '1g')."""
+    options = {}
+    for item in text.split(','):
+        if not item:
+            continue
+        key, sep, value = item.partition('=')
+        options[key] = value if sep else True
+    return options
+
+def parse_mountinfo(text):
+    """Parse the contents of /proc/<pid>/mountinfo into a list of mount dicts."""
+    mounts = []
+    for line in text.splitlines():
+        fields = line.split(' ')
+        try:
+            sep = fields.index('-', 6)
+        except ValueError:
+            continue
+        if len(fields) < sep + 3:
+            continue
+        options = parse_options(fields[5])
+        if len(fields) > sep + 3:
+            options.update(parse_options(fields[sep + 3]))
+        mounts.append({
+            'id': int(fields[0]),
+            'parent': int(fields[1]),
+            'devno': fields[2],
+            'root': _unescape(fields[3]),
+            'mountpoint': _unescape(fields[4]),
+            'fstype': fields[sep + 1],
+            'device': _unescape(fields[sep + 2]),
+            'options': options,
+        })
+    return mounts
+
+def read_mounts(path=MOUNTINFO):
+    """Read and parse a mountinfo file, bypassing the cache."""
+    with open(path, 'r') as f:
+        return parse_mountinfo(f.read())
+
+def _table_changed():
+    """True if the kernel signalled a mount table change since the last call.
+
+    The kernel raises POLLPRI on an open mountinfo fd whenever the mount
+    namespace changes, so one persistent fd gives us a cheap change counter.
+    """
+    poller = _state['poller']
+    if poller is None:
+        try:
+            fd = os.open(MOUNTINFO, os.O_RDONLY | os.O_CLOEXEC)
+        except OSError:
+            return False
+        poller = select.poll()
+        poller.register(fd, select.POLLPRI | select.POLLERR)
+        _state['fd'], _state['poller'] = fd, poller
+        return True
+    return bool(poller.poll(0))
+
+def get_mounts(max_age=CACHE_TTL):
+    """Return the current mount table, re-reading it only when it has changed."""
+    with _lock:
+        now = time.monotonic()
+        changed = _table_changed()
+        if changed:
+            _state['generation'] += 1
+        if changed or _state['mounts'] is None or now - _state['stamp'] > max_age:
+            try:
+                _state['mounts'] = read_mounts()
+            except OSError:
+                _state['mounts'] = []
+            _state['stamp'] = now
+        return _state['mounts']
+
+def mount_generation():
+    """Counter bumped every time the kernel reports a mount table change."""
+    get_mounts()
+    return _state['generation']
+
+def invalidate():
+    """Drop the cached table so the next get_mounts() re-reads it."""
+    with _lock:
+        _state['mounts'] = None
+
+def tmpfs_mounts():
+    """All mounted tmpfs filesystems."""
+    return [m for m in get_mounts() if m['fstype'] == 'tmpfs']
+
+def mounted_devices():
+    """Set of mount sources (e.g. '/dev/loop0', '/dev/mapper/x_luks')."""
+    return {m['device'] for m in get_mounts()}
+
+def find_mount(mountpoint):
+    """Return the topmost mount at mountpoint, or None."""
+    found = None
+    for m in get_mounts():
+        if m['mountpoint'] == mountpoint:
+            found = m
+    return found
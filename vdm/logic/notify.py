@@ -0,0 +1,165 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+# Notifications arriving within this window are delivered together
+COALESCE_SECONDS = 0.5
+# A burst with more distinct notifications than this becomes one summary
+BURST_LIMIT = 3
+SUMMARY_KEY = 'vdm-summary'
+# Rate limit across bursts (token bucket): up to RATE_BURST popups at once, then one every RATE_SECONDS
+RATE_BURST = 3
+RATE_SECONDS = 5.0
+# Keyed notifications the backend remembers to update in place (oldest forgotten first)
+SHOWN_LIMIT = 32
+
+class Notify2Backend:
+    """Desktop notifications over the D-Bus session bus, with one session per process."""
+
+    def __init__(self, app_name='VDM', shown_limit=SHOWN_LIMIT):
+        self.app_name = app_name
+        self.shown_limit = shown_limit
+        self._notify2 = None
+        self._shown = OrderedDict()
+
+    def _init(self):
+        if self._notify2 is None:
+            import notify2
+            notify2.init(self.app_name)
+            self._notify2 = notify2
+        return self._notify2
+
+    def show(self, key, title, message, icon=None, urgency=None):
+        notify2 = self._init()
+        n = self._shown.get(key) if key is not None else None
+        if n is None:
+            n = notify2.Notification(title, message, icon)
+            if key is not None:
+                self._shown[key] = n
+                if len(self._shown) > self.shown_limit:
+                    self._shown.popitem(last=False)
+        else:
+            # Mesma chave: atualiza a notificação que já está na tela
+            n.update(title, message, icon)
+            self._shown.move_to_end(key)
+        n.set_urgency(notify2.URGENCY_NORMAL if urgency is None else urgency)
+        n.show()
+
+class Notifier:
+    """Sends notifications from a background thread.
+
+    notify() only enqueues. The sender waits COALESCE_SECONDS after the first
+    notification of a burst; within the burst a later notification with the
+    same key replaces the earlier one, and more than BURST_LIMIT distinct ones
+    are merged into a single summary. Across bursts a token bucket allows
+    RATE_BURST popups and then one every RATE_SECONDS: what arrives while it
+    is empty is held back and folded into the next summary. Errors from the
+    notification daemon are ignored, as notifications are best effort.
+    """
+
+    def __init__(self, backend=None, coalesce=COALESCE_SECONDS, burst_limit=BURST_LIMIT, rate_burst=RATE_BURST, rate_seconds=RATE_SECONDS):
+        self.backend = backend or Notify2Backend()
+        self.coalesce = coalesce
+        self.burst_limit = burst_limit
+        self.rate_burst = rate_burst
+        self.rate_seconds = rate_seconds
+        self._tokens = float(rate_burst)
+        self._refilled = time.monotonic()
+        self._held = []
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def notify(self, title, message, icon=None, urgency=None, key=None):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='vdm-notify', daemon=True)
+                self._thread.start()
+        self._queue.put((key, title, message, icon, urgency))
+
+    def close(self, timeout=2.0):
+        """Deliver what is pending, held back ones included, and stop the sender thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(float(self.rate_burst), self._tokens + (now - self._refilled) / self.rate_seconds)
+        self._refilled = now
+
+    def _next_token(self):
+        """Seconds until a popup is allowed again."""
+        self._refill()
+        return max(0.0, (1 - self._tokens) * self.rate_seconds)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self._next_token() if self._held else None)
+            except queue.Empty:
+                # A token came back: show what was held
+                self._deliver([])
+                continue
+            if item is None:
+                self._deliver([], force=True)
+                return
+            burst = [item]
+            deadline = time.monotonic() + self.coalesce
+            stop = False
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                burst.append(item)
+            self._deliver(burst, force=stop)
+            if stop:
+                return
+
+    def _deliver(self, burst, force=False):
+        pending = {}
+        for n, item in enumerate(self._held + burst):
+            key = item[0] if item[0] is not None else ('', n)
+            pending.pop(key, None)
+            pending[key] = item
+        items = list(pending.values())
+        if not items:
+            return
+        self._refill()
+        allowed = len(items) if force else min(self.burst_limit, int(self._tokens))
+        if allowed < 1:
+            self._held = items
+            return
+        self._held = []
+        if len(items) > allowed:
+            title = f'{len(items)} notifications'
+            lines = [f'{t}: {m}' for _, t, m, _, _ in items]
+            icon = items[-1][3]
+            items = [(SUMMARY_KEY, title, '\n'.join(lines), icon, max((u for *_, u in items if u is not None), default=None))]
+        self._tokens = max(0.0, self._tokens - len(items))
+        for key, title, message, icon, urgency in items:
+            try:
+                self.backend.show(key, title, message, icon, urgency)
+            except Exception:
+                pass
+
+_notifier = None
+_notifier_lock = threading.Lock()
+
+def get_notifier():
+    """Process-wide notifier."""
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            _notifier = Notifier()
+        return _notifier
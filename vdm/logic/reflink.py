@@ -0,0 +1,113 @@
+import errno
+import fcntl
+import logging
+import os
+import time
+
+log = logging.getLogger(__name__)
+
+# ioctl(dest_fd, FICLONE, src_fd): share all extents of src with dest (btrfs, XFS with reflink=1).
+FICLONE = 0x40049409
+COPY_CHUNK = 64 * 1024 * 1024
+_NO_REFLINK = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.EPERM)
+_NO_OFFLOAD = (errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.EINVAL)
+
+def data_ranges(fd, size):
+    """(start, end) of the ranges of fd that hold data, found with SEEK_DATA/SEEK_HOLE.
+
+    Filesystems without SEEK_DATA report the whole file as data.
+    """
+    offset = 0
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, os.SEEK_DATA)
+        except OSError as e:
+            if e.errno == errno.ENXIO:
+                # Only a hole is left
+                return
+            if e.errno == errno.EINVAL and offset == 0:
+                yield 0, size
+                return
+            raise
+        end = min(os.lseek(fd, start, os.SEEK_HOLE), size)
+        yield start, end
+        offset = end
+
+def data_bytes(fd, size):
+    return sum(end - start for start, end in data_ranges(fd, size))
+
+def _copy_range(src, dst, start, end, stop, progress):
+    offset = start
+    offload = hasattr(os, 'copy_file_range')
+    while offset < end:
+        if stop is not None and stop():
+            raise InterruptedError('copy cancelled')
+        count = min(COPY_CHUNK, end - offset)
+        if offload:
+            try:
+                n = os.copy_file_range(src, dst, count, offset, offset)
+            except OSError as e:
+                if e.errno not in _NO_OFFLOAD:
+                    raise
+                offload = False
+                continue
+        else:
+            n = os.pwrite(dst, os.pread(src, count, offset), offset)
+        if n == 0:
+            # The source shrank while we copied it
+            break
+        offset += n
+        progress(n)
+
+def sparse_copy(src, dst, size, progress=None, stop=None):
+    """Copy only the data ranges of src into dst (an empty file), leaving holes where src has them.
+
+    Returns the number of data bytes copied.
+    """
+    total = data_bytes(src, size)
+    os.ftruncate(dst, size)
+    done = [0]
+
+    def advance(n):
+        done[0] += n
+        if progress:
+            progress(done[0], total)
+
+    for start, end in data_ranges(src, size):
+        _copy_range(src, dst, start, end, stop, advance)
+    os.fsync(dst)
+    return done[0]
+
+def clone_file(source, target, progress=None, stop=None, reflink_only=False):
+    """Copy the image source to the new file target, by reflink when possible.
+
+    Returns {'method': 'reflink' or 'copy', 'bytes': data bytes copied,
+    'elapsed': seconds}. stop() is polled during a copy and aborts it with
+    InterruptedError; target is removed if anything fails. With
+    reflink_only, a filesystem without reflink raises OSError instead of
+    copying.
+    """
+    start = time.monotonic()
+    src = os.open(source, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        st = os.fstat(src)
+        dst = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC, st.st_mode & 0o777)
+        try:
+            try:
+                fcntl.ioctl(dst, FICLONE, src)
+                method, copied = 'reflink', 0
+            except OSError as e:
+                if e.errno not in _NO_REFLINK or reflink_only:
+                    raise
+                method = 'copy'
+                copied = sparse_copy(src, dst, st.st_size, progress, stop)
+        except BaseException:
+            os.close(dst)
+            os.unlink(target)
+            raise
+        os.close(dst)
+    finally:
+        os.close(src)
+    elapsed = time.monotonic() - start
+    log.info('Cloned %s to %s (%s, %d bytes copied) in %.3fs', source, target, method, copied, elapsed)
+    return {'method': method, 'bytes': copied, 'elapsed': elapsed}
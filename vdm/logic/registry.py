@@ -0,0 +1,174 @@
+import json
+import os
+import sqlite3
+import threading
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS disks (
+    id INTEGER PRIMARY KEY,
+    device_or_file TEXT NOT NULL,
+    mountpoint TEXT NOT NULL,
+    data TEXT NOT NULL,
+    UNIQUE (device_or_file, mountpoint)
+);
+CREATE INDEX IF NOT EXISTS disks_mountpoint ON disks (mountpoint);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+# Where older versions kept the disk list (relative to the working directory or the checkout).
+LEGACY_JSON = ('discos.json', os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'discos.json'))
+
+def default_path():
+    """Canonical registry location: $VDM_REGISTRY or $XDG_DATA_HOME/vdm/registry.db."""
+    if os.environ.get('VDM_REGISTRY'):
+        return os.environ['VDM_REGISTRY']
+    data_home = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(data_home, 'vdm', 'registry.db')
+
+def disk_key(disk):
+    return (disk.get('device_or_file'), disk.get('mountpoint'))
+
+# Live readings and one-off results kept on the disk dicts for display; never persisted
+TRANSIENT_KEYS = ('loop_effective', 'loop_mismatch', 'zram_effective', 'stage', 'clone', 'import')
+
+def _encode(disk):
+    return json.dumps({key: value for key, value in disk.items() if key not in TRANSIENT_KEYS}, sort_keys=True)
+
+class DiskRegistry:
+    """Persistent disk list in SQLite (WAL), indexed by backing file and mountpoint.
+
+    The registry remembers what it last wrote for every entry, so sync() of
+    an unchanged list touches nothing on disk. TRANSIENT_KEYS are left out,
+    so a refresh that only changes live readings writes nothing either. Every write is one transaction,
+    which keeps the file consistent if VDM dies halfway.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or default_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=FULL')
+        self._db.executescript(SCHEMA)
+        # What is stored for every entry, read from the table on first use
+        self._written = None
+        self._migrate_legacy_json()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _migrate_legacy_json(self):
+        if self.get_meta('legacy_json_migrated'):
+            return
+        for path in LEGACY_JSON:
+            if os.path.exists(path):
+                try:
+                    with open(path, 'r') as f:
+                        discos = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                for disk in discos:
+                    self.put(disk)
+                break
+        self.set_meta('legacy_json_migrated', '1')
+
+    def all(self):
+        """All entries, in creation order."""
+        with self._lock:
+            rows = self._db.execute('SELECT data FROM disks ORDER BY id').fetchall()
+            discos = [json.loads(data) for data, in rows]
+            self._written = {disk_key(d): data for d, (data,) in zip(discos, rows)}
+        return discos
+
+    def _stored(self):
+        # Called with the lock held
+        if self._written is None:
+            rows = self._db.execute('SELECT device_or_file, mountpoint, data FROM disks').fetchall()
+            self._written = {(device_or_file, mountpoint): data for device_or_file, mountpoint, data in rows}
+        return self._written
+
+    def get(self, device_or_file, mountpoint):
+        with self._lock:
+            row = self._db.execute('SELECT data FROM disks WHERE device_or_file = ? AND mountpoint = ?',
+                                   (device_or_file, mountpoint)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_by_file(self, device_or_file):
+        with self._lock:
+            rows = self._db.execute('SELECT data FROM disks WHERE device_or_file = ? ORDER BY id', (device_or_file,)).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def find_by_mountpoint(self, mountpoint):
+        with self._lock:
+            rows = self._db.execute('SELECT data FROM disks WHERE mountpoint = ? ORDER BY id', (mountpoint,)).fetchall()
+        return [json.loads(data) for data, in rows]
+
+    def put(self, disk):
+        """Insert or replace one entry."""
+        data = _encode(disk)
+        key = disk_key(disk)
+        with self._lock, self._db:
+            self._upsert(key, data)
+            self._stored()[key] = data
+
+    def remove(self, device_or_file, mountpoint):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM disks WHERE device_or_file = ? AND mountpoint = ?', (device_or_file, mountpoint))
+            self._stored().pop((device_or_file, mountpoint), None)
+
+    def sync(self, discos):
+        """Make the registry match discos, writing only entries that changed.
+
+        Returns the number of rows written or deleted.
+        """
+        wanted = {}
+        for disk in discos:
+            wanted[disk_key(disk)] = _encode(disk)
+        with self._lock:
+            stored = self._stored()
+            changed = [(key, data) for key, data in wanted.items() if stored.get(key) != data]
+            removed = [key for key in stored if key not in wanted]
+            if not changed and not removed:
+                return 0
+            with self._db:
+                self._db.execute('BEGIN')
+                for key, data in changed:
+                    self._upsert(key, data)
+                for key in removed:
+                    self._db.execute('DELETE FROM disks WHERE device_or_file = ? AND mountpoint = ?', key)
+            # Only once the transaction has committed
+            for key, data in changed:
+                stored[key] = data
+            for key in removed:
+                del stored[key]
+        return len(changed) + len(removed)
+
+    def _upsert(self, key, data):
+        self._db.execute('INSERT INTO disks (device_or_file, mountpoint, data) VALUES (?, ?, ?) '
+                         'ON CONFLICT (device_or_file, mountpoint) DO UPDATE SET data = excluded.data',
+                         (key[0], key[1], data))
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._lock, self._db:
+            self._db.execute('INSERT INTO meta (key, value) VALUES (?, ?) '
+                             'ON CONFLICT (key) DO UPDATE SET value = excluded.value', (key, value))
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_registry():
+    """Process-wide registry at the canonical location."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DiskRegistry()
+        return _registry
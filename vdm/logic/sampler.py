@@ -0,0 +1,151 @@
+import os
+import time
+from array import array
+
+# Samples kept per mountpoint (ring buffer)
+HISTORY = 120
+# Fill rate is measured over the samples of the last RATE_WINDOW seconds
+RATE_WINDOW = 30.0
+DEFAULT_THRESHOLD = 0.9
+# Alert when a disk will be full in less than this many seconds
+DEFAULT_HORIZON = 10 * 60
+# Idle sampling period; sampling speeds up while a disk fills (see watch.sample_interval)
+IDLE_INTERVAL = 5.0
+
+# t, used bytes, total bytes, used inodes, total inodes
+_FIELDS = 5
+
+class UsageHistory:
+    """Fixed-size ring buffer of statvfs samples for one mountpoint, stored in an array('d')."""
+
+    def __init__(self, size=HISTORY):
+        self.size = size
+        self.data = array('d', bytes(8 * _FIELDS * size))
+        self.head = 0
+        self.count = 0
+
+    def append(self, t, used, total, inodes_used, inodes_total):
+        i = self.head * _FIELDS
+        self.data[i:i + _FIELDS] = array('d', (t, used, total, inodes_used, inodes_total))
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def sample(self, age):
+        """age 0 is the newest sample, 1 the one before, ..."""
+        if age >= self.count:
+            raise IndexError(age)
+        i = ((self.head - 1 - age) % self.size) * _FIELDS
+        return tuple(self.data[i:i + _FIELDS])
+
+    def latest(self):
+        return self.sample(0) if self.count else None
+
+    def rates(self, window=RATE_WINDOW):
+        """(bytes/s, inodes/s) between the oldest sample inside window and the newest."""
+        if self.count < 2:
+            return 0.0, 0.0
+        newest = self.sample(0)
+        age = 1
+        while age + 1 < self.count and newest[0] - self.sample(age + 1)[0] <= window:
+            age += 1
+        oldest = self.sample(age)
+        dt = newest[0] - oldest[0]
+        if dt <= 0:
+            return 0.0, 0.0
+        return (newest[1] - oldest[1]) / dt, (newest[3] - oldest[3]) / dt
+
+def statvfs_usage(mountpoint):
+    """(used bytes, total bytes, used inodes, total inodes) as seen by unprivileged users."""
+    st = os.statvfs(mountpoint)
+    total = st.f_frsize * st.f_blocks
+    inodes_total = st.f_files
+    return total - st.f_frsize * st.f_bavail, total, inodes_total - st.f_favail, inodes_total
+
+def _time_to_full(used, total, rate):
+    if rate <= 0 or total <= 0:
+        return None
+    return max(0.0, (total - used) / rate)
+
+class UsageSampler:
+    """Samples disk usage, forecasts when each disk fills up and decides when to alert.
+
+    sample() returns alert dicts with 'mountpoint', 'kind' ('threshold',
+    'forecast', 'inodes' or 'inodes_forecast'), 'percent' and 'time_to_full'
+    (seconds or None). An alert is raised once and re-armed when its
+    condition clears.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, horizon=DEFAULT_HORIZON, history=HISTORY, usage=statvfs_usage):
+        self.threshold = threshold
+        self.horizon = horizon
+        self.history_size = history
+        self.usage = usage
+        self.histories = {}
+        self.raised = set()
+        self.fill_rate = 0.0
+
+    def sample(self, mountpoints, now=None):
+        """Sample mountpoints; returns (alerts, changed) where changed tells if any usage moved."""
+        now = time.monotonic() if now is None else now
+        alerts = []
+        changed = False
+        fill_rate = 0.0
+        for mountpoint in mountpoints:
+            try:
+                used, total, inodes_used, inodes_total = self.usage(mountpoint)
+            except OSError:
+                continue
+            history = self.histories.get(mountpoint)
+            if history is None:
+                history = self.histories[mountpoint] = UsageHistory(self.history_size)
+            last = history.latest()
+            if last is None or last[1] != used or last[3] != inodes_used:
+                changed = True
+            history.append(now, used, total, inodes_used, inodes_total)
+            byte_rate, inode_rate = history.rates()
+            if total > 0:
+                fill_rate = max(fill_rate, byte_rate / total)
+            if inodes_total > 0:
+                fill_rate = max(fill_rate, inode_rate / inodes_total)
+            alerts += self._check(mountpoint, 'threshold', 'forecast', used, total, byte_rate)
+            alerts += self._check(mountpoint, 'inodes', 'inodes_forecast', inodes_used, inodes_total, inode_rate)
+        for mountpoint in set(self.histories) - set(mountpoints):
+            self.forget(mountpoint)
+        self.fill_rate = fill_rate
+        return alerts, changed
+
+    def _check(self, mountpoint, full_kind, forecast_kind, used, total, rate):
+        if total <= 0:
+            return []
+        alerts = []
+        percent = used / total
+        eta = _time_to_full(used, total, rate)
+        if self._update(mountpoint, full_kind, percent >= self.threshold, percent < self.threshold):
+            alerts.append({'mountpoint': mountpoint, 'kind': full_kind, 'percent': percent, 'time_to_full': eta})
+        # Re-armed only once the forecast is comfortably outside the horizon again
+        soon = eta is not None and eta < self.horizon and percent < 1.0
+        clear = eta is None or eta > 1.5 * self.horizon
+        if self._update(mountpoint, forecast_kind, soon, clear):
+            alerts.append({'mountpoint': mountpoint, 'kind': forecast_kind, 'percent': percent, 'time_to_full': eta})
+        return alerts
+
+    def _update(self, mountpoint, kind, active, clear):
+        key = (mountpoint, kind)
+        if active and key not in self.raised:
+            self.raised.add(key)
+            return True
+        if clear:
+            self.raised.discard(key)
+        return False
+
+    def time_to_full(self, mountpoint):
+        """Seconds until the bytes of mountpoint run out at the current rate, or None."""
+        history = self.histories.get(mountpoint)
+        if history is None or not history.count:
+            return None
+        _, used, total, _, _ = history.latest()
+        return _time_to_full(used, total, history.rates()[0])
+
+    def forget(self, mountpoint):
+        self.histories.pop(mountpoint, None)
+        self.raised = {key for key in self.raised if key[0] != mountpoint}
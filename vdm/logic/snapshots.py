@@ -0,0 +1,183 @@
+# Snapshots and clones of file disks.
+#
+# Both copy the backing image with the helper's 'clone' operation: a reflink
+# (FICLONE) where the filesystem holding the images supports it (btrfs, XFS),
+# so the copy is instant and shares its blocks until one side writes, and a
+# copy of the data ranges only (SEEK_DATA/SEEK_HOLE) elsewhere. A mounted
+# disk is frozen (fsfreeze) for the reflink, so the copy holds a consistent
+# filesystem; without reflink a mounted disk must be unmounted first.
+#
+# Snapshots live next to the image, in <image>.snapshots/, and are listed in
+# the registry entry of the disk. A clone is a new file disk with its own
+# entry; its filesystem gets a new UUID so it can be mounted beside the
+# original.
+import os
+import re
+import time
+from vdm.logic import filesystems
+from vdm.logic.alloc import DEFAULT_ALLOCATION
+from vdm.logic.actions import luks_name, mount_op
+from vdm.logic.loops import scan_loops, find_loop
+from vdm.logic.loopprofiles import DEFAULT_LOOP_PROFILE, profile_settings, attach_op, tune_ops
+from vdm.logic.utils import format_size
+
+_NAME = re.compile(r'^[A-Za-z0-9._-]+$')
+
+def snapshot_directory(disk):
+    return disk['device_or_file'] + '.snapshots'
+
+def list_snapshots(disk):
+    """Snapshots of a file disk, oldest first."""
+    return list(disk.get('snapshots') or [])
+
+def find_snapshot(disk, name):
+    for record in disk.get('snapshots') or []:
+        if record['name'] == name:
+            return record
+    raise ValueError(f"{disk['device_or_file']} has no snapshot {name!r}")
+
+def clone_image(ctx, disk, source, target, step):
+    """Run the helper 'clone' of source to target.
+
+    If source is the image of the mounted disk, the disk is frozen for a
+    reflink only: a copy would block its writers for as long as it runs, so
+    without reflink the clone is refused and the disk must be unmounted.
+    """
+    if source != disk['device_or_file'] or disk.get('status') != 'Mounted':
+        result = ctx.call('clone', path=source, target=target, step=step)
+    else:
+        ctx.call('fsfreeze', mountpoint=disk['mountpoint'], step='Freezing filesystem')
+        try:
+            result = ctx.call('clone', path=source, target=target, reflink_only=True, check=False, step=step)
+        finally:
+            ctx.call('fsthaw', mountpoint=disk['mountpoint'], check=False, cancellable=False)
+        if result['returncode'] != 0:
+            raise ValueError(f"cannot reflink {source} ({result['stderr'].strip()}); a copy would keep {disk['mountpoint']} "
+                             'frozen while it runs, so unmount the disk first')
+    return {'method': result['stdout'].strip() or 'copy', 'bytes': result.get('bytes', 0), 'elapsed': result.get('elapsed', 0.0)}
+
+def snapshot_file_disk(ctx, disk, name=None):
+    """Snapshot the image of a file disk; the record is added to disk['snapshots'] and returned."""
+    if disk.get('type') != 'File':
+        raise ValueError('only file disks have snapshots')
+    name = name or time.strftime('%Y%m%d-%H%M%S')
+    if not _NAME.match(name):
+        raise ValueError(f'invalid snapshot name {name!r} (letters, digits, ".", "_" and "-")')
+    if any(record['name'] == name for record in disk.get('snapshots') or []):
+        raise ValueError(f'snapshot {name!r} already exists')
+    directory = snapshot_directory(disk)
+    path = os.path.join(directory, name + '.img')
+    ctx.call('mkdir', path=directory, step='Creating snapshot directory')
+    try:
+        result = clone_image(ctx, disk, disk['device_or_file'], path, 'Copying image')
+    except BaseException:
+        if not disk.get('snapshots'):
+            ctx.call('rmdir', path=directory, check=False, cancellable=False)
+        raise
+    record = dict(result, name=name, file=path, created=time.time(), size=disk['size'])
+    disk.setdefault('snapshots', []).append(record)
+    return record
+
+def revert_file_disk(ctx, disk, name):
+    """Put the image of an unmounted file disk back to a snapshot; the snapshot is kept."""
+    record = find_snapshot(disk, name)
+    if disk.get('status') == 'Mounted':
+        raise ValueError('unmount the disk before reverting it')
+    image = disk['device_or_file']
+    ops = []
+    if disk.get('encrypted'):
+        ops.append({'op': 'luks_close', 'name': luks_name(image), 'check': False, 'step': 'Closing LUKS container'})
+    # A loop device left attached would keep the old image open
+    entry = find_loop(scan_loops(), image)
+    if entry:
+        ops.append({'op': 'detach', 'device': entry['device'], 'check': False, 'step': 'Detaching loop device'})
+    work = image + '.revert'
+    ops += [
+        {'op': 'remove', 'path': work, 'check': False},
+        {'op': 'clone', 'path': record['file'], 'target': work, 'step': f'Copying snapshot {name}'},
+        {'op': 'rename', 'path': work, 'target': image, 'step': 'Replacing image'},
+    ]
+    ctx.batch(ops)
+    disk['size'] = record['size']
+    return record
+
+def delete_snapshot(ctx, disk, name):
+    record = find_snapshot(disk, name)
+    ops = [{'op': 'remove', 'path': record['file'], 'step': f'Removing snapshot {name}'}]
+    if len(disk['snapshots']) == 1:
+        ops.append({'op': 'rmdir', 'path': snapshot_directory(disk), 'check': False})
+    ctx.batch(ops)
+    disk['snapshots'].remove(record)
+
+def clone_file_disk(ctx, disk, file_path, mountpoint, password=None, snapshot=None):
+    """Copy a file disk (or one of its snapshots) to file_path and mount the copy at mountpoint.
+
+    The clone keeps the filesystem, mount options, loop profile and
+    encryption of the original (and so its password). Returns its registry
+    entry.
+    """
+    if disk.get('type') != 'File':
+        raise ValueError('only file disks can be cloned')
+    if disk.get('encrypted') and not password:
+        raise ValueError('the password of the encrypted disk is required')
+    record = find_snapshot(disk, snapshot) if snapshot else None
+    source = record['file'] if record else disk['device_or_file']
+    fstype = disk.get('filesystem') or filesystems.DEFAULT_FILESYSTEM
+    fs = filesystems.filesystem(fstype)
+    mount_options = dict(disk.get('mount_options') or {})
+    if fs['new_uuid'] is None:
+        mount_options['nouuid'] = True
+    settings = disk.get('loop') or profile_settings(disk.get('loop_profile', DEFAULT_LOOP_PROFILE))
+    result = clone_image(ctx, disk, source, file_path, 'Copying image')
+    ops = [attach_op(file_path, settings)]
+    loop = {'ref': 0}
+    if disk.get('encrypted'):
+        fsdev = f'/dev/mapper/{luks_name(file_path)}'
+        ops.append({'op': 'luks_open', 'path': loop, 'name': luks_name(file_path), 'input': password + '\n', 'allow_discards': bool(disk.get('allow_discards')),
+                    'step': 'Unlocking LUKS container'})
+        ops += tune_ops([loop, fsdev], settings)
+    else:
+        fsdev = loop
+        ops += tune_ops([loop], settings)
+    if fs['new_uuid']:
+        if fs['type'] == 'ext4':
+            # tune2fs wants a checked filesystem; a frozen copy was never unmounted
+            ops.append({'op': 'fsck', 'device': fsdev, 'check': False, 'step': 'Checking filesystem'})
+        ops.append({'op': 'new_uuid', 'fstype': fstype, 'device': fsdev, 'step': 'Giving the clone a new UUID'})
+    ops += [
+        {'op': 'mkdir', 'path': mountpoint, 'step': 'Mounting'},
+        mount_op({'filesystem': fstype, 'mount_options': mount_options}, fsdev, mountpoint),
+    ]
+    try:
+        ctx.batch(ops)
+    except BaseException:
+        cleanup = []
+        if disk.get('encrypted'):
+            cleanup.append({'op': 'luks_close', 'name': luks_name(file_path), 'check': False})
+        entry = find_loop(scan_loops(), file_path)
+        if entry:
+            cleanup.append({'op': 'detach', 'device': entry['device'], 'check': False})
+        ctx.batch(cleanup + [{'op': 'remove', 'path': file_path, 'check': False}], cancellable=False)
+        raise
+    return {
+        'type': 'File',
+        'device_or_file': file_path,
+        'mountpoint': mountpoint,
+        'size': record['size'] if record else disk['size'],
+        'status': 'Mounted',
+        'encrypted': bool(disk.get('encrypted')),
+        'allow_discards': bool(disk.get('allow_discards')),
+        'allocation': disk.get('allocation', DEFAULT_ALLOCATION),
+        'loop_profile': disk.get('loop_profile', DEFAULT_LOOP_PROFILE),
+        'loop': settings,
+        'filesystem': fstype,
+        'mount_options': mount_options,
+        'cloned_from': source,
+        'clone': result,
+    }
+
+def describe(result):
+    """'reflink in 0.01s' or 'copy of 1.20 GB in 3.1s'"""
+    if result['method'] == 'reflink':
+        return f"reflink in {result['elapsed']:.2f}s"
+    return f"copy of {format_size(result['bytes'])} in {result['elapsed']:.1f}s"
@@ -0,0 +1,257 @@
+# Staging a directory tree into a RAM disk.
+#
+# The tree is scanned once to size the tmpfs, directories are created up
+# front, then a thread pool copies the files: large files one per task, small
+# files grouped so a task moves at least BATCH_BYTES or BATCH_FILES. Data is
+# moved in the kernel with copy_file_range, falling back to sendfile (and to
+# read/write) where the filesystems do not support it. The copy can be
+# verified afterwards with BLAKE2b checksums, computed in parallel too.
+import errno
+import hashlib
+import os
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from vdm.logic.actions import create_ram_disk
+from vdm.logic.helper import Cancelled
+
+CHUNK = 64 * 1024 * 1024
+BATCH_BYTES = 8 * 1024 * 1024
+BATCH_FILES = 256
+# Files above this size get a task of their own
+LARGE_FILE = 4 * 1024 * 1024
+PAGE = 4096
+# tmpfs headroom over the data, and the smallest disk staging creates
+HEADROOM = 0.10
+MIN_SIZE_MB = 64
+PROGRESS_INTERVAL = 0.1
+_NO_OFFLOAD = (errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.EINVAL)
+
+def default_workers():
+    return min(32, (os.cpu_count() or 1) * 2)
+
+def scan_tree(source):
+    """Directories, files and symlinks under source, relative to it, with their total size.
+
+    Returns {'dirs': [...], 'files': [(rel, size)], 'links': [(rel, target)],
+    'bytes': n, 'allocated': n}; 'allocated' rounds every file up to whole
+    pages, which is what the copy takes on tmpfs.
+    """
+    tree = {'dirs': [], 'files': [], 'links': [], 'bytes': 0, 'allocated': 0}
+    pending = ['']
+    while pending:
+        rel = pending.pop()
+        with os.scandir(os.path.join(source, rel)) as entries:
+            for entry in entries:
+                path = os.path.join(rel, entry.name)
+                if entry.is_symlink():
+                    tree['links'].append((path, os.readlink(entry.path)))
+                elif entry.is_dir():
+                    tree['dirs'].append(path)
+                    pending.append(path)
+                elif entry.is_file():
+                    size = entry.stat().st_size
+                    tree['files'].append((path, size))
+                    tree['bytes'] += size
+                    tree['allocated'] += -(-size // PAGE) * PAGE
+    # Parents before children
+    tree['dirs'].sort()
+    return tree
+
+def stage_size(tree, headroom=HEADROOM):
+    """tmpfs size for a scanned tree: its pages plus headroom, e.g. '1180M'."""
+    # One page per directory and symlink too
+    allocated = tree['allocated'] + (len(tree['dirs']) + len(tree['links'])) * PAGE
+    mb = -(-int(allocated * (1 + headroom)) // (1024 * 1024))
+    return f'{max(mb, MIN_SIZE_MB)}M'
+
+def _copy_data(src, dst, size, cancelled):
+    """Copy size bytes between two fds inside the kernel when possible."""
+    offset = 0
+    offload = hasattr(os, 'copy_file_range')
+    while offset < size:
+        if cancelled():
+            raise Cancelled()
+        count = min(CHUNK, size - offset)
+        if offload:
+            try:
+                n = os.copy_file_range(src, dst, count)
+            except OSError as e:
+                if e.errno not in _NO_OFFLOAD or offset:
+                    raise
+                offload = False
+                continue
+        else:
+            try:
+                n = os.sendfile(dst, src, offset, count)
+            except OSError as e:
+                if e.errno not in _NO_OFFLOAD:
+                    raise
+                os.lseek(src, offset, os.SEEK_SET)
+                n = os.write(dst, os.read(src, count))
+        if n == 0:
+            # The file shrank while we copied it
+            break
+        offset += n
+    return offset
+
+def _copy_file(source, dest, rel, cancelled):
+    src_path = os.path.join(source, rel)
+    dst_path = os.path.join(dest, rel)
+    src = os.open(src_path, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        st = os.fstat(src)
+        dst = os.open(dst_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, stat.S_IMODE(st.st_mode))
+        try:
+            copied = _copy_data(src, dst, st.st_size, cancelled)
+        finally:
+            os.close(dst)
+    finally:
+        os.close(src)
+    os.utime(dst_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    return copied
+
+def _batches(files):
+    """Group small files into tasks; large files get a task each."""
+    batch, batch_bytes = [], 0
+    for rel, size in files:
+        if size >= LARGE_FILE:
+            yield [rel]
+            continue
+        batch.append(rel)
+        batch_bytes += size
+        if batch_bytes >= BATCH_BYTES or len(batch) >= BATCH_FILES:
+            yield batch
+            batch, batch_bytes = [], 0
+    if batch:
+        yield batch
+
+class _Progress:
+    """Byte counter shared by the workers, forwarded to the context at most every PROGRESS_INTERVAL."""
+
+    def __init__(self, ctx, total):
+        self.ctx = ctx
+        self.total = total
+        self.done = 0
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, n):
+        with self._lock:
+            self.done += n
+            now = time.monotonic()
+            if now - self._last < PROGRESS_INTERVAL and self.done < self.total:
+                return
+            self._last = now
+            done = self.done
+        self.ctx.progress(done, self.total)
+
+def _run_pool(ctx, tasks, work, workers):
+    """Run work(task) for every task on a thread pool; stops at the first error or on cancel."""
+    stop = threading.Event()
+
+    def cancelled():
+        return stop.is_set() or ctx.cancelled
+
+    def run(task):
+        if cancelled():
+            raise Cancelled()
+        return work(task, cancelled)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run, task) for task in tasks]
+        try:
+            for future in futures:
+                results.append(future.result())
+        except BaseException:
+            stop.set()
+            for future in futures:
+                future.cancel()
+            raise
+    return results
+
+def copy_tree(ctx, source, dest, tree=None, workers=None):
+    """Copy the tree at source into the existing directory dest; returns {'files', 'bytes', 'elapsed', 'rate'}."""
+    tree = tree or scan_tree(source)
+    start = time.monotonic()
+    ctx.step('Creating directories')
+    for rel in tree['dirs']:
+        os.makedirs(os.path.join(dest, rel), exist_ok=True)
+    for rel, target in tree['links']:
+        os.symlink(target, os.path.join(dest, rel))
+    ctx.step('Copying files')
+    progress = _Progress(ctx, tree['bytes'])
+
+    def copy_batch(batch, cancelled):
+        copied = 0
+        for rel in batch:
+            n = _copy_file(source, dest, rel, cancelled)
+            copied += n
+            progress.add(n)
+        return copied
+
+    copied = sum(_run_pool(ctx, list(_batches(tree['files'])), copy_batch, workers or default_workers()))
+    # Directory times last: creating their entries changed them
+    for rel in reversed(tree['dirs']):
+        st = os.stat(os.path.join(source, rel))
+        os.chmod(os.path.join(dest, rel), stat.S_IMODE(st.st_mode))
+        os.utime(os.path.join(dest, rel), ns=(st.st_atime_ns, st.st_mtime_ns))
+    elapsed = time.monotonic() - start
+    return {'files': len(tree['files']), 'bytes': copied, 'elapsed': elapsed, 'rate': copied / elapsed if elapsed > 0 else 0}
+
+def file_digest(path, cancelled=None):
+    h = hashlib.blake2b()
+    with open(path, 'rb') as f:
+        while True:
+            if cancelled is not None and cancelled():
+                raise Cancelled()
+            chunk = f.read(1024 * 1024)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+def verify_tree(ctx, source, dest, tree=None, workers=None):
+    """Compare BLAKE2b checksums of every file; returns the relative paths that differ."""
+    tree = tree or scan_tree(source)
+    ctx.step('Verifying checksums')
+    progress = _Progress(ctx, tree['bytes'] * 2)
+
+    def check_batch(batch, cancelled):
+        different = []
+        for rel in batch:
+            if file_digest(os.path.join(source, rel), cancelled) != file_digest(os.path.join(dest, rel), cancelled):
+                different.append(rel)
+            progress.add(2 * os.path.getsize(os.path.join(dest, rel)))
+        return different
+
+    results = _run_pool(ctx, list(_batches(tree['files'])), check_batch, workers or default_workers())
+    return [rel for different in results for rel in different]
+
+def stage_directory(ctx, source, mountpoint, size=None, options=None, workers=None, verify=False):
+    """Create a RAM disk sized for source at mountpoint and copy source into it.
+
+    Returns the RAM disk entry with a 'stage' dict: files, bytes, elapsed,
+    rate and, if verify is set, 'mismatches'.
+    """
+    if not os.path.isdir(source):
+        raise ValueError(f'{source} is not a directory')
+    ctx.step('Scanning source')
+    tree = scan_tree(source)
+    created = not os.path.isdir(mountpoint)
+    disk = create_ram_disk(ctx, size or stage_size(tree), mountpoint, options=options)
+    try:
+        result = copy_tree(ctx, source, mountpoint, tree, workers)
+        if verify:
+            result['mismatches'] = verify_tree(ctx, source, mountpoint, tree, workers)
+    except BaseException:
+        # Nothing registers a half-filled RAM disk; take it down again
+        cleanup = [{'op': 'umount', 'mountpoint': mountpoint, 'check': False}]
+        if created:
+            cleanup.append({'op': 'rmdir', 'path': mountpoint, 'check': False})
+        ctx.batch(cleanup, cancellable=False)
+        raise
+    disk['stage'] = result
+    return disk
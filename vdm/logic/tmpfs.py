@@ -0,0 +1,81 @@
+import json
+import os
+
+SHMEM_ENABLED = '/sys/kernel/mm/transparent_hugepage/shmem_enabled'
+# Mount options a profile may set, in the order they are passed to mount
+OPTIONS = ('huge', 'nr_inodes', 'mode', 'uid', 'gid', 'noatime')
+HUGE_VALUES = ('never', 'always', 'within_size', 'advise')
+# 'user' in uid/gid means whoever creates the disk
+TMPFS_PROFILES = {
+    'default': {},
+    'large-files': {'huge': 'within_size', 'noatime': True},
+    'many-files': {'nr_inodes': '4m', 'noatime': True},
+    'private': {'mode': '0700', 'uid': 'user', 'gid': 'user', 'noatime': True},
+}
+DEFAULT_TMPFS_PROFILE = 'default'
+# Profiles saved by the user live in the registry meta table
+META_KEY = 'tmpfs_profiles'
+
+def supported_huge(path=SHMEM_ENABLED):
+    """huge= values the running kernel accepts for tmpfs; empty without THP support."""
+    try:
+        with open(path, 'r') as f:
+            words = f.read().replace('[', '').replace(']', '').split()
+    except OSError:
+        return set()
+    return {w for w in words if w in HUGE_VALUES}
+
+def load_profiles(registry=None):
+    """Built-in profiles plus the ones saved in the registry."""
+    profiles = {name: dict(options) for name, options in TMPFS_PROFILES.items()}
+    if registry is not None:
+        try:
+            profiles.update(json.loads(registry.get_meta(META_KEY, '{}')))
+        except ValueError:
+            pass
+    return profiles
+
+def save_profile(registry, name, options):
+    if name in TMPFS_PROFILES:
+        raise ValueError(f'{name!r} is a built-in profile')
+    validate(options)
+    saved = json.loads(registry.get_meta(META_KEY, '{}'))
+    saved[name] = options
+    registry.set_meta(META_KEY, json.dumps(saved, sort_keys=True))
+
+def validate(options, huge=None):
+    """Raise ValueError if options use something unknown or unsupported by this kernel."""
+    for key in options:
+        if key not in OPTIONS:
+            raise ValueError(f'unknown tmpfs option {key!r}')
+    value = options.get('huge')
+    if value and value != 'never':
+        if value not in HUGE_VALUES:
+            raise ValueError(f'huge: invalid value {value!r}')
+        supported = supported_huge() if huge is None else huge
+        if value not in supported:
+            raise ValueError(f'huge={value} is not supported by this kernel (shmem_enabled offers: {", ".join(sorted(supported)) or "nothing"})')
+
+def resolve(options):
+    """Options ready for the helper: 'user' replaced by the current uid/gid."""
+    resolved = dict(options)
+    if resolved.get('uid') == 'user':
+        resolved['uid'] = os.getuid()
+    if resolved.get('gid') == 'user':
+        resolved['gid'] = os.getgid()
+    return resolved
+
+def effective_options(mount):
+    """The profile-relevant options of a tmpfs mount, as the kernel reports them."""
+    options = mount['options']
+    effective = {}
+    for key in OPTIONS:
+        if key == 'noatime':
+            if options.get('noatime'):
+                effective['noatime'] = True
+        elif key in options:
+            effective[key] = options[key]
+    return effective
+
+def describe(effective):
+    return ', '.join(key if value is True else f'{key}={value}' for key, value in effective.items())
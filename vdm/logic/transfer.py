@@ -0,0 +1,243 @@
+# Export and import of file disks, to move them between hosts.
+#
+# Export reads only the data ranges of the image (SEEK_DATA/SEEK_HOLE), in
+# chunks of CHUNK bytes, and streams them through `zstd -T0` into the
+# archive. Chunks that are all zeros are left out like holes. Each chunk is
+# hashed with BLAKE2b on the way; the hashes, the image size and the
+# settings of the disk go to a manifest next to the archive
+# (<archive>.manifest.json).
+#
+# Import streams `zstd -d` back, checks every chunk against the manifest
+# before writing it at its offset of a new sparse image, then mounts and
+# registers the disk. Only one chunk is in memory at a time, whatever the
+# size of the image.
+#
+# Inside the zstd stream: MAGIC, then for each chunk its offset and length
+# (two little-endian u64) and its bytes, then a zero length.
+import hashlib
+import json
+import os
+import struct
+import subprocess
+import tempfile
+import time
+from vdm.logic.actions import luks_name, mount_file_disk
+from vdm.logic.loops import scan_loops, find_loop
+from vdm.logic.reflink import data_ranges
+from vdm.logic.snapshots import clone_image, find_snapshot
+from vdm.logic.utils import format_size
+
+MAGIC = b'VDMX1\n'
+FORMAT = 1
+CHUNK = 4 * 1024 * 1024
+ZSTD_LEVEL = 3
+MANIFEST_SUFFIX = '.manifest.json'
+_FRAME = struct.Struct('<QQ')
+# Disk settings carried over to the imported disk
+DISK_KEYS = ('size', 'encrypted', 'allow_discards', 'allocation', 'loop_profile', 'loop', 'filesystem', 'mount_options')
+
+def manifest_path(archive):
+    return archive + MANIFEST_SUFFIX
+
+def load_manifest(archive):
+    """Manifest of an export archive; ValueError if missing or of another format."""
+    try:
+        with open(manifest_path(archive), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f'cannot read the manifest of {archive}: {e}')
+    if manifest.get('format') != FORMAT:
+        raise ValueError(f"{archive}: unsupported export format {manifest.get('format')!r}")
+    return manifest
+
+def _chunks(fd, size):
+    """(offset, length) of the CHUNK-sized pieces of the data ranges of fd."""
+    for start, end in data_ranges(fd, size):
+        for offset in range(start, end, CHUNK):
+            yield offset, min(CHUNK, end - offset)
+
+def _read_exactly(stream, n):
+    data = stream.read(n)
+    if len(data) != n:
+        raise ValueError('archive is truncated')
+    return data
+
+def _finish(proc, log, argv):
+    proc.wait()
+    log.seek(0)
+    err = log.read().decode(errors='replace')
+    log.close()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, argv, '', err)
+
+def _stats(data, archive, elapsed):
+    return {'bytes': data, 'archive_bytes': os.path.getsize(archive), 'elapsed': elapsed, 'rate': data / elapsed if elapsed > 0 else 0}
+
+def export_file_disk(ctx, disk, archive, snapshot=None, level=ZSTD_LEVEL):
+    """Export the image of a file disk (or one of its snapshots) to archive and its manifest.
+
+    A mounted disk is exported from a temporary reflink snapshot, so writers
+    only wait for the instant copy; where the filesystem has no reflink it
+    is refused (unmount the disk first). Returns {'bytes', 'archive_bytes',
+    'elapsed', 'rate', 'chunks'}; 'bytes' counts the data read from the image.
+    """
+    if disk.get('type') != 'File':
+        raise ValueError('only file disks can be exported')
+    if snapshot:
+        return _export(ctx, disk, find_snapshot(disk, snapshot)['file'], archive, level)
+    if disk.get('status') != 'Mounted':
+        return _export(ctx, disk, disk['device_or_file'], archive, level)
+    temporary = f"{disk['device_or_file']}.export-{os.getpid()}"
+    ctx.call('remove', path=temporary, check=False)
+    clone_image(ctx, disk, disk['device_or_file'], temporary, 'Taking a temporary snapshot')
+    try:
+        return _export(ctx, disk, temporary, archive, level)
+    finally:
+        ctx.call('remove', path=temporary, check=False, cancellable=False)
+
+def _export(ctx, disk, source, archive, level):
+    fd = os.open(source, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        size = os.fstat(fd).st_size
+        total = sum(end - start for start, end in data_ranges(fd, size))
+        ctx.step(f'Exporting {format_size(total)} of data')
+        argv = ['zstd', '-q', '-f', '-T0', f'-{level}', '-o', archive]
+        log = tempfile.TemporaryFile()
+        proc = subprocess.Popen(argv, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=log)
+        chunks, done = [], 0
+        zero = bytes(CHUNK)
+        start = time.monotonic()
+        try:
+            proc.stdin.write(MAGIC)
+            for offset, length in _chunks(fd, size):
+                ctx.check()
+                data = os.pread(fd, length, offset)
+                done += length
+                ctx.progress(done, total)
+                # Zero chunks inside data ranges become holes too
+                if data == zero[:len(data)]:
+                    continue
+                chunks.append([offset, len(data), hashlib.blake2b(data).hexdigest()])
+                proc.stdin.write(_FRAME.pack(offset, len(data)))
+                proc.stdin.write(data)
+            proc.stdin.write(_FRAME.pack(size, 0))
+            proc.stdin.close()
+        except BrokenPipeError:
+            # zstd died; its exit status and stderr say why
+            pass
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            log.close()
+            _remove(archive)
+            raise
+        try:
+            _finish(proc, log, argv)
+        except subprocess.CalledProcessError:
+            _remove(archive)
+            raise
+        elapsed = time.monotonic() - start
+    finally:
+        os.close(fd)
+    manifest = {
+        'format': FORMAT,
+        'created': time.time(),
+        'source': disk['device_or_file'],
+        'image_size': size,
+        'chunk_size': CHUNK,
+        'hash': 'blake2b',
+        'data_bytes': sum(chunk[1] for chunk in chunks),
+        'chunks': chunks,
+        'disk': {key: disk[key] for key in DISK_KEYS if key in disk},
+    }
+    with open(manifest_path(archive) + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(manifest_path(archive) + '.tmp', manifest_path(archive))
+    return dict(_stats(done, archive, elapsed), chunks=len(chunks))
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def unpack_image(ctx, archive, file_path, manifest=None):
+    """Decompress archive into the new sparse image file_path, checking every chunk against the manifest.
+
+    Raises ValueError (and removes file_path) on any mismatch. Returns
+    {'bytes', 'archive_bytes', 'elapsed', 'rate', 'chunks'}.
+    """
+    manifest = manifest or load_manifest(archive)
+    expected = manifest['chunks']
+    total = manifest['data_bytes']
+    argv = ['zstd', '-q', '-d', '-c', archive]
+    log = tempfile.TemporaryFile()
+    fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_CLOEXEC, 0o644)
+    proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=log)
+    ctx.step(f'Importing {format_size(total)} of data')
+    start = time.monotonic()
+    done = 0
+    try:
+        os.ftruncate(fd, manifest['image_size'])
+        if _read_exactly(proc.stdout, len(MAGIC)) != MAGIC:
+            raise ValueError(f'{archive} is not a VDM export')
+        for index, (offset, length, digest) in enumerate(expected):
+            ctx.check()
+            if _FRAME.unpack(_read_exactly(proc.stdout, _FRAME.size)) != (offset, length):
+                raise ValueError(f'chunk {index} of {archive} does not match the manifest')
+            data = _read_exactly(proc.stdout, length)
+            if hashlib.blake2b(data).hexdigest() != digest:
+                raise ValueError(f'checksum mismatch in chunk {index} (offset {offset}) of {archive}')
+            os.pwrite(fd, data, offset)
+            done += length
+            ctx.progress(done, total)
+        if _FRAME.unpack(_read_exactly(proc.stdout, _FRAME.size))[1] != 0 or proc.stdout.read(1):
+            raise ValueError(f'{archive} holds more data than its manifest lists')
+        proc.stdout.close()
+        _finish(proc, log, argv)
+        os.fsync(fd)
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        if not log.closed:
+            log.close()
+        os.close(fd)
+        _remove(file_path)
+        raise
+    os.close(fd)
+    return dict(_stats(done, archive, time.monotonic() - start), chunks=len(expected))
+
+def import_file_disk(ctx, archive, file_path, mountpoint, password=None):
+    """Unpack an exported disk into file_path, mount it at mountpoint and return its registry entry.
+
+    The entry has the settings the disk was exported with, and the transfer
+    statistics under 'import'.
+    """
+    manifest = load_manifest(archive)
+    settings = manifest['disk']
+    if settings.get('encrypted') and not password:
+        raise ValueError('the password of the encrypted disk is required')
+    result = unpack_image(ctx, archive, file_path, manifest)
+    # unpack_image writes only the data ranges: the new image is sparse whatever the original was
+    disk = dict(settings, type='File', device_or_file=file_path, mountpoint=mountpoint, status='Unmounted', allocation='sparse')
+    try:
+        mount_file_disk(ctx, disk, mountpoint, password=password)
+    except BaseException:
+        cleanup = []
+        if disk.get('encrypted'):
+            cleanup.append({'op': 'luks_close', 'name': luks_name(file_path), 'check': False})
+        entry = find_loop(scan_loops(), file_path)
+        if entry:
+            cleanup.append({'op': 'detach', 'device': entry['device'], 'check': False})
+        if cleanup:
+            ctx.batch(cleanup, cancellable=False)
+        _remove(file_path)
+        raise
+    disk['status'] = 'Mounted'
+    disk['import'] = result
+    return disk
+
+def describe(result):
+    """'1.20 GB in 3.1s (387 MB/s), archive 410 MB'"""
+    return (f"{format_size(result['bytes'])} in {result['elapsed']:.1f}s ({format_size(int(result['rate']))}/s), "
+            f"archive {format_size(result['archive_bytes'])}")
@@ -1,6 +1,5 @@
 import os
 import sys
-import notify2
 
 def resource_path(relative_path):
     """
@@ -46,16 +45,9 @@ def get_disk_usage(mountpoint):
     used = total - free
     return used, total
 
-def send_notification(title, message, icon=None, urgency=None):
-    try:
-        notify2.init('VDM')
-        if icon is None:
-            icon = os.path.join(os.path.dirname(__file__), 'resources', 'vdm.png')
-        n = notify2.Notification(title, message, icon)
-        if urgency is not None:
-            n.set_urgency(urgency)
-        else:
-            n.set_urgency(notify2.URGENCY_NORMAL)
-        n.show()
-    except Exception:
-        pass 
\ No newline at end of file
+def send_notification(title, message, icon=None, urgency=None, key=None):
+    """Queue a desktop notification; a later one with the same key replaces it."""
+    from vdm.logic.notify import get_notifier
+    if icon is None:
+        icon = os.path.join(os.path.dirname(__file__), 'resources', 'vdm.png')
+    get_notifier().notify(title, message, icon, urgency, key)
@@ -0,0 +1,140 @@
+import os
+import select
+import socket
+import threading
+from vdm.logic.mounts import MOUNTINFO, invalidate
+from vdm.logic.loops import SYSFS_BLOCK
+
+NETLINK_KOBJECT_UEVENT = 15
+# Block devices whose uevents can change what VDM shows.
+WATCHED_DEVICES = ('loop', 'dm-')
+# Events arriving within this window are delivered as one callback.
+DEBOUNCE_MS = 150
+# Used only when the uevent socket is unavailable (e.g. in some containers).
+FALLBACK_POLL_MS = 5000
+
+def _uevent_socket():
+    """Open a netlink socket subscribed to kernel uevents, or None if not permitted."""
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_KOBJECT_UEVENT)
+        sock.bind((0, 1))
+        return sock
+    except (OSError, AttributeError):
+        return None
+
+def _is_watched_uevent(data):
+    """True for uevents about loop or device-mapper block devices."""
+    header = data.split(b'\0', 1)[0].decode('utf-8', 'replace')
+    if '/block/' not in header:
+        return False
+    name = header.rsplit('/', 1)[-1]
+    return name.startswith(WATCHED_DEVICES)
+
+def _loop_signature(sysfs=SYSFS_BLOCK):
+    try:
+        return tuple(sorted(n for n in os.listdir(sysfs) if n.startswith(WATCHED_DEVICES)))
+    except OSError:
+        return ()
+
+class DiskWatcher:
+    """Background thread that reports mount table and loop device changes.
+
+    It blocks in poll() on /proc/self/mountinfo (the kernel raises POLLPRI when
+    the mount namespace changes) and on a kernel uevent socket, so nothing runs
+    while the system is idle. callback(reasons) is called from the watcher
+    thread with a set containing 'mounts' and/or 'devices'.
+    """
+
+    def __init__(self, callback, mountinfo=MOUNTINFO):
+        self.callback = callback
+        self.mountinfo = mountinfo
+        self._thread = None
+        self._wake_r, self._wake_w = None, None
+        self._lock = threading.Lock()
+        self._running = False
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._wake_r, self._wake_w = os.pipe()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(self._wake_r, self._wake_w), name='vdm-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._running = False
+        with self._lock:
+            # The thread closes the pipe when it exits; wake it if it has not yet
+            if self._wake_w is not None:
+                os.write(self._wake_w, b'x')
+        self._thread.join(1.0)
+        self._thread = None
+
+    def _run(self, wake_r, wake_w):
+        try:
+            self._watch(wake_r)
+        finally:
+            # Only the thread closes its fds, so poll() never sees a closed or reused one
+            with self._lock:
+                if self._wake_w == wake_w:
+                    self._wake_r, self._wake_w = None, None
+                os.close(wake_r)
+                os.close(wake_w)
+
+    def _watch(self, wake_r):
+        poller = select.poll()
+        try:
+            mount_fd = os.open(self.mountinfo, os.O_RDONLY | os.O_CLOEXEC)
+        except OSError:
+            return
+        poller.register(mount_fd, select.POLLPRI | select.POLLERR)
+        poller.register(wake_r, select.POLLIN)
+        sock = _uevent_socket()
+        if sock is not None:
+            poller.register(sock.fileno(), select.POLLIN)
+        timeout = None if sock is not None else FALLBACK_POLL_MS
+        signature = _loop_signature() if sock is None else None
+        try:
+            while self._running:
+                reasons = set()
+                events = poller.poll(timeout)
+                # Gather the burst of events a single mount/losetup produces.
+                while events:
+                    for fd, _ in events:
+                        if fd == mount_fd:
+                            reasons.add('mounts')
+                        elif sock is not None and fd == sock.fileno():
+                            if _is_watched_uevent(sock.recv(8192)):
+                                reasons.add('devices')
+                        elif fd == wake_r:
+                            return
+                    events = poller.poll(DEBOUNCE_MS)
+                if signature is not None:
+                    current = _loop_signature()
+                    if current != signature:
+                        signature = current
+                        reasons.add('devices')
+                if reasons and self._running:
+                    if 'mounts' in reasons:
+                        invalidate()
+                    try:
+                        self.callback(reasons)
+                    except Exception:
+                        pass
+        finally:
+            os.close(mount_fd)
+            if sock is not None:
+                sock.close()
+
+def sample_interval(fill_rate, min_interval=1.0, max_interval=30.0, step=0.02):
+    """Seconds until the next usage sample.
+
+    fill_rate is the fastest growth seen, as a fraction of capacity per second.
+    Sampling is spaced so no disk grows by more than `step` of its capacity
+    between two samples.
+    """
+    if fill_rate <= 0:
+        return max_interval
+    return max(min_interval, min(max_interval, step / fill_rate))
@@ -0,0 +1,103 @@
+# Compressed RAM disks on zram.
+#
+# A zram device is a block device whose pages are compressed in memory, so
+# compressible data (logs, text build output, JSON) takes a fraction of the
+# RAM a tmpfs would use. Devices are hot-added through zram-control, get
+# their algorithm and size through sysfs and carry an ext4 without journal,
+# mounted with discard so deleted files give their memory back.
+#
+# The capacity (disksize) of an initialised device cannot change; resizing a
+# zram disk sets mem_limit, the most RAM its compressed pages may use.
+import os
+from vdm.logic.utils import format_size
+from vdm.logic.loops import SYSFS_BLOCK, _read, _read_int
+
+CONTROL = '/sys/class/zram-control'
+SWAPS = '/proc/swaps'
+ALGORITHMS = ('lz4', 'zstd', 'lzo-rle', 'lzo', 'lz4hc', '842', 'deflate')
+DEFAULT_ALGORITHM = 'lz4'
+FILESYSTEM = 'ext4-nojournal'
+MOUNT_OPTIONS = {'noatime': True, 'discard': True}
+# First fields of /sys/block/zramN/mm_stat, in bytes
+MM_STAT = ('orig_data_size', 'compr_data_size', 'mem_used_total', 'mem_limit', 'mem_used_max', 'same_pages')
+
+def available(control=CONTROL):
+    """True if the zram module is loaded and supports hot-add."""
+    return os.path.isdir(control)
+
+def _parse_algorithms(text):
+    """'lzo [lz4] zstd' -> (['lzo', 'lz4', 'zstd'], 'lz4')"""
+    words = (text or '').split()
+    current = next((w[1:-1] for w in words if w.startswith('[')), None)
+    return [w.strip('[]') for w in words], current
+
+def algorithms(sysfs=SYSFS_BLOCK):
+    """Compression algorithms the kernel offers, read from any zram device."""
+    try:
+        names = sorted(n for n in os.listdir(sysfs) if n.startswith('zram'))
+    except OSError:
+        names = []
+    for name in names:
+        found, _ = _parse_algorithms(_read(os.path.join(sysfs, name, 'comp_algorithm')))
+        if found:
+            return found
+    return []
+
+def scan_zram(sysfs=SYSFS_BLOCK):
+    """Index zram devices by /dev path, with their size, algorithm and mm_stat counters."""
+    index = {}
+    try:
+        names = os.listdir(sysfs)
+    except OSError:
+        return index
+    for name in names:
+        if not name.startswith('zram'):
+            continue
+        base = os.path.join(sysfs, name)
+        _, algorithm = _parse_algorithms(_read(os.path.join(base, 'comp_algorithm')))
+        entry = {
+            'device': f'/dev/{name}',
+            'name': name,
+            'devno': _read(os.path.join(base, 'dev')),
+            'disksize': _read_int(os.path.join(base, 'disksize')),
+            'algorithm': algorithm,
+        }
+        fields = (_read(os.path.join(base, 'mm_stat')) or '').split()
+        for key, value in zip(MM_STAT, fields):
+            entry[key] = int(value) if value.isdigit() else 0
+        index[entry['device']] = entry
+    return index
+
+def swap_devices(path=SWAPS):
+    """Devices in use as swap (zram is often used that way, never touch those)."""
+    try:
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()[1:]
+    except OSError:
+        return set()
+    return {line.split()[0] for line in lines if line.strip()}
+
+def find_device(index, disk, swaps=None):
+    """The scan_zram entry still holding disk, or None if it is gone (e.g. after a reboot).
+
+    Device numbers are reused, so the size and algorithm must match too.
+    """
+    entry = index.get(disk.get('device_or_file'))
+    if entry is None or entry['device'] in (swap_devices() if swaps is None else swaps):
+        return None
+    if entry['disksize'] != disk.get('disksize') or entry['algorithm'] != disk.get('algorithm'):
+        return None
+    return entry
+
+def ratio(entry):
+    """Stored data per byte of RAM used, or None while empty."""
+    if not entry.get('mem_used_total'):
+        return None
+    return entry['orig_data_size'] / entry['mem_used_total']
+
+def describe(entry):
+    """Short text of the live compression state of a device."""
+    value = ratio(entry)
+    if value is None:
+        return f"{entry['algorithm']}, empty"
+    return f"{entry['algorithm']}, {value:.1f}x ({format_size(entry['mem_used_total'])} RAM)"
@@ -0,0 +1,150 @@
+import itertools
+from collections import deque
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+from vdm.logic.actions import OperationContext, Cancelled
+
+class Operation:
+    """One queued call of a vdm.logic.actions function."""
+    _ids = itertools.count(1)
+
+    def __init__(self, queue, key, title, func, args, kwargs, on_done=None, on_error=None, on_finished=None):
+        self.id = next(self._ids)
+        self.key = key
+        self.title = title
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_finished = on_finished
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.current_step = ''
+        self.context = OperationContext(
+            on_step=lambda text: queue.step.emit(self, text),
+            on_progress=lambda done, total: queue.progress.emit(self, done, total),
+        )
+
+class _Runner(QRunnable):
+    def __init__(self, queue, op):
+        super().__init__()
+        self.queue = queue
+        self.op = op
+
+    def run(self):
+        op = self.op
+        try:
+            op.result = op.func(op.context, *op.args, **op.kwargs)
+        except Cancelled:
+            op.cancelled = True
+        except Exception as e:
+            op.error = e
+        self.queue._completed.emit(op)
+
+class OperationQueue(QObject):
+    """Runs disk operations on a thread pool, one at a time per disk.
+
+    Operations submitted with the same key (usually the backing file or the
+    mount point) run in submission order; different keys run concurrently.
+    on_done(result) / on_error(exception) are called on the GUI thread;
+    cancelled operations call neither. on_finished(op) is always called last.
+    """
+    started = Signal(object)
+    step = Signal(object, str)
+    progress = Signal(object, object, object)
+    finished = Signal(object)
+    _completed = Signal(object)
+
+    def __init__(self, parent=None, max_workers=4):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers)
+        self._active = {}
+        self._waiting = {}
+        self._completed.connect(self._on_completed)
+        self.step.connect(self._remember_step)
+
+    def submit(self, key, title, func, *args, on_done=None, on_error=None, on_finished=None, **kwargs):
+        op = Operation(self, key, title, func, args, kwargs, on_done, on_error, on_finished)
+        if key in self._active:
+            self._waiting.setdefault(key, deque()).append(op)
+        else:
+            self._start(op)
+        return op
+
+    def cancel(self, op):
+        waiting = self._waiting.get(op.key)
+        if waiting and op in waiting:
+            waiting.remove(op)
+            if not waiting:
+                del self._waiting[op.key]
+            op.cancelled = True
+            self._finish(op)
+        else:
+            op.context.cancel()
+
+    def submit_batch(self, jobs, on_finished):
+        """Submit (key, title, func, args, kwargs) jobs and call on_finished(ops) once all have ended.
+
+        The jobs run as independent operations, so disks proceed concurrently
+        up to the pool size and one failure does not stop the others.
+        """
+        ops = []
+        remaining = [len(jobs)]
+
+        def one_finished(op):
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                on_finished(ops)
+
+        for key, title, func, args, kwargs in jobs:
+            ops.append(self.submit(key, title, func, *args, on_finished=one_finished, **kwargs))
+        if not jobs:
+            on_finished(ops)
+        return ops
+
+    def cancel_all(self):
+        for waiting in list(self._waiting.values()):
+            for op in list(waiting):
+                self.cancel(op)
+        for op in list(self._active.values()):
+            self.cancel(op)
+
+    def operations(self):
+        """Running operations followed by the queued ones."""
+        ops = list(self._active.values())
+        for waiting in self._waiting.values():
+            ops.extend(waiting)
+        return ops
+
+    def is_busy(self, key):
+        return key in self._active
+
+    def _start(self, op):
+        self._active[op.key] = op
+        self.started.emit(op)
+        self.pool.start(_Runner(self, op))
+
+    def _remember_step(self, op, text):
+        op.current_step = text
+
+    def _on_completed(self, op):
+        self._active.pop(op.key, None)
+        waiting = self._waiting.get(op.key)
+        if waiting:
+            self._start(waiting.popleft())
+            if not waiting:
+                del self._waiting[op.key]
+        if not op.cancelled:
+            if op.error is None:
+                if op.on_done:
+                    op.on_done(op.result)
+            elif op.on_error:
+                op.on_error(op.error)
+        self._finish(op)
+
+    def _finish(self, op):
+        if op.on_finished:
+            op.on_finished(op)
+        self.finished.emit(op)
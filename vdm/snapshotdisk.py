@@ -0,0 +1,160 @@
+import datetime
+import os
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QComboBox, QListWidget, QListWidgetItem, QPushButton, QLabel,
+                               QInputDialog, QLineEdit, QMessageBox, QFileDialog)
+from PySide6.QtCore import Qt
+from vdm.logic import snapshots
+from vdm.logic.disks import add_disk, save_disks
+from vdm.logic.utils import format_size, send_notification
+
+class SnapshotDiskDialog(QDialog):
+    """Snapshots of a file disk (take, revert, delete) and clones of the disk or of a snapshot."""
+
+    def __init__(self, parent, discos, selected=None):
+        super().__init__(parent)
+        self.setWindowTitle('Snapshots and Clones')
+        self.setModal(True)
+        self.resize(520, 320)
+        self.discos = [d for d in discos if d.get('type') == 'File']
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.disk_combo = QComboBox()
+        for d in self.discos:
+            self.disk_combo.addItem(f"{d['device_or_file']} ({d['mountpoint']})")
+        if selected in self.discos:
+            self.disk_combo.setCurrentIndex(self.discos.index(selected))
+        self.disk_combo.currentIndexChanged.connect(self.update_list)
+        form.addRow('Disk:', self.disk_combo)
+        layout.addLayout(form)
+        self.snapshot_list = QListWidget()
+        layout.addWidget(self.snapshot_list)
+        self.info_label = QLabel('Snapshots are instant on btrfs and XFS (reflink); elsewhere the data is copied, which needs the disk unmounted.')
+        self.info_label.setWordWrap(True)
+        layout.addWidget(self.info_label)
+        btn_layout = QHBoxLayout()
+        self.btn_take = QPushButton('Take Snapshot')
+        self.btn_take.clicked.connect(self.take_snapshot)
+        self.btn_revert = QPushButton('Revert')
+        self.btn_revert.setToolTip('Put the disk back to the selected snapshot (the disk must be unmounted)')
+        self.btn_revert.clicked.connect(self.revert_snapshot)
+        self.btn_delete = QPushButton('Delete')
+        self.btn_delete.clicked.connect(self.delete_snapshot)
+        self.btn_clone = QPushButton('Clone...')
+        self.btn_clone.setToolTip('New file disk from the selected snapshot, or from the disk if none is selected')
+        self.btn_clone.clicked.connect(self.clone_disk)
+        btn_close = QPushButton('Close')
+        btn_close.clicked.connect(self.accept)
+        for btn in (self.btn_take, self.btn_revert, self.btn_delete, self.btn_clone):
+            btn_layout.addWidget(btn)
+        btn_layout.addStretch()
+        btn_layout.addWidget(btn_close)
+        layout.addLayout(btn_layout)
+        self.snapshot_list.itemSelectionChanged.connect(self.update_buttons)
+        self.update_list()
+
+    def current_disk(self):
+        idx = self.disk_combo.currentIndex()
+        return self.discos[idx] if 0 <= idx < len(self.discos) else None
+
+    def current_snapshot(self):
+        item = self.snapshot_list.currentItem()
+        return item.data(Qt.UserRole) if item is not None and item.isSelected() else None
+
+    def update_list(self):
+        self.snapshot_list.clear()
+        disk = self.current_disk()
+        for record in snapshots.list_snapshots(disk) if disk else []:
+            created = datetime.datetime.fromtimestamp(record['created']).strftime('%Y-%m-%d %H:%M')
+            item = QListWidgetItem(f"{record['name']}  -  {created}, {format_size(record['size'])} ({record['method']})")
+            item.setData(Qt.UserRole, record['name'])
+            self.snapshot_list.addItem(item)
+        self.update_buttons()
+
+    def update_buttons(self):
+        disk = self.current_disk()
+        selected = self.current_snapshot() is not None
+        self.btn_take.setEnabled(disk is not None)
+        self.btn_clone.setEnabled(disk is not None)
+        self.btn_delete.setEnabled(selected)
+        # Reverter só com o disco desmontado
+        self.btn_revert.setEnabled(selected and disk.get('status') != 'Mounted')
+
+    def _submit(self, disk, title, func, *args, on_done=None, **kwargs):
+        window = self.parent()
+
+        def failed(e):
+            QMessageBox.critical(window, 'Error', f'{title} failed:\n{getattr(e, "stderr", None) or e}')
+            send_notification('Error', f'{title} failed', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.ico')))
+
+        window.operations.submit(disk['device_or_file'], title, func, disk, *args, on_done=on_done, on_error=failed, **kwargs)
+
+    def take_snapshot(self):
+        disk = self.current_disk()
+        name, ok = QInputDialog.getText(self, 'Take Snapshot', 'Snapshot name:', text=datetime.datetime.now().strftime('%Y%m%d-%H%M%S'))
+        if not ok or not name.strip():
+            return
+        window = self.parent()
+
+        def done(record):
+            save_disks(window.discos, window.registry)
+            self.update_list()
+            send_notification('Snapshot Taken', f"{disk['device_or_file']}: {record['name']} ({snapshots.describe(record)})",
+                              icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
+
+        self._submit(disk, f"Snapshot {disk['device_or_file']}", snapshots.snapshot_file_disk, name.strip(), on_done=done)
+
+    def revert_snapshot(self):
+        disk = self.current_disk()
+        name = self.current_snapshot()
+        if QMessageBox.question(self, 'Confirm', f"Revert {disk['device_or_file']} to snapshot {name}?\nChanges made since then are lost.") != QMessageBox.Yes:
+            return
+        window = self.parent()
+
+        def done(record):
+            save_disks(window.discos, window.registry)
+            QMessageBox.information(window, 'Success', f"{disk['device_or_file']} reverted to snapshot {name}.")
+            window.update_table()
+
+        self._submit(disk, f"Revert {disk['device_or_file']}", snapshots.revert_file_disk, name, on_done=done)
+
+    def delete_snapshot(self):
+        disk = self.current_disk()
+        name = self.current_snapshot()
+        if QMessageBox.question(self, 'Confirm', f'Delete snapshot {name}?') != QMessageBox.Yes:
+            return
+        window = self.parent()
+
+        def done(result):
+            save_disks(window.discos, window.registry)
+            self.update_list()
+
+        self._submit(disk, f'Delete snapshot {name}', snapshots.delete_snapshot, name, on_done=done)
+
+    def clone_disk(self):
+        disk = self.current_disk()
+        name = self.current_snapshot()
+        base = os.path.splitext(disk['device_or_file'])[0]
+        file_path, _ = QFileDialog.getSaveFileName(self, 'Clone image file', f'{base}-clone.img', 'Disk images (*.img);;All files (*)')
+        if not file_path:
+            return
+        if os.path.exists(file_path):
+            QMessageBox.warning(self, 'Error', f'{file_path} already exists.')
+            return
+        mountpoint, ok = QInputDialog.getText(self, 'Mount Point', 'Mount point of the clone:', text=disk['mountpoint'] + '-clone')
+        if not ok or not mountpoint.strip():
+            return
+        mountpoint = mountpoint.strip()
+        password = None
+        if disk.get('encrypted'):
+            password, ok = QInputDialog.getText(self, 'Password Required', f"The clone keeps the password of\n{disk['device_or_file']}:", QLineEdit.Password)
+            if not ok or not password:
+                return
+        window = self.parent()
+
+        def done(clone):
+            add_disk(window.discos, clone, window.registry)
+            QMessageBox.information(window, 'Success', f"Clone mounted at {mountpoint} ({snapshots.describe(clone['clone'])}).")
+            send_notification('Disk Cloned', f'Clone mounted at {mountpoint}', icon=os.path.abspath(os.path.join(os.path.dirname(__file__), '../vdm-bin/icon.png')))
+            window.update_table()
+
+        self._submit(disk, f"Clone {disk['device_or_file']}", snapshots.clone_file_disk, file_path, mountpoint, password=password, snapshot=name, on_done=done)
@@ -0,0 +1,27 @@
+import sys
+import time
+
+class StartupProfile:
+    """Wall-clock timings of the startup phases, for `main.py --profile-startup`."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, name):
+        """Close the phase that ends now."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self, file=sys.stderr):
+        print('VDM startup profile:', file=file)
+        elapsed = 0.0
+        for name, seconds in self.phases:
+            elapsed += seconds
+            print(f'  {name:<28} {seconds * 1000:8.1f} ms  {elapsed * 1000:8.1f} ms', file=file)
+
+def mark(profile, name):
+    if profile is not None:
+        profile.mark(name)